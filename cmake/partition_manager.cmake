@@ -310,6 +310,15 @@ endif()
 set(pm_out_partition_file ${APPLICATION_BINARY_DIR}/partitions${UNDERSCORE_DOMAIN}.yml)
 set(pm_out_region_file ${APPLICATION_BINARY_DIR}/regions${UNDERSCORE_DOMAIN}.yml)
 set(pm_out_dotconf_file ${APPLICATION_BINARY_DIR}/pm${UNDERSCORE_DOMAIN}.config)
+set(pm_out_cache_file ${APPLICATION_BINARY_DIR}/partitions${UNDERSCORE_DOMAIN}.cache)
+
+if(SYSBUILD)
+  zephyr_get(PM_OPTIMIZE_PLACEMENT SYSBUILD GLOBAL)
+endif()
+
+if(PM_OPTIMIZE_PLACEMENT)
+  set(optimize_placement_argument --optimize-placement)
+endif()
 
 set(pm_cmd
   ${PYTHON_EXECUTABLE}
@@ -318,20 +327,16 @@ set(pm_cmd
   --regions ${regions}
   --output-partitions ${pm_out_partition_file}
   --output-regions ${pm_out_region_file}
+  --output-config-file ${pm_out_dotconf_file}
+  --cache-file ${pm_out_cache_file}
   ${dynamic_partition_argument}
+  ${optimize_placement_argument}
   ${static_configuration}
   ${region_arguments}
   )
 
-set(pm_output_cmd
-  ${PYTHON_EXECUTABLE}
-  ${ZEPHYR_NRF_MODULE_DIR}/scripts/partition_manager_output.py
-  --input-partitions ${pm_out_partition_file}
-  --input-regions ${pm_out_region_file}
-  --config-file ${pm_out_dotconf_file}
-  )
-
-# Run the partition manager algorithm.
+# Run the partition manager algorithm, and produce the config file. If nothing has changed
+# since the previous run, the cached results are kept.
 execute_process(
   COMMAND
   ${pm_cmd}
@@ -342,17 +347,6 @@ if(NOT ${ret} EQUAL "0")
   message(FATAL_ERROR "Partition Manager failed, aborting. Command: ${pm_cmd}")
 endif()
 
-# Produce header files and config file.
-execute_process(
-  COMMAND
-  ${pm_output_cmd}
-  RESULT_VARIABLE ret
-  )
-
-if(NOT ${ret} EQUAL "0")
-  message(FATAL_ERROR "Partition Manager output generation failed, aborting. Command: ${pm_output_cmd}")
-endif()
-
 # Create a dummy target that we can add properties to for
 # extraction in generator expressions.
 add_custom_target(partition_manager)
@@ -730,6 +724,7 @@ to the external flash")
     ${PYTHON_EXECUTABLE}
     ${ZEPHYR_NRF_MODULE_DIR}/scripts/partition_manager_report.py
     --input ${pm_out_partition_file}
+    --input-regions ${pm_out_region_file}
     COMMAND_EXPAND_LISTS
     )
 
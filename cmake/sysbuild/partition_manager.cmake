@@ -103,6 +103,11 @@ function(partition_manager)
   set(pm_out_partition_file ${APPLICATION_BINARY_DIR}/partitions${underscore}${PM_DOMAIN}.yml)
   set(pm_out_region_file ${APPLICATION_BINARY_DIR}/regions${underscore}${PM_DOMAIN}.yml)
   set(pm_out_dotconf_file ${APPLICATION_BINARY_DIR}/pm${underscore}${PM_DOMAIN}.config)
+  set(pm_out_cache_file ${APPLICATION_BINARY_DIR}/partitions${underscore}${PM_DOMAIN}.cache)
+
+  if(PM_OPTIMIZE_PLACEMENT)
+    set(optimize_placement_argument --optimize-placement)
+  endif()
 
   set(pm_cmd
     ${PYTHON_EXECUTABLE}
@@ -111,20 +116,16 @@ function(partition_manager)
     --regions ${PM_REGIONS}
     --output-partitions ${pm_out_partition_file}
     --output-regions ${pm_out_region_file}
+    --output-config-file ${pm_out_dotconf_file}
+    --cache-file ${pm_out_cache_file}
     ${dynamic_partition_argument}
+    ${optimize_placement_argument}
     ${static_configuration}
     ${${PM_DOMAIN}${underscore}region_arguments}     # region args are scoped in and thus available. Should probably be in arg.
     )
 
-  set(pm_output_cmd
-    ${PYTHON_EXECUTABLE}
-    ${ZEPHYR_NRF_MODULE_DIR}/scripts/partition_manager_output.py
-    --input-partitions ${pm_out_partition_file}
-    --input-regions ${pm_out_region_file}
-    --config-file ${pm_out_dotconf_file}
-    )
-
-  # Run the partition manager algorithm.
+  # Run the partition manager algorithm, and produce the config file. If nothing has changed
+  # since the previous run, the cached results are kept.
   execute_process(
     COMMAND
     ${pm_cmd}
@@ -135,17 +136,6 @@ function(partition_manager)
     message(FATAL_ERROR "Partition Manager failed, aborting. Command: ${pm_cmd}")
   endif()
 
-  # Produce header files and config file.
-  execute_process(
-    COMMAND
-    ${pm_output_cmd}
-    RESULT_VARIABLE ret
-    )
-
-  if(NOT ${ret} EQUAL "0")
-    message(FATAL_ERROR "Partition Manager output generation failed, aborting. Command: ${pm_output_cmd}")
-  endif()
-
   add_custom_target(partition_manager${underscore}${PM_DOMAIN})
   set(pm_var_names)
   import_pm_config(${pm_out_dotconf_file} pm_var_names)
@@ -805,6 +795,7 @@ else()
     ${PYTHON_EXECUTABLE}
     ${ZEPHYR_NRF_MODULE_DIR}/scripts/partition_manager_report.py
     --input ${pm_out_partition_file}
+    --input-regions ${pm_out_region_file}
     COMMAND_EXPAND_LISTS
     )
 
@@ -15,6 +15,8 @@ def main():
     parser.add_argument('dataset_name', help='Name of dataset')
     parser.add_argument('--start_time', help='Measurement start time[s]')
     parser.add_argument('--end_time', help='Measurement end time[s]')
+    parser.add_argument('--max_gap', type=float, default=float('inf'),
+                        help='Maximum time between paired events[s]')
     parser.add_argument('--log', help='Log level')
     args = parser.parse_args()
 
@@ -35,7 +37,7 @@ def main():
 
     sn = StatsNordic(args.dataset_name + ".csv", args.dataset_name + ".json",
                      log_lvl_number)
-    sn.calculate_stats_preset1(args.start_time, args.end_time)
+    sn.calculate_stats_preset1(args.start_time, args.end_time, args.max_gap)
 
 if __name__ == "__main__":
     main()
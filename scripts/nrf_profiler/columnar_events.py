@@ -0,0 +1,244 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+from events import Event, EventType, TrackedEvent
+from processed_events import ProcessedEvents, EM_MEM_ADDRESS_DATA_DESC
+from ast import literal_eval
+from array import array
+import numpy as np
+import logging
+import csv
+import json
+import os
+import sys
+
+COLUMNAR_DATASET_EXTENSION = ".npd"
+COLUMNAR_EVENT_TYPES_FILENAME = "event_types.json"
+COLUMNAR_COLUMNS = ('type_id', 'timestamp', 'proc_start_time', 'proc_end_time', 'data_row')
+
+# Fixed-width NumPy types used to store event data fields. Strings are stored
+# as fixed-width unicode, the width is chosen per event type when the dataset
+# is created.
+DATA_TYPE_TO_DTYPE = {
+    "u8": np.uint8,
+    "s8": np.int8,
+    "u16": np.uint16,
+    "s16": np.int16,
+    "u32": np.uint32,
+    "s32": np.int32,
+    "t": np.uint32,
+    "s": np.str_,
+}
+
+
+class ColumnarEvents():
+    """Dataset of tracked events stored as NumPy arrays.
+
+    Every tracked event is described by a row of the fixed-width columns
+    (type_id, timestamp, proc_start_time, proc_end_time, data_row). Missing
+    processing times are stored as NaN. Data fields of the event are stored
+    in the per-event-type structured array, at index data_row.
+    """
+
+    def __init__(self, registered_events_types, type_id, timestamp,
+                 proc_start_time, proc_end_time, data_row, data_tables):
+        self.registered_events_types = registered_events_types
+        self.type_id = type_id
+        self.timestamp = timestamp
+        self.proc_start_time = proc_start_time
+        self.proc_end_time = proc_end_time
+        self.data_row = data_row
+        self.data_tables = data_tables
+
+        self.logger = logging.getLogger('Columnar Events')
+        self.logger_console = logging.StreamHandler()
+        self.logger.setLevel(logging.WARNING)
+        self.log_format = logging.Formatter(
+            '[%(levelname)s] %(name)s: %(message)s')
+        self.logger_console.setFormatter(self.log_format)
+        self.logger.addHandler(self.logger_console)
+
+    def __len__(self):
+        return len(self.type_id)
+
+    def get_event_type_id(self, type_name):
+        for key, value in self.registered_events_types.items():
+            if type_name == value.name:
+                return key
+        return None
+
+    def is_event_tracked(self, event_type_id):
+        event_data_descriptions = self.registered_events_types[event_type_id].data_descriptions
+        if len(event_data_descriptions) == 0 or event_data_descriptions[0] != EM_MEM_ADDRESS_DATA_DESC:
+            return False
+        return True
+
+    def get_event_data(self, idx):
+        table = self.data_tables[int(self.type_id[idx])]
+        return list(table[self.data_row[idx]].tolist())
+
+    def get_tracked_event(self, idx):
+        proc_start_time = float(self.proc_start_time[idx])
+        proc_end_time = float(self.proc_end_time[idx])
+        return TrackedEvent(Event(int(self.type_id[idx]),
+                                  float(self.timestamp[idx]),
+                                  self.get_event_data(idx)),
+                            None if np.isnan(proc_start_time) else proc_start_time,
+                            None if np.isnan(proc_end_time) else proc_end_time)
+
+    def to_processed_events(self):
+        processed_events = ProcessedEvents()
+        processed_events.registered_events_types = dict(self.registered_events_types)
+
+        # Convert every column to Python objects at once instead of per event.
+        type_ids = self.type_id.tolist()
+        timestamps = self.timestamp.tolist()
+        proc_start_times = self.proc_start_time.tolist()
+        proc_end_times = self.proc_end_time.tolist()
+        data_rows = self.data_row.tolist()
+        data_tables = dict((k, v.tolist()) for k, v in self.data_tables.items())
+
+        processed_events.tracked_events = [
+            TrackedEvent(Event(type_id, timestamp, list(data_tables[type_id][data_row])),
+                         None if start != start else start,
+                         None if end != end else end)
+            for type_id, timestamp, start, end, data_row
+            in zip(type_ids, timestamps, proc_start_times, proc_end_times, data_rows)]
+
+        return processed_events
+
+    @staticmethod
+    def _data_dtype(event_type, str_widths):
+        fields = []
+        for i, data_type in enumerate(event_type.data_types):
+            dtype = DATA_TYPE_TO_DTYPE[data_type]
+            if dtype is np.str_:
+                dtype = 'U{}'.format(max(1, str_widths.get(i, 1)))
+            fields.append(('f{}'.format(i), dtype))
+        return np.dtype(fields)
+
+    @staticmethod
+    def _from_rows(registered_events_types, rows):
+        type_id = array('q')
+        timestamp = array('d')
+        proc_start_time = array('d')
+        proc_end_time = array('d')
+        data_row = array('q')
+        data_rows = dict((k, []) for k in registered_events_types)
+
+        for row_type_id, row_timestamp, row_data, row_start, row_end in rows:
+            if row_type_id not in data_rows:
+                raise ValueError("Missing description of event type: {}".format(row_type_id))
+            type_data_rows = data_rows[row_type_id]
+            type_id.append(row_type_id)
+            timestamp.append(row_timestamp)
+            proc_start_time.append(float('nan') if row_start is None else row_start)
+            proc_end_time.append(float('nan') if row_end is None else row_end)
+            data_row.append(len(type_data_rows))
+            type_data_rows.append(tuple(row_data))
+
+        data_tables = {}
+        for k, type_data_rows in data_rows.items():
+            event_type = registered_events_types[k]
+            str_widths = {}
+            for i, data_type in enumerate(event_type.data_types):
+                if data_type == "s":
+                    str_widths[i] = max((len(r[i]) for r in type_data_rows), default=1)
+            data_tables[k] = np.array(type_data_rows,
+                                      dtype=ColumnarEvents._data_dtype(event_type, str_widths))
+
+        return ColumnarEvents(registered_events_types,
+                              np.frombuffer(type_id, dtype=np.int64).astype(np.int32),
+                              np.frombuffer(timestamp, dtype=np.float64),
+                              np.frombuffer(proc_start_time, dtype=np.float64),
+                              np.frombuffer(proc_end_time, dtype=np.float64),
+                              np.frombuffer(data_row, dtype=np.int64),
+                              data_tables)
+
+    @staticmethod
+    def from_processed_events(processed_events):
+        rows = ((ev.submit.type_id, ev.submit.timestamp, ev.submit.data,
+                 ev.proc_start_time, ev.proc_end_time)
+                for ev in processed_events.tracked_events)
+        return ColumnarEvents._from_rows(dict(processed_events.registered_events_types), rows)
+
+    @staticmethod
+    def from_csv(filename_events, filename_event_types):
+        """Convert the .csv/.json pair without creating TrackedEvent objects."""
+        processed_events = ProcessedEvents()
+        csv_hash1 = processed_events._read_events_types_json(filename_event_types)
+        csv_hash2 = ProcessedEvents._calculate_md5_hash_of_file(filename_events)
+        if csv_hash1 != csv_hash2:
+            processed_events.logger.warning("Hash values of csv files do not match")
+            processed_events.logger.warning("Events and descriptions may be inconsistent")
+
+        def _parse_rows(reader):
+            for row in reader:
+                yield (int(row['type_id']),
+                       float(row['timestamp']),
+                       literal_eval(row['data']),
+                       float(row['proc_start_time']) if row['proc_start_time'] != '' else None,
+                       float(row['proc_end_time']) if row['proc_end_time'] != '' else None)
+
+        try:
+            with open(filename_events, 'r', newline='') as csvfile:
+                reader = csv.DictReader(csvfile, delimiter=',')
+                assert reader.fieldnames == TrackedEvent.TRACKED_EVENT_FIELDNAMES
+                return ColumnarEvents._from_rows(processed_events.registered_events_types,
+                                                 _parse_rows(reader))
+        except IOError:
+            processed_events.logger.error("Problem with accessing file: " + filename_events)
+            sys.exit()
+
+    def write_data_to_files(self, filename_events, filename_event_types):
+        self.to_processed_events().write_data_to_files(filename_events, filename_event_types)
+
+    def write(self, dirname):
+        try:
+            os.makedirs(dirname, exist_ok=True)
+            for column in COLUMNAR_COLUMNS:
+                np.save(os.path.join(dirname, column + ".npy"), getattr(self, column))
+            for k, table in self.data_tables.items():
+                np.save(os.path.join(dirname, "data_{}.npy".format(k)), table)
+            d = dict((k, v.serialize()) for k, v in self.registered_events_types.items())
+            with open(os.path.join(dirname, COLUMNAR_EVENT_TYPES_FILENAME), "w") as wr:
+                json.dump(d, wr, indent=4)
+        except IOError:
+            self.logger.error("Problem with accessing directory: " + dirname)
+            sys.exit()
+
+    @staticmethod
+    def read(dirname, mmap_mode='r'):
+        try:
+            with open(os.path.join(dirname, COLUMNAR_EVENT_TYPES_FILENAME), "r") as rd:
+                data = json.load(rd)
+            registered_events_types = dict((int(k), EventType.deserialize(v))
+                                           for k, v in data.items())
+            columns = dict((column, np.load(os.path.join(dirname, column + ".npy"),
+                                            mmap_mode=mmap_mode))
+                           for column in COLUMNAR_COLUMNS)
+            data_tables = dict((k, np.load(os.path.join(dirname, "data_{}.npy".format(k)),
+                                           mmap_mode=mmap_mode))
+                               for k in registered_events_types)
+        except IOError:
+            logging.getLogger('Columnar Events').error(
+                "Problem with accessing directory: " + dirname)
+            sys.exit()
+
+        return ColumnarEvents(registered_events_types, data_tables=data_tables, **columns)
+
+
+def columnar_dataset_exists(dataset_name):
+    return os.path.isdir(dataset_name + COLUMNAR_DATASET_EXTENSION)
+
+
+def load_dataset(dataset_name):
+    """Load dataset, preferring the memory-mapped columnar format.
+
+    Falls back to the .csv/.json pair if the columnar dataset does not exist.
+    """
+    if columnar_dataset_exists(dataset_name):
+        return ColumnarEvents.read(dataset_name + COLUMNAR_DATASET_EXTENSION)
+    return ColumnarEvents.from_csv(dataset_name + ".csv", dataset_name + ".json")
@@ -0,0 +1,31 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+from columnar_events import ColumnarEvents, COLUMNAR_DATASET_EXTENSION
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Converting dataset between .csv/.json pair and columnar format.',
+        allow_abbrev=False)
+    parser.add_argument('dataset_name', help='Name of dataset')
+    parser.add_argument('--to_csv', action='store_true',
+                        help='Convert columnar dataset back to .csv/.json pair')
+    args = parser.parse_args()
+
+    if args.to_csv:
+        events = ColumnarEvents.read(args.dataset_name + COLUMNAR_DATASET_EXTENSION)
+        events.write_data_to_files(args.dataset_name + ".csv",
+                                   args.dataset_name + ".json")
+    else:
+        events = ColumnarEvents.from_csv(args.dataset_name + ".csv",
+                                         args.dataset_name + ".json")
+        events.write(args.dataset_name + COLUMNAR_DATASET_EXTENSION)
+
+    print('Dataset converted successfully')
+
+if __name__ == "__main__":
+    main()
@@ -8,30 +8,33 @@ import argparse
 import time
 import logging
 import signal
-from stream import Stream
+from stream import STREAM_BACKENDS
 from rtt2stream import Rtt2Stream
 from model_creator import ModelCreator
+from rtt_nordic_config import RttNordicConfig
+from merge_data import merge_datasets
 
 is_waiting = True
 def signal_handler(sig, frame):
     global is_waiting
     is_waiting = False
 
-def rtt2stream(stream, event, event_close, log_lvl_number):
+def rtt2stream(stream, event, event_close, config, log_lvl_number):
     signal.signal(signal.SIGINT, signal.SIG_IGN)
     try:
-        rtt2s = Rtt2Stream(stream, event_close, log_lvl=log_lvl_number)
+        rtt2s = Rtt2Stream(stream, event_close, config=config, log_lvl=log_lvl_number)
         event.wait()
         rtt2s.read_and_transmit_data()
     except Exception as e:
         print("[ERROR] Unhandled exception in Profiler Rtt to stream module: {}".format(e))
 
-def model_creator(stream, event, event_close, dataset_name, log_lvl_number):
+def model_creator(stream, event, event_close, config, dataset_name, log_lvl_number):
     signal.signal(signal.SIGINT, signal.SIG_IGN)
     try:
         mc = ModelCreator(stream,
                           event_close,
                           sending_events=False,
+                          config=config,
                           event_filename=dataset_name + ".csv",
                           event_types_filename=dataset_name + ".json",
                           log_lvl=log_lvl_number)
@@ -50,6 +53,16 @@ def main():
     parser.add_argument('time', type=int, help='Time of collecting data [s]')
     parser.add_argument('dataset_name', help='Name of dataset')
     parser.add_argument('--log', help='Log level')
+    parser.add_argument('--stream', choices=STREAM_BACKENDS.keys(), default='pipe',
+                        help='Transport used between processes: multiprocessing pipes '
+                             'or shared memory ring buffers')
+    parser.add_argument('--snr', type=int, nargs='+',
+                        help='Serial numbers of J-Link devices. Data from every device is '
+                             'collected in parallel and saved as <dataset_name>_<snr>')
+    parser.add_argument('--sync_event',
+                        help='Event used for synchronization. If set, data from all devices '
+                             'is merged to <dataset_name> dataset. The first device is used '
+                             'as time reference')
     args = parser.parse_args()
 
     if args.log is not None:
@@ -57,24 +70,35 @@ def main():
     else:
         log_lvl_number = logging.INFO
 
-    # Event is made to ensure that ModelCreator class is initialized before Rtt2Stream starts sending data
-    event = Event()
-    # Setting these events results in closing corresponding modules.
-    event_close_rtt2stream = Event()
-    event_close_model_creator = Event()
-
-    streams = Stream.create_stream(2)
+    if args.snr is None:
+        devices = [(RttNordicConfig, args.dataset_name)]
+    else:
+        devices = [(dict(RttNordicConfig, device_snr=snr),
+                    "{}_{}".format(args.dataset_name, snr))
+                   for snr in args.snr]
 
     processes = []
-    processes.append((Process(target=rtt2stream,
-                                args=(streams[0], event, event_close_rtt2stream, log_lvl_number),
-                                daemon=True),
-                        event_close_rtt2stream))
-    processes.append((Process(target=model_creator,
-                                args=(streams[1], event, event_close_model_creator,
-                                    args.dataset_name, log_lvl_number),
-                                daemon=True),
-                        event_close_model_creator))
+    streams = []
+    for config, dataset_name in devices:
+        # Event is made to ensure that ModelCreator class is initialized before Rtt2Stream starts sending data
+        event = Event()
+        # Setting these events results in closing corresponding modules.
+        event_close_rtt2stream = Event()
+        event_close_model_creator = Event()
+
+        device_streams = STREAM_BACKENDS[args.stream].create_stream(2)
+        streams.extend(device_streams)
+
+        processes.append((Process(target=rtt2stream,
+                                  args=(device_streams[0], event, event_close_rtt2stream,
+                                        config, log_lvl_number),
+                                  daemon=True),
+                          event_close_rtt2stream))
+        processes.append((Process(target=model_creator,
+                                  args=(device_streams[1], event, event_close_model_creator,
+                                        config, dataset_name, log_lvl_number),
+                                  daemon=True),
+                          event_close_model_creator))
 
     for p, _ in processes:
         p.start()
@@ -100,5 +124,20 @@ def main():
             # Ensure that we stop processes in order to prevent nrf_profiler data drop.
             p.join()
 
+    for stream in streams:
+        stream.release()
+
+    if args.sync_event is not None and len(devices) > 1:
+        central_config, central_dataset = devices[0]
+        try:
+            merge_datasets(central_dataset, args.sync_event,
+                           "_{}".format(central_config['device_snr']),
+                           [(dataset_name, args.sync_event, "_{}".format(config['device_snr']))
+                            for config, dataset_name in devices[1:]],
+                           args.dataset_name)
+        except ValueError as e:
+            print("[ERROR] Merging datasets failed: {}. Data of every device is saved "
+                  "separately: {}".format(e, ", ".join(name for _, name in devices)))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,167 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+from events import Event, TrackedEvent
+import struct
+
+# Every event starts with event type id (u8) and raw timestamp (u32).
+EVENT_HEADER_FORMAT = "BI"
+
+DATA_TYPE_TO_STRUCT_FORMAT = {
+    "u8": "B",
+    "s8": "b",
+    "u16": "H",
+    "s16": "h",
+    "u32": "I",
+    "s32": "i",
+    "t": "I",
+}
+
+# Strings are sent as u8 length followed by the characters.
+DATA_TYPE_STRING = "s"
+
+# Tracked events sent between host processes start with event type id,
+# submit timestamp, processing start and processing end timestamps. Missing
+# processing timestamps are sent as NaN.
+TRACKED_EVENT_HEADER_FORMAT = "Iddd"
+
+
+def compile_layout(prefix, header_format, data_types):
+    """Compile event layout to list of (struct.Struct, number of values).
+
+    Fixed-size fields are merged into a single segment. None is used in place
+    of a segment for every string field.
+    """
+    segments = []
+    fmt = header_format
+    for data_type in data_types:
+        if data_type == DATA_TYPE_STRING:
+            segments.append((struct.Struct(prefix + fmt), len(fmt)))
+            segments.append(None)
+            fmt = ""
+        else:
+            fmt += DATA_TYPE_TO_STRUCT_FORMAT[data_type]
+    if fmt or not segments:
+        segments.append((struct.Struct(prefix + fmt), len(fmt)))
+    return segments
+
+
+def unpack_layout(layout, buf, offset, end):
+    """Unpack values described by layout from buf.
+
+    Returns (values, offset after the event) or (None, offset) if buf does
+    not contain the whole event.
+    """
+    values = []
+    for segment in layout:
+        if segment is None:
+            if offset >= end:
+                return None, offset
+            length = buf[offset]
+            offset += 1
+            if offset + length > end:
+                return None, offset
+            values.append(bytes(buf[offset:offset + length]).decode())
+            offset += length
+        else:
+            segment_struct, _ = segment
+            if offset + segment_struct.size > end:
+                return None, offset
+            values.extend(segment_struct.unpack_from(buf, offset))
+            offset += segment_struct.size
+    return values, offset
+
+
+def pack_layout(layout, values):
+    parts = []
+    idx = 0
+    for segment in layout:
+        if segment is None:
+            encoded = values[idx].encode()
+            parts.append(bytes((len(encoded),)))
+            parts.append(encoded)
+            idx += 1
+        else:
+            segment_struct, count = segment
+            parts.append(segment_struct.pack(*values[idx:idx + count]))
+            idx += count
+    return b''.join(parts)
+
+
+class EventDecoder():
+    """Decodes batches of events from the raw nrf_profiler data stream.
+
+    Layout of every registered event type is compiled to a list of
+    struct.Struct segments once, when event descriptions are received.
+    Fixed-size fields are merged into a single segment, so events without
+    strings are decoded by a single struct.unpack_from call.
+    """
+
+    def __init__(self, registered_events_types, byteorder):
+        self.prefix = '<' if byteorder == 'little' else '>'
+        self.layouts = dict((k, compile_layout(self.prefix, EVENT_HEADER_FORMAT,
+                                               v.data_types))
+                            for k, v in registered_events_types.items())
+
+        self.buf = bytearray()
+        self.offset = 0
+
+    def feed(self, data):
+        # Drop already decoded bytes only when they take more than half of the
+        # buffer to keep the cost of moving memory amortized.
+        if self.offset > len(self.buf) // 2:
+            del self.buf[:self.offset]
+            self.offset = 0
+        self.buf.extend(data)
+
+    def decode(self):
+        """Decode all complete events from the buffer.
+
+        Returns list of (type_id, raw timestamp, data) tuples. Incomplete
+        event at the end of the buffer is left for the next call.
+        """
+        events = []
+        buf = self.buf
+        offset = self.offset
+        end = len(buf)
+        while offset < end:
+            values, new_offset = unpack_layout(self.layouts[buf[offset]], buf, offset, end)
+            if values is None:
+                break
+            events.append((values[0], values[1], values[2:]))
+            offset = new_offset
+        self.offset = offset
+        return events
+
+
+class TrackedEventCodec():
+    """Binary records used to pass tracked events between host processes."""
+
+    TYPE_ID = struct.Struct('<I')
+
+    def __init__(self, registered_events_types):
+        self.layouts = dict((k, compile_layout('<', TRACKED_EVENT_HEADER_FORMAT, v.data_types))
+                            for k, v in registered_events_types.items())
+
+    def encode(self, tracked_event):
+        submit = tracked_event.submit
+        values = [submit.type_id,
+                  submit.timestamp,
+                  float('nan') if tracked_event.proc_start_time is None
+                      else tracked_event.proc_start_time,
+                  float('nan') if tracked_event.proc_end_time is None
+                      else tracked_event.proc_end_time]
+        values.extend(submit.data)
+        return pack_layout(self.layouts[submit.type_id], values)
+
+    def decode(self, buf):
+        type_id = TrackedEventCodec.TYPE_ID.unpack_from(buf)[0]
+        values, _ = unpack_layout(self.layouts[type_id], buf, 0, len(buf))
+        assert values is not None
+        proc_start_time = values[2]
+        proc_end_time = values[3]
+        return TrackedEvent(Event(type_id, values[1], values[4:]),
+                            None if proc_start_time != proc_start_time else proc_start_time,
+                            None if proc_end_time != proc_end_time else proc_end_time)
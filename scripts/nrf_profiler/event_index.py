@@ -0,0 +1,150 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+
+class ColumnarTrackedEvents():
+    """Tracked events of a columnar dataset, created only when accessed."""
+
+    def __init__(self, events, rows):
+        self.events = events
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, idx):
+        return self.events.get_tracked_event(self.rows[idx])
+
+
+class SortedTimestamps():
+    """Tracked events sorted by one of their timestamps."""
+
+    def __init__(self, keys=None, events=None):
+        self.keys = keys if keys is not None else []
+        self.events = events if events is not None else []
+
+    @staticmethod
+    def from_pairs(pairs):
+        pairs = sorted(pairs, key=lambda x: x[0])
+        return SortedTimestamps([p[0] for p in pairs], [p[1] for p in pairs])
+
+    def add(self, key, tracked_event):
+        # Events usually arrive in order, so appending is the common case.
+        if len(self.keys) == 0 or key >= self.keys[-1]:
+            self.keys.append(key)
+            self.events.append(tracked_event)
+        else:
+            idx = bisect_right(self.keys, key)
+            self.keys.insert(idx, key)
+            self.events.insert(idx, tracked_event)
+
+    def nearest(self, x):
+        """Return (distance, position) of the nearest key or None."""
+        if len(self.keys) == 0:
+            return None
+        idx = bisect_left(self.keys, x)
+        candidates = []
+        if idx < len(self.keys):
+            candidates.append((abs(self.keys[idx] - x), idx))
+        if idx > 0:
+            candidates.append((abs(self.keys[idx - 1] - x), idx - 1))
+        return min(candidates)
+
+    def last_before(self, x):
+        idx = bisect_left(self.keys, x)
+        if idx == 0:
+            return None
+        return self.events[idx - 1]
+
+
+class TypeIndex():
+    def __init__(self, submits=None, proc_starts=None, proc_ends=None):
+        self.submits = submits if submits is not None else SortedTimestamps()
+        self.proc_starts = proc_starts if proc_starts is not None else SortedTimestamps()
+        self.proc_ends = proc_ends if proc_ends is not None else SortedTimestamps()
+
+
+class EventIndex():
+    """Per event type index of tracked events used for hit-testing.
+
+    Submits, processing starts and processing ends are kept in separate
+    sorted lists, so lookups are logarithmic. Processing of events of the
+    same type is assumed not to overlap.
+    """
+
+    def __init__(self):
+        self.types = {}
+
+    @staticmethod
+    def build(tracked_events):
+        grouped = {}
+        for ev in tracked_events:
+            grouped.setdefault(ev.submit.type_id, []).append(ev)
+
+        index = EventIndex()
+        for type_id, events in grouped.items():
+            processed = [ev for ev in events if ev.proc_start_time is not None]
+            index.types[type_id] = TypeIndex(
+                SortedTimestamps.from_pairs((ev.submit.timestamp, ev) for ev in events),
+                SortedTimestamps.from_pairs((ev.proc_start_time, ev) for ev in processed),
+                SortedTimestamps.from_pairs((ev.proc_end_time, ev) for ev in processed))
+        return index
+
+    @staticmethod
+    def build_columnar(events):
+        """Build index from columns of ColumnarEvents without creating
+        tracked event objects. The objects are created only for the events
+        returned by find_closest.
+        """
+        index = EventIndex()
+        order = np.argsort(events.type_id, kind='stable')
+        type_ids, starts = np.unique(events.type_id[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for type_id, start, end in zip(type_ids, starts, ends):
+            rows = order[start:end]
+            processed = rows[~np.isnan(events.proc_start_time[rows])]
+            index.types[int(type_id)] = TypeIndex(
+                EventIndex._sorted_columnar(events, events.timestamp, rows),
+                EventIndex._sorted_columnar(events, events.proc_start_time, processed),
+                EventIndex._sorted_columnar(events, events.proc_end_time, processed))
+        return index
+
+    @staticmethod
+    def _sorted_columnar(events, column, rows):
+        keys = column[rows]
+        order = np.argsort(keys, kind='stable')
+        return SortedTimestamps(keys[order], ColumnarTrackedEvents(events, rows[order]))
+
+    def add(self, tracked_event):
+        type_index = self.types.get(tracked_event.submit.type_id)
+        if type_index is None:
+            type_index = TypeIndex()
+            self.types[tracked_event.submit.type_id] = type_index
+        type_index.submits.add(tracked_event.submit.timestamp, tracked_event)
+        if tracked_event.proc_start_time is not None:
+            type_index.proc_starts.add(tracked_event.proc_start_time, tracked_event)
+            type_index.proc_ends.add(tracked_event.proc_end_time, tracked_event)
+
+    def find_closest(self, type_id, x):
+        type_index = self.types.get(type_id)
+        if type_index is None:
+            return None
+
+        processing = type_index.proc_starts.last_before(x)
+        if processing is not None and x < processing.proc_end_time:
+            return processing
+
+        candidates = []
+        for timestamps in (type_index.submits, type_index.proc_starts, type_index.proc_ends):
+            nearest = timestamps.nearest(x)
+            if nearest is not None:
+                candidates.append((nearest[0], timestamps, nearest[1]))
+        if len(candidates) == 0:
+            return None
+        _, timestamps, idx = min(candidates, key=lambda c: c[0])
+        return timestamps.events[idx]
@@ -6,9 +6,16 @@
 import csv
 from io import StringIO
 from ast import literal_eval
+from enum import Enum
 
 
 
+class EventState(Enum):
+    SUBMIT = 1
+    PROC_START = 2
+    PROC_END = 3
+
+
 class Event():
     def __init__(self, type_id, timestamp, data):
         self.type_id = type_id
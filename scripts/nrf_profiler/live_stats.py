@@ -0,0 +1,230 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+from multiprocessing import Process, Event, active_children
+import argparse
+import csv
+import json
+import logging
+import signal
+import sys
+import time
+from stream import STREAM_BACKENDS, StreamError
+from rtt2stream import Rtt2Stream
+from model_creator import ModelCreator
+from events import EventType
+from event_decoder import TrackedEventCodec
+from columnar_events import load_dataset
+from stream_stats import StreamStats, PairStats, parse_pair_event, SNAPSHOT_FIELDNAMES
+
+is_waiting = True
+def signal_handler(sig, frame):
+    global is_waiting
+    is_waiting = False
+
+def rtt2stream(stream, event_stats, event_model_creator, event_close, log_lvl_number):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        rtt2s = Rtt2Stream(stream, event_close, log_lvl=log_lvl_number)
+        event_stats.wait()
+        event_model_creator.wait()
+        rtt2s.read_and_transmit_data()
+    except Exception as e:
+        print("[ERROR] Unhandled exception in Profiler Rtt to stream module: {}".format(e))
+
+def model_creator(stream, event, event_close, dataset_name, log_lvl_number):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        mc = ModelCreator(stream, event_close, sending_events=True,
+                          event_filename=dataset_name + ".csv",
+                          event_types_filename=dataset_name + ".json",
+                          log_lvl=log_lvl_number)
+        event.set()
+        mc.start()
+    except Exception as e:
+        print("[ERROR] Unhandled exception in Profiler model creator module: {}".format(e))
+
+
+class SnapshotWriter():
+    def __init__(self, interval, snapshot_filename, log_lvl):
+        self.interval = interval
+        self.last_snapshot_time = time.time()
+        self.csvfile = None
+        self.writer = None
+
+        self.logger = logging.getLogger('Live stats')
+        self.logger_console = logging.StreamHandler()
+        self.logger.setLevel(log_lvl)
+        self.log_format = logging.Formatter('[%(levelname)s] %(name)s: %(message)s')
+        self.logger_console.setFormatter(self.log_format)
+        self.logger.addHandler(self.logger_console)
+
+        if snapshot_filename is not None:
+            try:
+                self.csvfile = open(snapshot_filename, 'w', newline='')
+            except IOError:
+                self.logger.error("Problem with accessing file: " + snapshot_filename)
+                sys.exit()
+            self.writer = csv.DictWriter(self.csvfile, delimiter=',',
+                                         fieldnames=SNAPSHOT_FIELDNAMES)
+            self.writer.writeheader()
+
+    def write(self, stream_stats, force=False):
+        now = time.time()
+        if not force and now - self.last_snapshot_time < self.interval:
+            return
+        self.last_snapshot_time = now
+        snapshot = stream_stats.snapshot()
+        self.logger.info("Stats snapshot:\n" + StreamStats.format_snapshot(snapshot))
+        if self.writer is not None:
+            for s in snapshot:
+                self.writer.writerow(dict(s, time=now))
+            self.csvfile.flush()
+
+    def close(self):
+        if self.csvfile is not None:
+            self.csvfile.close()
+
+
+def live_stats(stream, event, event_close, pairs, interval, snapshot_filename, log_lvl_number):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        stream.set_timeouts({'descriptions': 1, 'events': 0.1})
+        writer = SnapshotWriter(interval, snapshot_filename, log_lvl_number)
+        stream_stats = StreamStats(pairs)
+        event.set()
+
+        while True:
+            try:
+                bytes = stream.recv_desc()
+                break
+            except StreamError as err:
+                if err.args[1] == StreamError.TIMEOUT_MSG:
+                    if event_close.is_set():
+                        writer.logger.info("Module closed before receiving event descriptions.")
+                        sys.exit()
+                    continue
+                writer.logger.error("Receiving error: {}. Exiting".format(err))
+                sys.exit()
+        registered_events_types = dict((int(k), EventType.deserialize(v))
+                                       for k, v in json.loads(bytes.decode()).items())
+        stream_stats.set_registered_events_types(registered_events_types)
+        codec = TrackedEventCodec(registered_events_types)
+
+        while not event_close.is_set():
+            try:
+                stream_stats.add(codec.decode(stream.recv_ev()))
+            except StreamError as err:
+                if err.args[1] != StreamError.TIMEOUT_MSG:
+                    writer.logger.error("Receiving error: {}. Exiting".format(err))
+                    break
+            writer.write(stream_stats)
+
+        stream_stats.flush()
+        writer.write(stream_stats, force=True)
+        writer.close()
+    except Exception as e:
+        print("[ERROR] Unhandled exception in Profiler live stats module: {}".format(e))
+
+
+def stats_from_dataset(dataset_name, pairs, snapshot_filename, log_lvl_number):
+    events = load_dataset(dataset_name)
+    stream_stats = StreamStats(pairs)
+    stream_stats.set_registered_events_types(events.registered_events_types)
+    for i in range(len(events)):
+        stream_stats.add(events.get_tracked_event(i))
+    stream_stats.flush()
+    writer = SnapshotWriter(0, snapshot_filename, log_lvl_number)
+    writer.write(stream_stats, force=True)
+    writer.close()
+
+
+def main():
+    signal.signal(signal.SIGINT, signal_handler)
+
+    parser = argparse.ArgumentParser(
+        description='Calculating statistics of time between events in real time.',
+        allow_abbrev=False)
+    parser.add_argument('dataset_name', help='Name of dataset')
+    parser.add_argument('--pair', nargs=2, action='append', required=True,
+                        metavar=('START_EVENT', 'END_EVENT'),
+                        help='Measured pair of events, given as '
+                             '<event_name>[:submit|proc_start|proc_end] '
+                             '(submit is used by default)')
+    parser.add_argument('--max_gap', type=float, default=1.0,
+                        help='Maximum time between paired events [s]')
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help='Time between stats snapshots [s]')
+    parser.add_argument('--snapshot_file', help='CSV file for stats snapshots')
+    parser.add_argument('--from_files', action='store_true',
+                        help='Calculate stats of saved dataset instead of collecting data')
+    parser.add_argument('--stream', choices=STREAM_BACKENDS.keys(), default='pipe',
+                        help='Transport used between processes: multiprocessing pipes '
+                             'or shared memory ring buffers')
+    parser.add_argument('--log', help='Log level')
+    args = parser.parse_args()
+
+    if args.log is not None:
+        log_lvl_number = int(getattr(logging, args.log.upper(), None))
+    else:
+        log_lvl_number = logging.INFO
+
+    pairs = [PairStats(*parse_pair_event(start), *parse_pair_event(end), args.max_gap)
+             for start, end in args.pair]
+
+    if args.from_files:
+        stats_from_dataset(args.dataset_name, pairs, args.snapshot_file, log_lvl_number)
+        return
+
+    # Events are made to ensure that stats and ModelCreator are initialized before Rtt2Stream starts sending data.
+    event_stats = Event()
+    event_model_creator = Event()
+    # Setting these events results in closing corresponding modules.
+    event_close_rtt2stream = Event()
+    event_close_model_creator = Event()
+    event_close_stats = Event()
+
+    streams = STREAM_BACKENDS[args.stream].create_stream(3)
+
+    processes = []
+    processes.append((Process(target=rtt2stream,
+                              args=(streams[0], event_stats, event_model_creator,
+                                    event_close_rtt2stream, log_lvl_number),
+                              daemon=True),
+                      event_close_rtt2stream))
+    processes.append((Process(target=model_creator,
+                              args=(streams[1], event_model_creator, event_close_model_creator,
+                                    args.dataset_name, log_lvl_number),
+                              daemon=True),
+                      event_close_model_creator))
+    processes.append((Process(target=live_stats,
+                              args=(streams[2], event_stats, event_close_stats, pairs,
+                                    args.interval, args.snapshot_file, log_lvl_number),
+                              daemon=True),
+                      event_close_stats))
+
+    for p, _ in processes:
+        p.start()
+
+    global is_waiting
+    while is_waiting:
+        for p, _ in processes:
+            p.join(timeout=0.5)
+            # Terminate other processes if one of the processes is not active.
+            if len(processes) > len(active_children()):
+                is_waiting = False
+                break
+
+    for p, event_close in processes:
+        if p.is_alive():
+            event_close.set()
+            # Ensure that we stop processes in order to prevent nrf_profiler data drop.
+            p.join()
+
+    for stream in streams:
+        stream.release()
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,25 @@
 # SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
 
 from processed_events import ProcessedEvents
-from events import Event, EventType, TrackedEvent
+from events import EventType
+from columnar_events import ColumnarEvents, load_dataset, columnar_dataset_exists, \
+    COLUMNAR_DATASET_EXTENSION
 import argparse
+import csv
+import os
 import numpy as np
 
 
-INTERP_OUT_OF_RANGE_VAL = -1
+TIME_DIFF = 0.5
+WRITE_CHUNK_SIZE = 2**16
 
 def sync_peripheral_ts(ts_peripheral, sync_ts_peripheral, sync_ts_central):
     MSE_THRESH = 1e-9
     # Predict using linear regression only if the Mean Squared Error is low.
     # In general, using Crystal Oscillator results in lower MSE and using
     # RC oscillator results in higher MSE.
+    # Missing timestamps are NaN and stay NaN. Timestamps that are out of
+    # interpolation range are also changed to NaN.
     model = np.polyfit(sync_ts_peripheral, sync_ts_central, 1)
     predictor = np.poly1d(model)
 
@@ -23,13 +30,170 @@ def sync_peripheral_ts(ts_peripheral, sync_ts_peripheral, sync_ts_central):
     mse = np.square(np.subtract(sync_ts_central, new_sync_ts_peripheral)).mean()
     if mse < MSE_THRESH:
         print('Use linear regression')
-        return predictor(ts_peripheral[list(list(elem is not None for elem in row) for row in ts_peripheral)])
+        return predictor(ts_peripheral)
     else:
         print('Use piecewise linear interpolation')
-        return np.interp(np.array(ts_peripheral[list(list(elem is not None for elem in row) for row in ts_peripheral)],
-                                  dtype='float64'),
-                         sync_ts_peripheral, sync_ts_central,
-                         left=INTERP_OUT_OF_RANGE_VAL, right=INTERP_OUT_OF_RANGE_VAL)
+        return np.interp(ts_peripheral, sync_ts_peripheral, sync_ts_central,
+                         left=np.nan, right=np.nan)
+
+
+def load_merged_dataset(dataset_name):
+    if not columnar_dataset_exists(dataset_name) and \
+            not (os.path.isfile(dataset_name + ".csv") and os.path.isfile(dataset_name + ".json")):
+        raise ValueError("Dataset not found: " + dataset_name)
+    events = load_dataset(dataset_name)
+    if len(events) == 0:
+        raise ValueError("Dataset is empty: " + dataset_name)
+    return events
+
+
+def get_sync_timestamps(events, sync_event_name):
+    sync_event_id = events.get_event_type_id(sync_event_name)
+    if sync_event_id is None:
+        raise ValueError("Event name not found: " + sync_event_name)
+    sync_ts = np.sort(events.timestamp[events.type_id == sync_event_id])
+    if len(sync_ts) < 2:
+        raise ValueError("Not enough synchronization events: " + sync_event_name)
+    return sync_ts
+
+
+def match_sync_timestamps(sync_ts_peripheral, sync_ts_central):
+    # Sync events may be missed at the beginning of one of the measurements.
+    # Intervals between sync events are used to find matching ones.
+    rounded_diffs_central = np.round(np.diff(sync_ts_central), 1)
+    rounded_diffs_peripheral = np.round(np.diff(sync_ts_peripheral), 1)
+
+    shifts_c = np.flatnonzero(rounded_diffs_central == rounded_diffs_peripheral[0])
+    shifts_p = np.flatnonzero(rounded_diffs_peripheral == rounded_diffs_central[0])
+    if len(shifts_c) == 0 or len(shifts_p) == 0:
+        raise ValueError("Intervals between synchronization events do not match")
+    shift_c = shifts_c[0]
+    shift_p = shifts_p[0]
+
+    if shift_c < shift_p:
+        sync_ts_central = sync_ts_central[shift_c:]
+    elif shift_p < shift_c:
+        sync_ts_peripheral = sync_ts_peripheral[shift_p:]
+
+    length = min(len(sync_ts_central), len(sync_ts_peripheral))
+    return sync_ts_peripheral[:length], sync_ts_central[:length]
+
+
+class MergedDevice():
+    """Dataset of one device with timestamps in the time base of the result."""
+
+    def __init__(self, events, suffix, type_id_offset, timestamp,
+                 proc_start_time, proc_end_time, valid):
+        self.events = events
+        self.suffix = suffix
+        self.type_id_offset = type_id_offset
+        self.timestamp = timestamp
+        self.proc_start_time = proc_start_time
+        self.proc_end_time = proc_end_time
+        self.valid = valid
+
+    @staticmethod
+    def create(events, suffix, type_id_offset, sync_ts=None):
+        timestamps = np.stack((events.timestamp, events.proc_start_time, events.proc_end_time))
+        if sync_ts is not None:
+            new_timestamps = sync_peripheral_ts(timestamps, *sync_ts)
+            # Drop events that were out of interpolation range
+            present = ~np.isnan(timestamps)
+            valid = ~np.any(present & np.isnan(new_timestamps), axis=0)
+            timestamps = new_timestamps
+        else:
+            valid = np.ones(len(events), dtype=bool)
+        return MergedDevice(events, suffix, type_id_offset, *timestamps, valid)
+
+    def filter_time_window(self, start_time, end_time):
+        # Filter out events that are out of synchronization period
+        last_time = np.where(np.isnan(self.proc_end_time), self.timestamp, self.proc_end_time)
+        self.valid &= (self.timestamp >= start_time) & (last_time <= end_time)
+
+    def registered_events_types(self):
+        return dict((k + self.type_id_offset,
+                     EventType(v.name + self.suffix, v.data_types, v.data_descriptions))
+                    for k, v in self.events.registered_events_types.items())
+
+    def columns(self):
+        idx = np.flatnonzero(self.valid)
+        return (self.events.type_id[idx] + self.type_id_offset,
+                self.timestamp[idx],
+                self.proc_start_time[idx],
+                self.proc_end_time[idx],
+                self.events.data_row[idx])
+
+
+def write_csv(devices, registered_events_types, filename_events, filename_event_types):
+    result_events = ProcessedEvents()
+    result_events.registered_events_types = registered_events_types
+    csvfile = result_events.init_writing_data_to_files(filename_events, filename_event_types)
+    writer = csv.writer(csvfile, delimiter=',')
+
+    for device in devices:
+        data_tables = dict((k + device.type_id_offset, v.tolist())
+                           for k, v in device.events.data_tables.items())
+        columns = device.columns()
+        for chunk_start in range(0, len(columns[0]), WRITE_CHUNK_SIZE):
+            chunk = [c[chunk_start:chunk_start + WRITE_CHUNK_SIZE].tolist() for c in columns]
+            writer.writerows(
+                (type_id, timestamp, list(data_tables[type_id][data_row]),
+                 None if start != start else start, None if end != end else end)
+                for type_id, timestamp, start, end, data_row in zip(*chunk))
+
+    result_events.finish_writing_data_to_files(csvfile, filename_events, filename_event_types)
+
+
+def to_columnar(devices, registered_events_types):
+    columns = [device.columns() for device in devices]
+    data_tables = {}
+    for device in devices:
+        data_tables.update((k + device.type_id_offset, v)
+                           for k, v in device.events.data_tables.items())
+    return ColumnarEvents(registered_events_types,
+                          *[np.concatenate(c) for c in zip(*columns)],
+                          data_tables)
+
+
+def merge_datasets(central_dataset, central_sync_event, central_suffix, peripherals,
+                   result_dataset, columnar=False):
+    """Merge datasets of Central and Peripherals into a single dataset.
+
+    Peripherals are given as list of (dataset name, sync event name, suffix
+    added to event names) tuples. Peripheral timestamps are converted to
+    the time base of Central. Raises ValueError if the datasets cannot be
+    merged.
+    """
+    evt_central = load_merged_dataset(central_dataset)
+    sync_ts_central = get_sync_timestamps(evt_central, central_sync_event)
+
+    # Reindexing, renaming and compensating time differences for peripheral events
+    type_id_offset = max(evt_central.registered_events_types) + 1
+    start_time = -np.inf
+    end_time = np.inf
+    devices = []
+    for dataset, sync_event, suffix in peripherals:
+        evt_peripheral = load_merged_dataset(dataset)
+        sync_ts = match_sync_timestamps(get_sync_timestamps(evt_peripheral, sync_event),
+                                        sync_ts_central)
+        devices.append(MergedDevice.create(evt_peripheral, suffix, type_id_offset, sync_ts))
+        type_id_offset += max(evt_peripheral.registered_events_types) + 1
+
+        start_time = max(start_time, sync_ts[1][0] - TIME_DIFF)
+        end_time = min(end_time, sync_ts[1][-1] + TIME_DIFF)
+
+    devices.append(MergedDevice.create(evt_central, central_suffix, 0))
+
+    all_registered_events_types = {}
+    for device in devices:
+        device.filter_time_window(start_time, end_time)
+        all_registered_events_types.update(device.registered_events_types())
+
+    write_csv(devices, all_registered_events_types,
+              result_dataset + ".csv", result_dataset + ".json")
+    if columnar:
+        to_columnar(devices, all_registered_events_types).write(
+            result_dataset + COLUMNAR_DATASET_EXTENSION)
 
 
 def main():
@@ -44,101 +208,20 @@ def main():
     parser.add_argument("central_sync_event",
                         help="Event used for synchronization - Central")
     parser.add_argument("result_dataset", help="Name for result dataset")
+    parser.add_argument("--peripheral", nargs=2, action="append", default=[],
+                        metavar=("DATASET", "SYNC_EVENT"),
+                        help="Additional Peripheral dataset and its synchronization event. "
+                             "Names of its events get _peripheral<N> suffix (N starts from 2)")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Additionally save result dataset in columnar format")
     args = parser.parse_args()
 
-    evt_peripheral = ProcessedEvents()
-    evt_peripheral.read_data_from_files(args.peripheral_dataset + ".csv",
-                                        args.peripheral_dataset + ".json")
-
-    evt_central = ProcessedEvents()
-    evt_central.read_data_from_files(args.central_dataset + ".csv",
-                                     args.central_dataset + ".json")
-
-    # Compensating clock drift - based on synchronization events
-    sync_evt_peripheral = evt_peripheral.get_event_type_id(args.peripheral_sync_event)
-    sync_evt_central = evt_central.get_event_type_id(args.central_sync_event)
-
-    sync_peripheral = list(filter(lambda x: x.submit.type_id == sync_evt_peripheral,
-                                  evt_peripheral.tracked_events))
-
-    sync_central = list(filter(lambda x: x.submit.type_id == sync_evt_central,
-                               evt_central.tracked_events))
-
-    ts_peripheral = np.array(list(map(lambda x: list([x.submit.timestamp, x.proc_start_time, x.proc_end_time]),
-                                      evt_peripheral.tracked_events)))
-    sync_ts_peripheral = list(map(lambda x: x.submit.timestamp, sync_peripheral))
-    sync_ts_central = list(map(lambda x: x.submit.timestamp, sync_central))
-
-    sync_diffs_central = np.subtract(sync_ts_central[1:], sync_ts_central[:-1])
-    sync_diffs_peripheral = np.subtract(sync_ts_peripheral[1:], sync_ts_peripheral[:-1])
-
-    rounded_diffs_central = list(map(lambda x: round(x, 1), sync_diffs_central))
-    rounded_diffs_peripheral = list(map(lambda x: round(x, 1), sync_diffs_peripheral))
-
-    shift_c = rounded_diffs_central.index(rounded_diffs_peripheral[0])
-    shift_p = rounded_diffs_peripheral.index(rounded_diffs_central[0])
-
-    if shift_c < shift_p:
-        sync_ts_central = sync_ts_central[shift_c:]
-    elif shift_p < shift_c:
-        sync_ts_peripheral = sync_ts_peripheral[shift_p:]
-
-    if len(sync_ts_central) < len(sync_ts_peripheral):
-        sync_ts_peripheral = sync_ts_peripheral[:len(sync_ts_central)]
-    elif len(sync_ts_peripheral) < len(sync_ts_central):
-        sync_ts_central = sync_ts_central[:len(sync_ts_peripheral)]
-
-    new_ts_peripheral = ts_peripheral.copy()
-    new_ts_peripheral[list(list(elem is not None for elem in row) for row in new_ts_peripheral)] = \
-        sync_peripheral_ts(ts_peripheral, sync_ts_peripheral, sync_ts_central)
-    assert len(new_ts_peripheral) == len(ts_peripheral)
-    # Reindexing, renaming and compensating time differences for peripheral events
-    max_central_id = max([int(i) for i in evt_central.registered_events_types])
-
-    assert len(new_ts_peripheral) == len(evt_peripheral.tracked_events)
-    evt_peripheral.tracked_events = list(map(lambda x, y:
-                                         TrackedEvent(Event(x.submit.type_id + max_central_id + 1, y[0], x.submit.data),
-                                                      y[1],
-                                                      y[2]),
-                                             evt_peripheral.tracked_events, new_ts_peripheral))
-
-    evt_peripheral.registered_events_types = {k + max_central_id + 1 :
-                EventType(v.name + "_peripheral", v.data_types, v.data_descriptions)
-                for k, v in evt_peripheral.registered_events_types.items()}
-
-    evt_central.registered_events_types = {
-                k : EventType(v.name + "_central",
-                              v.data_types, v.data_descriptions)
-                for k, v in evt_central.registered_events_types.items()}
-
-    # Filter out events that are out of synchronization period
-    TIME_DIFF = 0.5
-    start_time = sync_ts_central[0] - TIME_DIFF
-    end_time = sync_ts_central[-1] + TIME_DIFF
-    evt_peripheral.tracked_events = list(filter(lambda x:
-        x.submit.timestamp >= start_time and (x.proc_end_time <= end_time if x.proc_end_time is not None \
-            else x.submit.timestamp <= end_time),
-        evt_peripheral.tracked_events))
-
-    evt_central.tracked_events = list(filter(lambda x:
-        x.submit.timestamp >= start_time and (x.proc_end_time <= end_time if x.proc_end_time is not None \
-            else x.submit.timestamp <= end_time),
-        evt_central.tracked_events))
-
-    # Filter out events that were out of interpolation range
-    evt_peripheral.tracked_events = list(filter(lambda x:
-        INTERP_OUT_OF_RANGE_VAL not in (x.submit.timestamp, x.proc_start_time, x.proc_end_time),
-        evt_peripheral.tracked_events))
-
-    all_registered_events_types = evt_peripheral.registered_events_types.copy()
-    all_registered_events_types.update(evt_central.registered_events_types)
-
-    result_events = ProcessedEvents()
-    result_events.tracked_events = evt_peripheral.tracked_events + evt_central.tracked_events
-    result_events.registered_events_types = all_registered_events_types
+    peripherals = [(args.peripheral_dataset, args.peripheral_sync_event, "_peripheral")]
+    peripherals.extend((dataset, sync_event, "_peripheral{}".format(i + 2))
+                       for i, (dataset, sync_event) in enumerate(args.peripheral))
 
-    result_events.write_data_to_files(args.result_dataset + ".csv",
-                                      args.result_dataset + ".json")
+    merge_datasets(args.central_dataset, args.central_sync_event, "_central", peripherals,
+                   args.result_dataset, args.columnar)
 
     print('Profiler data merged successfully')
 
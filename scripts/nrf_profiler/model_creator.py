@@ -11,7 +11,9 @@ from rtt_nordic_config import RttNordicConfig
 from events import Event, EventType, TrackedEvent, EventsData
 from processed_events import ProcessedEvents
 from stream import StreamError
+from event_decoder import EventDecoder, TrackedEventCodec
 from io import StringIO
+from collections import deque
 import csv
 
 class Command(Enum):
@@ -19,7 +21,67 @@ class Command(Enum):
     STOP = 2
     INFO = 3
 
+class EvictionPolicy(Enum):
+    DROP_OLDEST = 1
+    DROP_NEWEST = 2
+
 NRF_PROFILER_FATAL_ERROR_EVENT_NAME = "_nrf_profiler_fatal_error_event_"
+MAX_PENDING_SUBMITS_DEFAULT = 100000
+
+class PendingSubmits:
+    """Submitted tracked events waiting for their processing start.
+
+    Submits are indexed by memory address of the event (first data field), so
+    matching the event processing start takes constant time. If an address
+    is reused before processing, the most recent submit is matched first.
+    Number of pending submits is limited to max_pending; when the limit is
+    reached, submit selected by eviction_policy is dropped and counted as
+    orphaned.
+    """
+
+    def __init__(self, max_pending=MAX_PENDING_SUBMITS_DEFAULT,
+                 eviction_policy=EvictionPolicy.DROP_OLDEST):
+        self.max_pending = max_pending
+        self.eviction_policy = eviction_policy
+        # Dictionaries preserve insertion order, so the first item is the
+        # oldest pending submit.
+        self.submits = {}
+        self.by_address = {}
+        self.seq = 0
+        self.orphaned = 0
+
+    def __len__(self):
+        return len(self.submits)
+
+    def _evict_oldest(self):
+        seq = next(iter(self.submits))
+        event = self.submits.pop(seq)
+        address = event.data[0]
+        stack = self.by_address[address]
+        stack.popleft()
+        if len(stack) == 0:
+            del self.by_address[address]
+        self.orphaned += 1
+
+    def add(self, event):
+        if self.max_pending is not None and len(self.submits) >= self.max_pending:
+            if self.eviction_policy == EvictionPolicy.DROP_NEWEST:
+                self.orphaned += 1
+                return
+            self._evict_oldest()
+
+        self.submits[self.seq] = event
+        self.by_address.setdefault(event.data[0], deque()).append(self.seq)
+        self.seq += 1
+
+    def pop(self, address):
+        stack = self.by_address.get(address)
+        if stack is None:
+            return None
+        seq = stack.pop()
+        if len(stack) == 0:
+            del self.by_address[address]
+        return self.submits.pop(seq)
 
 class ModelCreator:
 
@@ -29,7 +91,9 @@ class ModelCreator:
                  config=RttNordicConfig,
                  event_filename=None,
                  event_types_filename=None,
-                 log_lvl=logging.INFO):
+                 log_lvl=logging.INFO,
+                 max_pending_submits=MAX_PENDING_SUBMITS_DEFAULT,
+                 eviction_policy=EvictionPolicy.DROP_OLDEST):
 
         self.config = config
         self.event_filename = event_filename
@@ -50,7 +114,7 @@ class ModelCreator:
         self.after_half = False
 
         self.processed_events = ProcessedEvents()
-        self.temp_events = []
+        self.pending_submits = PendingSubmits(max_pending_submits, eviction_policy)
         self.submitted_event_type = None
         self.raw_data = EventsData([], {})
         self.event_processing_start_id = None
@@ -58,8 +122,8 @@ class ModelCreator:
         self.submit_event = None
         self.start_event = None
 
-        self.bufs = list()
-        self.bcnt = 0
+        self.decoder = None
+        self.codec = None
 
         self.logger = logging.getLogger('Profiler model creator')
         self.logger_console = logging.StreamHandler()
@@ -69,29 +133,19 @@ class ModelCreator:
         self.logger.addHandler(self.logger_console)
 
     def shutdown(self):
+        if self.pending_submits.orphaned > 0 or len(self.pending_submits) > 0:
+            self.logger.warning("Submits without processing: {} dropped, {} pending".format(
+                                self.pending_submits.orphaned, len(self.pending_submits)))
         if self.csvfile is not None:
             self.processed_events.finish_writing_data_to_files(self.csvfile,
                                                                self.event_filename,
                                                                self.event_types_filename)
 
-    def _get_buffered_data(self, num_bytes):
-        buf = bytearray()
-        while len(buf) < num_bytes:
-            tbuf = self.bufs[0]
-            size = num_bytes - len(buf)
-            if len(tbuf) <= size:
-                buf.extend(tbuf)
-                del self.bufs[0]
-            else:
-                buf.extend(tbuf[0:size])
-                self.bufs[0] = tbuf[size:]
-        self.bcnt -= num_bytes
-        return buf
-
-    def _read_bytes(self, num_bytes):
+    def _read_events(self):
         while True:
-            if self.bcnt >= num_bytes:
-                break
+            events = self.decoder.decode()
+            if len(events) > 0:
+                return events
             try:
                 buf = self.stream.recv_ev()
             except StreamError as err:
@@ -102,10 +156,7 @@ class ModelCreator:
                 self.logger.error("Receiving error: {}".format(err))
                 self.close()
             if len(buf) > 0:
-                self.bufs.append(buf)
-                self.bcnt += len(buf)
-
-        return self._get_buffered_data(num_bytes)
+                self.decoder.feed(buf)
 
     def _timestamp_from_ticks(self, clock_ticks):
         ts_ticks_aggregated = self.timestamp_overflows * self.config['timestamp_raw_max']
@@ -146,7 +197,11 @@ class ModelCreator:
         self.event_processing_end_id = \
             self.raw_data.get_event_type_id('event_processing_end')
 
+        self.decoder = EventDecoder(self.raw_data.registered_events_types,
+                                    self.config['byteorder'])
+
         if self.sending:
+            self.codec = TrackedEventCodec(self.processed_events.registered_events_types)
             event_types_dict = dict((k, v.serialize())
                     for k, v in self.processed_events.registered_events_types.items())
             json_et_string = json.dumps(event_types_dict)
@@ -156,20 +211,7 @@ class ModelCreator:
                 self.logger.error("Sending error: {}. Cannot send descriptions.".format(err))
                 sys.exit()
 
-    def _read_single_event(self):
-        id = int.from_bytes(
-            self._read_bytes(1),
-            byteorder=self.config['byteorder'],
-            signed=False)
-        et = self.raw_data.registered_events_types[id]
-
-        buf = self._read_bytes(4)
-        timestamp_raw = (
-            int.from_bytes(
-                buf,
-                byteorder=self.config['byteorder'],
-                signed=False))
-
+    def _create_event(self, id, timestamp_raw, data):
         if self.after_half \
         and timestamp_raw < 0.4 * self.config['timestamp_raw_max']:
             self.timestamp_overflows += 1
@@ -179,62 +221,11 @@ class ModelCreator:
             self.after_half = True
 
         timestamp = self._timestamp_from_ticks(timestamp_raw)
-
-        def process_int32(self, data):
-            buf = self._read_bytes(4)
-            data.append(int.from_bytes(buf, byteorder=self.config['byteorder'],
-                                       signed=True))
-
-        def process_uint32(self, data):
-            buf = self._read_bytes(4)
-            data.append(int.from_bytes(buf, byteorder=self.config['byteorder'],
-                                       signed=False))
-
-        def process_int16(self, data):
-            buf = self._read_bytes(2)
-            data.append(int.from_bytes(buf, byteorder=self.config['byteorder'],
-                                       signed=True))
-
-        def process_uint16(self, data):
-            buf = self._read_bytes(2)
-            data.append(int.from_bytes(buf, byteorder=self.config['byteorder'],
-                                       signed=False))
-
-        def process_int8(self, data):
-            buf = self._read_bytes(1)
-            data.append(int.from_bytes(buf, byteorder=self.config['byteorder'],
-                                       signed=True))
-
-        def process_uint8(self, data):
-            buf = self._read_bytes(1)
-            data.append(int.from_bytes(buf, byteorder=self.config['byteorder'],
-                                       signed=False))
-
-        def process_string(self, data):
-            buf = self._read_bytes(1)
-            buf = self._read_bytes(int.from_bytes(buf, byteorder=self.config['byteorder'],
-                                                  signed=False))
-            data.append(buf.decode())
-
-        READ_BYTES = {
-            "u8": process_uint8,
-            "s8": process_int8,
-            "u16": process_uint16,
-            "s16": process_int16,
-            "u32": process_uint32,
-            "s32": process_int32,
-            "s": process_string,
-            "t": process_uint32
-        }
-        data=[]
-        for event_data_type in et.data_types:
-            READ_BYTES[event_data_type](self, data)
         return Event(id, timestamp, data)
 
     def _send_event(self, tracked_event):
-        event_string = tracked_event.serialize()
         try:
-            self.stream.send_ev(event_string.encode())
+            self.stream.send_ev(self.codec.encode(tracked_event))
         except StreamError as err:
             self.logger.error("Sending error: {}. Cannot send event.".format(err))
             self.close()
@@ -252,46 +243,47 @@ class ModelCreator:
                 self.event_filename,
                 self.event_types_filename)
         while True:
-            event = self._read_single_event()
-            if self.raw_data.registered_events_types[event.type_id].name == NRF_PROFILER_FATAL_ERROR_EVENT_NAME:
-                self.logger.error("Fatal error of Profiler on device! Event has been dropped. "
-                                  "Data buffer has overflown. No more events will be received.")
-
-            if event.type_id == self.event_processing_start_id:
-                self.start_event = event
-                for i in range(len(self.temp_events) - 1, -1, -1):
-                    # comparing memory addresses of event processing start
-                    # and event submit to identify matching events
-                    if self.temp_events[i].data[0] == self.start_event.data[0]:
-                        self.submit_event = self.temp_events[i]
-                        self.submitted_event_type = self.submit_event.type_id
-                        del self.temp_events[i]
-                        break
-
-            elif event.type_id == self.event_processing_end_id:
-                # comparing memory addresses of event processing start and
-                # end to identify matching events
-                if self.submitted_event_type is not None and event.data[0] \
-                            == self.start_event.data[0]:
-                    tracked_event = TrackedEvent(
-                            self.submit_event,
-                            self.start_event.timestamp,
-                            event.timestamp)
-                    if self.csvfile is not None:
-                        self._write_event_to_file(self.csvfile, tracked_event)
-                    if self.sending:
-                        self._send_event(tracked_event)
-                    self.submitted_event_type = None
-
-            elif not self.processed_events.is_event_tracked(event.type_id):
-                tracked_event = TrackedEvent(event, None, None)
+            for id, timestamp_raw, data in self._read_events():
+                self._process_event(self._create_event(id, timestamp_raw, data))
+
+    def _process_event(self, event):
+        if self.raw_data.registered_events_types[event.type_id].name == NRF_PROFILER_FATAL_ERROR_EVENT_NAME:
+            self.logger.error("Fatal error of Profiler on device! Event has been dropped. "
+                              "Data buffer has overflown. No more events will be received.")
+
+        if event.type_id == self.event_processing_start_id:
+            self.start_event = event
+            # comparing memory addresses of event processing start
+            # and event submit to identify matching events
+            submit_event = self.pending_submits.pop(self.start_event.data[0])
+            if submit_event is not None:
+                self.submit_event = submit_event
+                self.submitted_event_type = self.submit_event.type_id
+
+        elif event.type_id == self.event_processing_end_id:
+            # comparing memory addresses of event processing start and
+            # end to identify matching events
+            if self.submitted_event_type is not None and event.data[0] \
+                        == self.start_event.data[0]:
+                tracked_event = TrackedEvent(
+                        self.submit_event,
+                        self.start_event.timestamp,
+                        event.timestamp)
                 if self.csvfile is not None:
                     self._write_event_to_file(self.csvfile, tracked_event)
                 if self.sending:
                     self._send_event(tracked_event)
+                self.submitted_event_type = None
+
+        elif not self.processed_events.is_event_tracked(event.type_id):
+            tracked_event = TrackedEvent(event, None, None)
+            if self.csvfile is not None:
+                self._write_event_to_file(self.csvfile, tracked_event)
+            if self.sending:
+                self._send_event(tracked_event)
 
-            else:
-                self.temp_events.append(event)
+        else:
+            self.pending_submits.add(event)
 
     def start(self):
         self.transmit_all_events_descriptions()
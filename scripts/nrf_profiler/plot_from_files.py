@@ -21,8 +21,7 @@ def main():
         log_lvl_number = logging.WARNING
 
     pn = PlotNordic(log_lvl=log_lvl_number)
-    pn.read_data_from_files(args.dataset_name + ".csv",
-                            args.dataset_name + ".json")
+    pn.read_dataset(args.dataset_name)
     pn.plot_events_from_file()
 
 if __name__ == "__main__":
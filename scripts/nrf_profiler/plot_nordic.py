@@ -4,21 +4,23 @@
 # SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
 
 import matplotlib
-from matplotlib.collections import PatchCollection
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from matplotlib.widgets import Button
 from enum import Enum
 
-import numpy as np
 import sys
 import time
 import logging
 import json
 
 from processed_events import ProcessedEvents, EM_MEM_ADDRESS_DATA_DESC
-from events import TrackedEvent, EventType
+from columnar_events import load_dataset
+from events import EventType
 from stream import StreamError
+from event_decoder import TrackedEventCodec
+from event_index import EventIndex
+from timeline_renderer import TimelineRenderer
 from plot_nordic_config import PlotNordicConfig
 
 class MouseButton(Enum):
@@ -70,8 +72,12 @@ class PlotNordic():
             self.plot_config['event_processing_rect_height'],
             self.plot_config['event_submit_markersize'])
         self.ani = None
+        self.codec = None
         self.close_event_flag = False
         self.processed_events = ProcessedEvents()
+        self.columnar_events = None
+        self.event_index = EventIndex()
+        self.renderer = None
 
         if stream is not None:
             timeouts = {
@@ -94,10 +100,21 @@ class PlotNordic():
 
 
     def read_data_from_files(self, events_filename, events_types_filename):
+        self.columnar_events = None
         self.processed_events.read_data_from_files(
             events_filename, events_types_filename)
         if not self.processed_events.verify():
             self.logger.warning("Missing event descriptions")
+        self.event_index = EventIndex.build(self.processed_events.tracked_events)
+
+    def read_dataset(self, dataset_name):
+        # Events are drawn and indexed directly from the columns, tracked
+        # event objects are created only for the selected event.
+        self.columnar_events = load_dataset(dataset_name)
+        self.processed_events = ProcessedEvents()
+        self.processed_events.registered_events_types = \
+            dict(self.columnar_events.registered_events_types)
+        self.event_index = EventIndex.build_columnar(self.columnar_events)
 
     def on_click_start_stop(self, event):
         if self.draw_state.paused:
@@ -205,26 +222,15 @@ class PlotNordic():
             self.draw_state.timeline_max -
             self.draw_state.timeline_width,
             self.draw_state.timeline_max)
+        self._render_events()
         plt.draw()
 
+    def _render_events(self):
+        self.renderer.render(self.draw_state.timeline_max - self.draw_state.timeline_width,
+                             self.draw_state.timeline_max)
+
     def _find_closest_event(self, x_coord, y_coord):
-        filtered_id = list(filter(lambda x: x.submit.type_id == round(y_coord),
-                                    self.processed_events.tracked_events))
-        if len(filtered_id) == 0:
-            return None
-        if not self.processed_events.is_event_tracked(round(y_coord)):
-            dists = list(map(lambda x: abs(x.submit.timestamp - x_coord), filtered_id))
-            return filtered_id[np.argmin(dists)]
-        else:
-            matching_processing = list(
-                filter(
-                    lambda x: x.proc_start_time < x_coord < x.proc_end_time,
-                    filtered_id))
-            if matching_processing:
-                return matching_processing[0]
-            dists = list(map(lambda x: min([abs(x.submit.timestamp - x_coord),
-                                abs(x.proc_start_time - x_coord), abs(x.proc_end_time - x_coord)]), filtered_id))
-            return filtered_id[np.argmin(dists)]
+        return self.event_index.find_closest(round(y_coord), x_coord)
 
     @staticmethod
     def _stringify_time(time_seconds):
@@ -344,6 +350,7 @@ class PlotNordic():
                         self.draw_state.timeline_max -
                         self.draw_state.timeline_width,
                         self.draw_state.timeline_max)
+                    self._render_events()
                     plt.draw()
 
         if event.button == MouseButton.RIGHT.value:
@@ -390,8 +397,8 @@ class PlotNordic():
         self.close_event_flag = True
 
     def animate_events_real_time(self, fig):
-        rects = []
         events = []
+        tracked_events = []
         #Receive events
         while True:
             try:
@@ -402,23 +409,12 @@ class PlotNordic():
                 self.logger.error("Receiving error: {}. Exiting".format(err))
                 self.close_event(None)
                 sys.exit()
-            data_str = data.decode()
-            tracked_event = TrackedEvent.deserialize(data_str)
+            tracked_event = self.codec.decode(data)
 
             events.append(tracked_event.submit)
+            tracked_events.append(tracked_event)
             self.processed_events.tracked_events.append(tracked_event)
-
-            if tracked_event.proc_start_time is not None:
-                assert tracked_event.proc_end_time is not None
-                rects.append(
-                    matplotlib.patches.Rectangle(
-                        (tracked_event.proc_start_time,
-                            tracked_event.submit.type_id -
-                            self.draw_state.event_processing_rect_height/2),
-                        tracked_event.proc_end_time -
-                        tracked_event.proc_start_time,
-                        self.draw_state.event_processing_rect_height,
-                        edgecolor='black'))
+            self.event_index.add(tracked_event)
 
         # translating plot
         if not self.draw_state.synchronized_with_events:
@@ -441,17 +437,8 @@ class PlotNordic():
                 self.draw_state.timeline_max)
 
         # plotting events
-        y = list(map(lambda x: x.type_id, events))
-        x = list(map(lambda x: x.timestamp, events))
-        self.draw_state.ax.plot(
-            x,
-            y,
-            marker='o',
-            linestyle=' ',
-            color='r',
-            markersize=self.draw_state.event_submit_markersize)
-
-        self.draw_state.ax.add_collection(PatchCollection(rects))
+        self.renderer.add_events(tracked_events)
+        self._render_events()
         plt.gcf().canvas.flush_events()
         if self.event_close.is_set():
             self.close_event(None)
@@ -480,11 +467,15 @@ class PlotNordic():
         if self.processed_events.registered_events_types is None:
             self.logger.error("Event descriptors not sent properly")
             sys.exit()
+        self.codec = TrackedEventCodec(self.processed_events.registered_events_types)
         if selected_events_types is None:
             selected_events_types = list(
                 self.processed_events.registered_events_types.keys())
 
         fig = self._prepare_plot(selected_events_types)
+        self.renderer = TimelineRenderer(self.draw_state.ax,
+                                         self.draw_state.event_processing_rect_height,
+                                         self.draw_state.event_submit_markersize)
 
         self.start_stop_ax = plt.axes([0.8, 0.025, 0.1, 0.04])
         self.start_stop_button = Button(self.start_stop_ax, 'Start/Stop')
@@ -500,7 +491,11 @@ class PlotNordic():
     def plot_events_from_file(
             self, selected_events_types=None, one_line=False):
         self.draw_state.paused = True
-        if len(self.processed_events.tracked_events) == 0 or \
+        if self.columnar_events is not None:
+            events_count = len(self.columnar_events)
+        else:
+            events_count = len(self.processed_events.tracked_events)
+        if events_count == 0 or \
                 len(self.processed_events.registered_events_types) == 0:
             self.logger.error("Please read some events data before plotting")
 
@@ -509,34 +504,19 @@ class PlotNordic():
                 self.processed_events.registered_events_types.keys())
 
         self._prepare_plot(selected_events_types)
+        self.renderer = TimelineRenderer(self.draw_state.ax,
+                                         self.draw_state.event_processing_rect_height,
+                                         self.draw_state.event_submit_markersize)
+        if self.columnar_events is not None:
+            self.renderer.add_columnar(self.columnar_events)
+        else:
+            self.renderer.add_events(self.processed_events.tracked_events)
 
-        x = list(map(lambda x: x.submit.timestamp, self.processed_events.tracked_events))
-        y = list(map(lambda x: x.submit.type_id, self.processed_events.tracked_events))
-        self.draw_state.ax.plot(
-            x,
-            y,
-            marker='o',
-            linestyle=' ',
-            color='r',
-            markersize=self.draw_state.event_submit_markersize)
-
-        rects = []
-        for ev in self.processed_events.tracked_events:
-            if ev.proc_start_time is None:
-                continue
-            rects.append(
-                matplotlib.patches.Rectangle(
-                    (ev.proc_start_time,
-                        ev.submit.type_id - self.draw_state.event_processing_rect_height/2),
-                        ev.proc_end_time - ev.proc_start_time,
-                        self.draw_state.event_processing_rect_height,
-                        edgecolor='black'))
-
-        self.draw_state.ax.add_collection(PatchCollection(rects))
-
-        self.draw_state.timeline_max = max(x) + 1
-        self.draw_state.timeline_width = max(x) - min(x) + 2
-        self.draw_state.ax.set_xlim([min(x) - 1, max(x) + 1])
+        x_min, x_max = self.renderer.time_range()
+        self.draw_state.timeline_max = x_max + 1
+        self.draw_state.timeline_width = x_max - x_min + 2
+        self.draw_state.ax.set_xlim([x_min - 1, x_max + 1])
+        self._render_events()
 
         plt.draw()
         plt.show()
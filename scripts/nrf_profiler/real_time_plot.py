@@ -7,7 +7,7 @@ from multiprocessing import Process, Event, active_children
 import argparse
 import logging
 import signal
-from stream import Stream
+from stream import STREAM_BACKENDS
 from rtt2stream import Rtt2Stream
 from model_creator import ModelCreator
 from plot_nordic import PlotNordic
@@ -57,6 +57,9 @@ def main():
         allow_abbrev=False)
     parser.add_argument('dataset_name', help='Name of dataset')
     parser.add_argument('--log', help='Log level')
+    parser.add_argument('--stream', choices=STREAM_BACKENDS.keys(), default='pipe',
+                        help='Transport used between processes: multiprocessing pipes '
+                             'or shared memory ring buffers')
     args = parser.parse_args()
 
     if args.log is not None:
@@ -72,7 +75,7 @@ def main():
     event_close_model_creator = Event()
     event_close_plot = Event()
 
-    streams = Stream.create_stream(3)
+    streams = STREAM_BACKENDS[args.stream].create_stream(3)
 
     processes = []
     processes.append((Process(target=rtt2stream,
@@ -108,5 +111,8 @@ def main():
             # Ensure that we stop processes in order to prevent nrf_profiler data drop.
             p.join()
 
+    for stream in streams:
+        stream.release()
+
 if __name__ == "__main__":
     main()
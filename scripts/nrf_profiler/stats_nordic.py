@@ -3,8 +3,8 @@
 #
 # SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
 
-from processed_events import ProcessedEvents
-from enum import Enum
+from columnar_events import ColumnarEvents, columnar_dataset_exists, COLUMNAR_DATASET_EXTENSION
+from events import EventState
 import matplotlib.pyplot as plt
 import numpy as np
 import logging
@@ -14,17 +14,14 @@ import os
 OUTPUT_FOLDER = "data_stats/"
 
 
-class EventState(Enum):
-    SUBMIT = 1
-    PROC_START = 2
-    PROC_END = 3
-
-
 class StatsNordic():
     def __init__(self, events_filename, events_types_filename, log_lvl):
         self.data_name = events_filename.split('.')[0]
-        self.processed_data = ProcessedEvents()
-        self.processed_data.read_data_from_files(events_filename, events_types_filename)
+        if columnar_dataset_exists(self.data_name):
+            self.processed_data = ColumnarEvents.read(self.data_name + COLUMNAR_DATASET_EXTENSION)
+        else:
+            self.processed_data = ColumnarEvents.from_csv(events_filename, events_types_filename)
+        self.type_indices = StatsNordic._group_by_type(self.processed_data.type_id)
 
         self.logger = logging.getLogger('Stats Nordic')
         self.logger_console = logging.StreamHandler()
@@ -34,24 +31,32 @@ class StatsNordic():
         self.logger_console.setFormatter(self.log_format)
         self.logger.addHandler(self.logger_console)
 
-    def calculate_stats_preset1(self, start_meas, end_meas):
+    def calculate_stats_preset1(self, start_meas, end_meas, max_gap=float('inf')):
         self.time_between_events("hid_mouse_event_dongle", EventState.SUBMIT,
                                  "hid_report_sent_event_device", EventState.SUBMIT,
-                                 0.05, start_meas, end_meas)
+                                 0.05, start_meas, end_meas, max_gap)
         self.time_between_events("hid_mouse_event_dongle", EventState.SUBMIT,
                                  "hid_report_sent_event_device", EventState.SUBMIT,
-                                 0.05, start_meas, end_meas)
+                                 0.05, start_meas, end_meas, max_gap)
         self.time_between_events("hid_report_sent_event_dongle", EventState.SUBMIT,
                                  "hid_report_sent_event_dongle", EventState.SUBMIT,
-                                 0.05, start_meas, end_meas)
+                                 0.05, start_meas, end_meas, max_gap)
         self.time_between_events("hid_mouse_event_dongle", EventState.SUBMIT,
                                  "hid_report_sent_event_dongle", EventState.SUBMIT,
-                                 0.05, start_meas, end_meas)
+                                 0.05, start_meas, end_meas, max_gap)
         self.time_between_events("hid_mouse_event_device", EventState.SUBMIT,
                                  "hid_mouse_event_dongle", EventState.SUBMIT,
-                                 0.05, start_meas, end_meas)
+                                 0.05, start_meas, end_meas, max_gap)
         plt.show()
 
+    @staticmethod
+    def _group_by_type(type_ids):
+        # Indices of events of every type, grouped once with a single sort.
+        order = np.argsort(type_ids, kind='stable')
+        unique_ids, starts = np.unique(type_ids[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        return dict((int(t), order[s:e]) for t, s, e in zip(unique_ids, starts, ends))
+
     def _get_timestamps(self, event_name, event_state, start_meas, end_meas):
         event_type_id = self.processed_data.get_event_type_id(event_name)
         if event_type_id is None:
@@ -61,37 +66,46 @@ class StatsNordic():
             self.logger.error("This event is not tracked: " + event_name)
             return None
 
-        trackings = list(filter(lambda x:
-                      x.submit.type_id == event_type_id,
-                      self.processed_data.tracked_events))
-
         if not isinstance(event_state, EventState):
             self.logger.error("Event state should be EventState enum")
             return None
 
+        trackings = self.type_indices.get(event_type_id, np.empty(0, dtype=np.intp))
+
         if event_state == EventState.SUBMIT:
-            timestamps = np.fromiter(map(lambda x: x.submit.timestamp, trackings),
-                                     dtype=np.float)
+            timestamps = self.processed_data.timestamp[trackings]
         elif event_state == EventState.PROC_START:
-            timestamps = np.fromiter(map(lambda x: x.proc_start_time, trackings),
-                                     dtype=np.float)
+            timestamps = self.processed_data.proc_start_time[trackings]
         elif event_state == EventState.PROC_END:
-            timestamps = np.fromiter(map(lambda x: x.proc_end_time, trackings),
-                                     dtype=np.float)
+            timestamps = self.processed_data.proc_end_time[trackings]
 
         timestamps = timestamps[np.where((timestamps > start_meas)
                                          & (timestamps < end_meas))]
 
-        return timestamps
+        return np.sort(timestamps)
 
     @staticmethod
-    def calculate_times_between(start_times, end_times):
-        if end_times[0] <= start_times[0]:
-            end_times = end_times[1:]
-        if len(start_times) > len(end_times):
-            start_times = start_times[:-1]
-
-        return (end_times - start_times) * 1000
+    def calculate_times_between(start_times, end_times, max_gap=float('inf')):
+        """Pair every start with the nearest following end.
+
+        Both arrays must be sorted. If more than one start precedes the same
+        end, only the latest start is paired. Pairs separated by more than
+        max_gap seconds are skipped, so dropped events do not shift the
+        pairing. Returns times between paired events in milliseconds.
+        """
+        end_idx = np.searchsorted(end_times, start_times, side='right')
+        valid = end_idx < len(end_times)
+        start_times = start_times[valid]
+        end_idx = end_idx[valid]
+        if len(end_idx) == 0:
+            return np.empty(0)
+
+        latest = np.append(end_idx[1:] != end_idx[:-1], True)
+        start_times = start_times[latest]
+        end_idx = end_idx[latest]
+
+        times_between = end_times[end_idx] - start_times
+        return times_between[times_between <= max_gap] * 1000
 
     @staticmethod
     def prepare_stats_txt(times_between):
@@ -111,7 +125,7 @@ class StatsNordic():
 
     def time_between_events(self, start_event_name, start_event_state,
                             end_event_name, end_event_state, hist_bin_width=0.01,
-                            start_meas=0, end_meas=float('inf')):
+                            start_meas=0, end_meas=float('inf'), max_gap=float('inf')):
         self.logger.info("Stats calculating: {}->{}".format(start_event_name,
                                                             end_event_name))
 
@@ -131,14 +145,15 @@ class StatsNordic():
             self.logger.error("No events logged: " + end_event_name)
             return
 
-        if len(start_times) != len(end_times):
-            self.logger.error("Number of start_times and end_times is not equal")
-            self.logger.error("Got {} start_times and {} end_times".format(
-                len(start_times), len(end_times)))
+        times_between = self.calculate_times_between(start_times, end_times, max_gap)
 
+        if len(times_between) == 0:
+            self.logger.error("No matching pairs of events found")
             return
 
-        times_between = self.calculate_times_between(start_times, end_times)
+        if len(times_between) != len(start_times) or len(times_between) != len(end_times):
+            self.logger.warning("Got {} start_times and {} end_times, paired {}".format(
+                len(start_times), len(end_times), len(times_between)))
         stats_text = self.prepare_stats_txt(times_between)
 
         plt.figure()
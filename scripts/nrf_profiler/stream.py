@@ -3,7 +3,10 @@
 #
 # SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
 
-from multiprocessing import Pipe
+from multiprocessing import Lock, Pipe
+from multiprocessing.shared_memory import SharedMemory
+import struct
+import time
 
 class StreamError(Exception):
     ERROR_MSG = 'error'
@@ -90,3 +93,187 @@ class Stream():
 
     def recv_ev(self):
         return self._receive(self.pipe_recv_ev, self.timeouts['events'])
+
+    def release(self):
+        pass
+
+
+class RingBuffer():
+    """Single-producer/single-consumer ring buffer in shared memory.
+
+    Header holds write position and read position. Positions grow
+    monotonically, only the producer updates write position and only the
+    consumer updates read position. Every message is stored as u32 length
+    followed by the payload and may wrap around the end of the buffer.
+
+    Positions are stored and loaded under a lock, which also orders the
+    accesses to the payload on weakly ordered CPUs. Each side keeps the last
+    known position of the other side and reloads it only when the buffer
+    seems to be full or empty, so usually one lock is taken per message.
+    """
+    HEADER = struct.Struct('QQ')
+    WRITE_POS_OFFSET = 0
+    READ_POS_OFFSET = 8
+    POS = struct.Struct('Q')
+    MSG_LEN = struct.Struct('I')
+
+    def __init__(self, capacity):
+        self.shm = SharedMemory(create=True, size=RingBuffer.HEADER.size + capacity)
+        RingBuffer.HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        self.capacity = capacity
+        self.lock = Lock()
+        # Producer side positions
+        self.write_pos = 0
+        self.known_read_pos = 0
+        # Consumer side positions
+        self.read_pos = 0
+        self.known_write_pos = 0
+
+    def _get_pos(self, offset):
+        with self.lock:
+            return RingBuffer.POS.unpack_from(self.shm.buf, offset)[0]
+
+    def _set_pos(self, offset, pos):
+        with self.lock:
+            RingBuffer.POS.pack_into(self.shm.buf, offset, pos)
+
+    def get_read_pos(self):
+        return self._get_pos(RingBuffer.READ_POS_OFFSET)
+
+    def _copy_in(self, pos, data):
+        buf = self.shm.buf
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        buf[RingBuffer.HEADER.size + start:RingBuffer.HEADER.size + start + first] = data[:first]
+        if first < len(data):
+            buf[RingBuffer.HEADER.size:RingBuffer.HEADER.size + len(data) - first] = data[first:]
+
+    def _copy_out(self, pos, size):
+        buf = self.shm.buf
+        start = pos % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(buf[RingBuffer.HEADER.size + start:RingBuffer.HEADER.size + start + first])
+        if first < size:
+            data += bytes(buf[RingBuffer.HEADER.size:RingBuffer.HEADER.size + size - first])
+        return data
+
+    def write(self, data):
+        """Write message to the buffer. Returns False if there is no space."""
+        needed = RingBuffer.MSG_LEN.size + len(data)
+        if needed > self.capacity:
+            raise StreamError('Message does not fit in shared memory buffer.',
+                              StreamError.ERROR_MSG)
+        write_pos = self.write_pos
+        if self.capacity - (write_pos - self.known_read_pos) < needed:
+            self.known_read_pos = self.get_read_pos()
+            if self.capacity - (write_pos - self.known_read_pos) < needed:
+                return False
+        self._copy_in(write_pos, RingBuffer.MSG_LEN.pack(len(data)))
+        self._copy_in(write_pos + RingBuffer.MSG_LEN.size, data)
+        # Publish the message only after it is completely written.
+        self.write_pos = write_pos + needed
+        self._set_pos(RingBuffer.WRITE_POS_OFFSET, self.write_pos)
+        return True
+
+    def read(self):
+        """Read message from the buffer. Returns None if the buffer is empty."""
+        read_pos = self.read_pos
+        if self.known_write_pos == read_pos:
+            self.known_write_pos = self._get_pos(RingBuffer.WRITE_POS_OFFSET)
+            if self.known_write_pos == read_pos:
+                return None
+        size = RingBuffer.MSG_LEN.unpack(self._copy_out(read_pos, RingBuffer.MSG_LEN.size))[0]
+        data = self._copy_out(read_pos + RingBuffer.MSG_LEN.size, size)
+        # Free the space only after the message is completely read.
+        self.read_pos = read_pos + RingBuffer.MSG_LEN.size + size
+        self._set_pos(RingBuffer.READ_POS_OFFSET, self.read_pos)
+        return data
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedMemoryStream(Stream):
+    """Stream passing events through shared memory ring buffers.
+
+    Events are not pickled and do not require a system call per message.
+    Event descriptions are sent once, so they still use pipes.
+    Sending fails if the buffer is full and the consumer has not read
+    anything for 'send' timeout (SEND_TIMEOUT by default), because the
+    consumer might have exited.
+    """
+    RING_CAPACITY = 2**22
+    POLL_INTERVAL = 0.001
+    SEND_TIMEOUT = 10
+
+    @staticmethod
+    def create_stream(num, ring_capacity=RING_CAPACITY):
+        assert num > 1
+        streams = []
+        pipes_desc_pairs = []
+        rings_ev = []
+        for i in range(num - 1):
+            pipes_desc_pairs.append(Pipe(False))
+            rings_ev.append(RingBuffer(ring_capacity))
+        for i in range(num):
+            if i == 0:
+                streams.append(SharedMemoryStream(pipe_send_desc=pipes_desc_pairs[0][1],
+                                                  ring_send_ev=rings_ev[0]))
+            elif i == num - 1:
+                streams.append(SharedMemoryStream(pipe_recv_desc=pipes_desc_pairs[-1][0],
+                                                  ring_recv_ev=rings_ev[-1]))
+            else:
+                streams.append(SharedMemoryStream(pipe_recv_desc=pipes_desc_pairs[i - 1][0],
+                                                  ring_recv_ev=rings_ev[i - 1],
+                                                  pipe_send_desc=pipes_desc_pairs[i][1],
+                                                  ring_send_ev=rings_ev[i]))
+
+        return streams
+
+    def __init__(self, pipe_recv_desc=None, ring_recv_ev=None, timeouts=None,
+                 pipe_send_desc=None, ring_send_ev=None):
+        super().__init__(pipe_recv_desc=pipe_recv_desc, timeouts=timeouts,
+                         pipe_send_desc=pipe_send_desc)
+        self.ring_recv_ev = ring_recv_ev
+        self.ring_send_ev = ring_send_ev
+
+    def send_ev(self, bytes):
+        if self.ring_send_ev is None:
+            raise StreamError('Ring buffer for sending is not created.', StreamError.ERROR_MSG)
+        timeout = self.timeouts.get('send', SharedMemoryStream.SEND_TIMEOUT)
+        read_pos = self.ring_send_ev.get_read_pos()
+        start_time = time.time()
+        while not self.ring_send_ev.write(bytes):
+            if self.ring_send_ev.get_read_pos() != read_pos:
+                read_pos = self.ring_send_ev.get_read_pos()
+                start_time = time.time()
+            elif time.time() - start_time >= timeout:
+                raise StreamError('Timeout reached on sending end of ring buffer.',
+                                  StreamError.TIMEOUT_MSG)
+            time.sleep(SharedMemoryStream.POLL_INTERVAL)
+
+    def recv_ev(self):
+        if self.ring_recv_ev is None:
+            raise StreamError('Ring buffer for receiving is not created.', StreamError.ERROR_MSG)
+        timeout = self.timeouts['events']
+        start_time = time.time()
+        while True:
+            bytes = self.ring_recv_ev.read()
+            if bytes is not None:
+                return bytes
+            if timeout is not None and time.time() - start_time >= timeout:
+                raise StreamError('Timeout reached on receiving end of ring buffer.',
+                                  StreamError.TIMEOUT_MSG)
+            time.sleep(SharedMemoryStream.POLL_INTERVAL)
+
+    def release(self):
+        # Shared memory is released by the process that created the streams.
+        if self.ring_send_ev is not None:
+            self.ring_send_ev.release()
+
+
+STREAM_BACKENDS = {
+    'pipe': Stream,
+    'shm': SharedMemoryStream,
+}
@@ -0,0 +1,229 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+from events import EventState
+import heapq
+import math
+
+EVENT_STATE_NAMES = {
+    'submit': EventState.SUBMIT,
+    'proc_start': EventState.PROC_START,
+    'proc_end': EventState.PROC_END,
+}
+
+SNAPSHOT_FIELDNAMES = ['time', 'pair', 'count', 'mean', 'std', 'min', 'max',
+                       'p50', 'p90', 'p99', 'dropped_starts']
+
+
+class LogHistogram():
+    """Histogram with logarithmic buckets (HDR histogram style).
+
+    Every bucket covers values with the same relative width, so quantiles are
+    approximated with given relative precision. Memory usage depends only on
+    the range of recorded values, not on the number of records.
+    """
+
+    def __init__(self, precision=0.01):
+        self.log_base = math.log1p(precision)
+        self.buckets = {}
+        self.count = 0
+
+    def add(self, value):
+        if value > 0:
+            idx = math.floor(math.log(value) / self.log_base)
+        else:
+            # Non-positive durations are collected in a single bucket.
+            idx = None
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+        self.count += 1
+
+    def _bucket_value(self, idx):
+        if idx is None:
+            return 0.0
+        # Middle of the bucket
+        return math.exp((idx + 0.5) * self.log_base)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float('nan')
+        rank = q * (self.count - 1)
+        cumulative = 0
+        keys = sorted(self.buckets, key=lambda k: -math.inf if k is None else k)
+        for k in keys:
+            cumulative += self.buckets[k]
+            if cumulative > rank:
+                return self._bucket_value(k)
+        return self._bucket_value(keys[-1])
+
+
+class RunningStats():
+    """Count, mean, variance (Welford's algorithm), extremes and quantiles."""
+
+    def __init__(self, precision=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.histogram = LogHistogram(precision)
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.histogram.add(value)
+
+    def std(self):
+        if self.count == 0:
+            return float('nan')
+        return math.sqrt(self.m2 / self.count)
+
+
+class PairStats():
+    """Statistics of time between start and end event occurrences.
+
+    Occurrences do not arrive in timestamp order (for example submits of
+    tracked events arrive after their processing), so they are kept sorted in
+    a reorder window of max_gap seconds before pairing. Pairing is the same as
+    in StatsNordic.calculate_times_between: every end is paired with the
+    latest start before it, and pairs more than max_gap apart are skipped.
+    """
+    # Ends are processed before starts with the same timestamp, as an end
+    # must be later than the paired start.
+    END = 0
+    START = 1
+
+    def __init__(self, start_event_name, start_event_state,
+                 end_event_name, end_event_state, max_gap=1.0, precision=0.01):
+        self.start_event_name = start_event_name
+        self.start_event_state = start_event_state
+        self.end_event_name = end_event_name
+        self.end_event_state = end_event_state
+        self.max_gap = max_gap
+
+        self.window = []
+        self.latest_timestamp = float('-inf')
+        self.last_start = None
+        self.dropped_starts = 0
+        self.stats = RunningStats(precision)
+
+    def name(self):
+        return "{}:{}->{}:{}".format(self.start_event_name,
+                                     self.start_event_state.name.lower(),
+                                     self.end_event_name,
+                                     self.end_event_state.name.lower())
+
+    def _pair(self, timestamp, kind):
+        if kind == PairStats.START:
+            if self.last_start is not None:
+                self.dropped_starts += 1
+            self.last_start = timestamp
+            return
+        if self.last_start is None:
+            return
+        gap = timestamp - self.last_start
+        self.last_start = None
+        if gap > self.max_gap:
+            self.dropped_starts += 1
+            return
+        # Durations are reported in milliseconds.
+        self.stats.add(gap * 1000)
+
+    def _add(self, timestamp, kind):
+        heapq.heappush(self.window, (timestamp, kind))
+        self.latest_timestamp = max(self.latest_timestamp, timestamp)
+        while self.window and self.latest_timestamp - self.window[0][0] > self.max_gap:
+            self._pair(*heapq.heappop(self.window))
+
+    def add_start(self, timestamp):
+        self._add(timestamp, PairStats.START)
+
+    def add_end(self, timestamp):
+        self._add(timestamp, PairStats.END)
+
+    def flush(self):
+        """Pair all occurrences in the reorder window."""
+        while self.window:
+            self._pair(*heapq.heappop(self.window))
+
+    def snapshot(self):
+        histogram = self.stats.histogram
+        return {
+            'pair': self.name(),
+            'count': self.stats.count,
+            'mean': self.stats.mean if self.stats.count > 0 else float('nan'),
+            'std': self.stats.std(),
+            'min': self.stats.min if self.stats.count > 0 else float('nan'),
+            'max': self.stats.max if self.stats.count > 0 else float('nan'),
+            'p50': histogram.quantile(0.5),
+            'p90': histogram.quantile(0.9),
+            'p99': histogram.quantile(0.99),
+            'dropped_starts': self.dropped_starts,
+        }
+
+
+class StreamStats():
+    """Updates statistics of event pairs with every tracked event."""
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self.registered_events_types = None
+        # Type id -> list of (event state, callback) pairs
+        self.handlers = {}
+
+    def set_registered_events_types(self, registered_events_types):
+        self.registered_events_types = registered_events_types
+        type_ids = dict((v.name, k) for k, v in registered_events_types.items())
+        self.handlers = {}
+        for pair in self.pairs:
+            for name, state, callback in ((pair.start_event_name, pair.start_event_state,
+                                           pair.add_start),
+                                          (pair.end_event_name, pair.end_event_state,
+                                           pair.add_end)):
+                if name not in type_ids:
+                    raise ValueError("Event name not found: " + name)
+                self.handlers.setdefault(type_ids[name], []).append((state, callback))
+
+    def add(self, tracked_event):
+        handlers = self.handlers.get(tracked_event.submit.type_id)
+        if handlers is None:
+            return
+        for state, callback in handlers:
+            if state == EventState.SUBMIT:
+                timestamp = tracked_event.submit.timestamp
+            elif state == EventState.PROC_START:
+                timestamp = tracked_event.proc_start_time
+            else:
+                timestamp = tracked_event.proc_end_time
+            if timestamp is not None:
+                callback(timestamp)
+
+    def flush(self):
+        for pair in self.pairs:
+            pair.flush()
+
+    def snapshot(self):
+        return [pair.snapshot() for pair in self.pairs]
+
+    @staticmethod
+    def format_snapshot(snapshot):
+        lines = []
+        for s in snapshot:
+            lines.append("{}: count={} mean={:.3f}ms std={:.3f}ms min={:.3f}ms max={:.3f}ms "
+                         "p50={:.3f}ms p90={:.3f}ms p99={:.3f}ms dropped_starts={}".format(
+                         s['pair'], s['count'], s['mean'], s['std'], s['min'], s['max'],
+                         s['p50'], s['p90'], s['p99'], s['dropped_starts']))
+        return '\n'.join(lines)
+
+
+def parse_pair_event(arg):
+    """Parse event given as <event_name>[:submit|proc_start|proc_end]."""
+    name, _, state = arg.rpartition(':')
+    if name and state in EVENT_STATE_NAMES:
+        return name, EVENT_STATE_NAMES[state]
+    return arg, EventState.SUBMIT
@@ -0,0 +1,49 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+import random
+import numpy as np
+from columnar_events import ColumnarEvents
+from event_index import EventIndex
+from events import Event, EventType, TrackedEvent
+from processed_events import ProcessedEvents, EM_MEM_ADDRESS_DATA_DESC
+
+
+def create_processed_events():
+    rng = random.Random(0)
+    processed_events = ProcessedEvents()
+    processed_events.registered_events_types = {
+        0: EventType('submit_only', ['u8'], ['value']),
+        1: EventType('tracked', ['u32', 'u8'], [EM_MEM_ADDRESS_DATA_DESC, 'value']),
+    }
+    for i in range(200):
+        timestamp = rng.uniform(0, 10)
+        if i % 2 == 0:
+            ev = TrackedEvent(Event(0, timestamp, [i % 256]), None, None)
+        else:
+            start = i * 0.05
+            ev = TrackedEvent(Event(1, timestamp, [i, i % 256]), start, start + 0.01)
+        processed_events.tracked_events.append(ev)
+    return processed_events
+
+
+def test_columnar_index_same_as_objects():
+    processed_events = create_processed_events()
+    columnar = ColumnarEvents.from_processed_events(processed_events)
+    index = EventIndex.build(processed_events.tracked_events)
+    columnar_index = EventIndex.build_columnar(columnar)
+
+    for x in np.linspace(-1, 11, 500):
+        for type_id in (0, 1, 2):
+            expected = index.find_closest(type_id, x)
+            found = columnar_index.find_closest(type_id, x)
+            if expected is None:
+                assert found is None
+                continue
+            assert found.submit.type_id == expected.submit.type_id
+            assert found.submit.timestamp == expected.submit.timestamp
+            assert found.submit.data == expected.submit.data
+            assert found.proc_start_time == expected.proc_start_time
+            assert found.proc_end_time == expected.proc_end_time
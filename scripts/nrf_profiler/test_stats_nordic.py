@@ -0,0 +1,23 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+import numpy as np
+from stats_nordic import StatsNordic
+
+
+def test_times_between_pairs_latest_start():
+    times = StatsNordic.calculate_times_between(np.array([1., 1.5, 3.]), np.array([2., 4.]))
+    assert np.allclose(times, [500., 1000.])
+
+
+def test_times_between_no_end_after_start():
+    # Start logged right before the capture stops
+    times = StatsNordic.calculate_times_between(np.array([5.]), np.array([2., 4.]))
+    assert len(times) == 0
+
+
+def test_times_between_no_events():
+    assert len(StatsNordic.calculate_times_between(np.empty(0), np.array([2., 4.]))) == 0
+    assert len(StatsNordic.calculate_times_between(np.array([1.]), np.empty(0))) == 0
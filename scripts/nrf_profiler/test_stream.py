@@ -0,0 +1,29 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+import pytest
+from stream import SharedMemoryStream, StreamError
+
+
+def test_shm_stream_send_and_receive():
+    sender, receiver = SharedMemoryStream.create_stream(2, ring_capacity=64)
+    try:
+        for i in range(100):
+            sender.send_ev(bytes([i] * 10))
+            assert receiver.recv_ev() == bytes([i] * 10)
+    finally:
+        sender.release()
+
+
+def test_shm_stream_send_fails_without_consumer():
+    sender, _ = SharedMemoryStream.create_stream(2, ring_capacity=64)
+    sender.set_timeouts({'descriptions': None, 'events': None, 'send': 0.1})
+    try:
+        with pytest.raises(StreamError) as err:
+            for _ in range(10):
+                sender.send_ev(bytes(10))
+        assert err.value.args[1] == StreamError.TIMEOUT_MSG
+    finally:
+        sender.release()
@@ -0,0 +1,54 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+import random
+import numpy as np
+from events import EventState
+from stats_nordic import StatsNordic
+from stream_stats import PairStats
+
+
+def create_pair_stats(max_gap):
+    return PairStats('start', EventState.SUBMIT, 'end', EventState.SUBMIT, max_gap)
+
+
+def test_pair_stats_out_of_order():
+    pair = create_pair_stats(max_gap=1.0)
+    # The end arrives before its start, and the start at 0.6 has no end.
+    pair.add_end(0.5)
+    pair.add_start(0.2)
+    pair.add_start(0.6)
+    pair.add_start(2.0)
+    pair.add_end(2.3)
+    pair.flush()
+    assert pair.stats.count == 2
+    assert np.isclose(pair.stats.min, 300)
+    assert np.isclose(pair.stats.max, 300)
+    assert pair.dropped_starts == 1
+
+
+def test_pair_stats_same_as_offline():
+    rng = random.Random(0)
+    max_gap = 0.05
+    starts = np.sort(np.array([rng.uniform(0, 10) for _ in range(1000)]))
+    ends = np.sort(np.array([rng.uniform(0, 10) for _ in range(800)]))
+    # Occurrences are shuffled, but never delayed by more than max_gap.
+    occurrences = sorted([(t, t + rng.uniform(0, max_gap / 2), True) for t in starts] +
+                         [(t, t + rng.uniform(0, max_gap / 2), False) for t in ends],
+                         key=lambda x: x[1])
+
+    pair = create_pair_stats(max_gap)
+    for timestamp, _, is_start in occurrences:
+        if is_start:
+            pair.add_start(timestamp)
+        else:
+            pair.add_end(timestamp)
+    pair.flush()
+
+    expected = StatsNordic.calculate_times_between(starts, ends, max_gap)
+    assert pair.stats.count == len(expected)
+    assert np.isclose(pair.stats.mean, np.mean(expected))
+    assert np.isclose(pair.stats.min, np.min(expected))
+    assert np.isclose(pair.stats.max, np.max(expected))
@@ -0,0 +1,201 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+from matplotlib.collections import PolyCollection
+import numpy as np
+
+
+class GrowableArray():
+    """NumPy array with amortized constant time append."""
+
+    def __init__(self, dtype=np.float64, capacity=1024):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            new_data = np.empty(max(needed, 2 * len(self.data)), dtype=self.data.dtype)
+            new_data[:self.size] = self.data[:self.size]
+            self.data = new_data
+        self.data[self.size:needed] = values
+        self.size = needed
+
+    def view(self):
+        return self.data[:self.size]
+
+    def set(self, values):
+        self.size = 0
+        self.extend(values)
+
+
+class TypeTimeline():
+    """Submit timestamps and processing intervals of one event type.
+
+    Submits are kept sorted by timestamp and processing intervals by start
+    time, so the visible window is selected with np.searchsorted.
+    """
+
+    def __init__(self):
+        self.submits = GrowableArray()
+        self.proc_starts = GrowableArray()
+        self.proc_ends = GrowableArray()
+
+    @staticmethod
+    def _add_sorted(keys, values, others=()):
+        keys_view = keys.view()
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        order = np.argsort(values, kind='stable')
+        values = values[order]
+        others = [(array, np.asarray(o, dtype=np.float64)[order]) for array, o in others]
+        in_order = len(keys_view) == 0 or values[0] >= keys_view[-1]
+
+        keys.extend(values)
+        for array, o in others:
+            array.extend(o)
+
+        if not in_order:
+            # Events arrived out of order, restore sorting of the whole array.
+            order = np.argsort(keys.view(), kind='stable')
+            keys.set(keys.view()[order])
+            for array, _ in others:
+                array.set(array.view()[order])
+
+    def add(self, submits, proc_starts, proc_ends):
+        TypeTimeline._add_sorted(self.submits, submits)
+        TypeTimeline._add_sorted(self.proc_starts, proc_starts, ((self.proc_ends, proc_ends),))
+
+
+class TimelineRenderer():
+    """Draws events on timeline with level of detail adapted to zoom.
+
+    Only events in the visible window are drawn. If there are more events
+    than pixel columns, events are binned per pixel column: a single marker
+    is drawn for every column with at least one submit and processing
+    intervals are merged into one bar per run of covered columns. Artists
+    are created once and reused on every redraw.
+    """
+
+    # Draw exact events if there are less of them than this many per pixel column.
+    EXACT_EVENTS_PER_COLUMN = 2
+
+    def __init__(self, ax, event_processing_rect_height, event_submit_markersize):
+        self.ax = ax
+        self.rect_height = event_processing_rect_height
+        self.timelines = {}
+
+        self.submit_line, = ax.plot([], [], marker='o', linestyle=' ', color='r',
+                                    markersize=event_submit_markersize)
+        self.processing = PolyCollection([], edgecolor='black')
+        ax.add_collection(self.processing)
+
+    def _add_type(self, type_id, submits, proc_starts, proc_ends):
+        timeline = self.timelines.get(type_id)
+        if timeline is None:
+            timeline = TypeTimeline()
+            self.timelines[type_id] = timeline
+        timeline.add(submits, proc_starts, proc_ends)
+
+    def add_events(self, tracked_events):
+        grouped = {}
+        for ev in tracked_events:
+            submits, proc_starts, proc_ends = grouped.setdefault(ev.submit.type_id,
+                                                                  ([], [], []))
+            submits.append(ev.submit.timestamp)
+            if ev.proc_start_time is not None:
+                proc_starts.append(ev.proc_start_time)
+                proc_ends.append(ev.proc_end_time)
+
+        for type_id, (submits, proc_starts, proc_ends) in grouped.items():
+            self._add_type(type_id, submits, proc_starts, proc_ends)
+
+    def add_columnar(self, events):
+        """Add all events of ColumnarEvents directly from its columns."""
+        order = np.argsort(events.type_id, kind='stable')
+        type_ids, starts = np.unique(events.type_id[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for type_id, start, end in zip(type_ids, starts, ends):
+            rows = order[start:end]
+            proc_starts = events.proc_start_time[rows]
+            processed = ~np.isnan(proc_starts)
+            self._add_type(int(type_id), events.timestamp[rows], proc_starts[processed],
+                           events.proc_end_time[rows][processed])
+
+    def time_range(self):
+        mins = [t.submits.view()[0] for t in self.timelines.values() if t.submits.size > 0]
+        maxs = [t.submits.view()[-1] for t in self.timelines.values() if t.submits.size > 0]
+        if len(mins) == 0:
+            return None
+        return min(mins), max(maxs)
+
+    @staticmethod
+    def _runs(covered):
+        # Start and end indices of runs of True values
+        edges = np.diff(np.concatenate(([0], covered.astype(np.int8), [0])))
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    def _submits_in_window(self, timeline, xmin, xmax, columns):
+        submits = timeline.submits.view()
+        lo, hi = np.searchsorted(submits, (xmin, xmax))
+        visible = submits[lo:hi]
+        if len(visible) <= TimelineRenderer.EXACT_EVENTS_PER_COLUMN * columns:
+            return visible
+        column_width = (xmax - xmin) / columns
+        bins = np.unique(((visible - xmin) / column_width).astype(np.int64))
+        return xmin + (bins + 0.5) * column_width
+
+    def _intervals_in_window(self, timeline, xmin, xmax, columns):
+        starts = timeline.proc_starts.view()
+        ends = timeline.proc_ends.view()
+        hi = np.searchsorted(starts, xmax)
+        # Intervals of one type do not overlap, so only the one starting
+        # before xmin can reach into the window.
+        lo = max(np.searchsorted(starts, xmin) - 1, 0)
+        starts = starts[lo:hi]
+        ends = ends[lo:hi]
+        visible = ends > xmin
+        starts = starts[visible]
+        ends = ends[visible]
+        if len(starts) <= TimelineRenderer.EXACT_EVENTS_PER_COLUMN * columns:
+            return starts, ends
+
+        column_width = (xmax - xmin) / columns
+        first = np.clip(((starts - xmin) / column_width).astype(np.int64), 0, columns - 1)
+        last = np.clip(((ends - xmin) / column_width).astype(np.int64), 0, columns - 1)
+        coverage = np.zeros(columns + 1, dtype=np.int64)
+        np.add.at(coverage, first, 1)
+        np.add.at(coverage, last + 1, -1)
+        run_starts, run_ends = TimelineRenderer._runs(np.cumsum(coverage[:-1]) > 0)
+        return xmin + run_starts * column_width, xmin + run_ends * column_width
+
+    def render(self, xmin, xmax):
+        columns = max(int(self.ax.get_window_extent().width), 1)
+
+        xs = []
+        ys = []
+        verts = []
+        for type_id, timeline in self.timelines.items():
+            submits = self._submits_in_window(timeline, xmin, xmax, columns)
+            xs.append(submits)
+            ys.append(np.full(len(submits), type_id))
+
+            starts, ends = self._intervals_in_window(timeline, xmin, xmax, columns)
+            y0 = type_id - self.rect_height / 2
+            y1 = type_id + self.rect_height / 2
+            rects = np.empty((len(starts), 4, 2))
+            rects[:, 0, 0] = starts
+            rects[:, 1, 0] = starts
+            rects[:, 2, 0] = ends
+            rects[:, 3, 0] = ends
+            rects[:, (0, 3), 1] = y0
+            rects[:, (1, 2), 1] = y1
+            verts.append(rects)
+
+        if len(xs) > 0:
+            self.submit_line.set_data(np.concatenate(xs), np.concatenate(ys))
+            self.processing.set_verts(np.concatenate(verts))
@@ -5,9 +5,14 @@
 # SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
 
 import argparse
+import copy
+import hashlib
+import itertools
+import json
 import yaml
 from os import path
 import sys
+from contextlib import redirect_stdout
 from pprint import pformat
 from io import StringIO
 
@@ -15,7 +20,16 @@ PERMITTED_STR_KEYS = ['size', 'region']
 END_TO_START = 'end_to_start'
 START_TO_END = 'start_to_end'
 COMPLEX = 'complex'
+SOLVER_GRAPH = 'graph'
+SOLVER_ITERATIVE = 'iterative'
+SOLVER_COMPARE = 'compare'
+SOLVERS = [SOLVER_GRAPH, SOLVER_ITERATIVE, SOLVER_COMPARE]
 INVALID_ONE_OF_PROPERTIES = ['placement']
+MAX_ALIGNMENT_ATTEMPTS = 1000
+# Groups of partitions up to this size are searched exhaustively by the placement optimizer.
+MAX_OPTIMIZER_GROUP_SIZE = 6
+# Increment when format of the cache file changes.
+CACHE_VERSION = 1
 
 ALIGNMENT_ERROR = """Unable to fulfill alignment requirement automatically.
 Please re-size the configured partition sizes to get a valid configuration.
@@ -39,6 +53,12 @@ class PartitionError(Exception):
     pass
 
 
+# Placement solver used by resolve(), set by the '--placement-solver' argument.
+placement_solver = SOLVER_GRAPH
+# Search for the order of ambiguous partitions with least padding, set by the '--optimize-placement' argument.
+optimize_placement = False
+
+
 def remove_item_not_in_list(list_to_remove_from, list_to_check, dp):
     to_remove = [x for x in list_to_remove_from.copy() if x not in list_to_check and x != dp]
     list(map(list_to_remove_from.remove, to_remove))
@@ -104,33 +124,35 @@ def resolve_one_of(reqs, partitions, invalid=False):
                 reqs[k] = [i if i not in to_remove else to_add.pop(0) for i in v]
 
 
-def remove_all_zero_sized_partitions(reqs, dp, system_reqs, to_delete=None):
-    first = False
-    if to_delete is None:
-        to_delete = list()
-        first = True
-
-    for k, v in reqs.items():
-        if 'size' in v and v['size'] == 0:
-            to_delete.append(k)
-            remove_all_zero_sized_partitions({k: v for k, v in reqs.items() if k not in to_delete},
-                dp, {k: v for k, v in system_reqs.items() if k not in to_delete}, to_delete)
-        if 'share_size' in v.keys():
-            non_zero_partitions = [p for p in system_reqs if 'size' not in system_reqs[p] or system_reqs[p]['size'] != 0]
-            actual_partitions = v['share_size'] if not isinstance(v['share_size'], dict) else v['share_size']['one_of']
-            remove_item_not_in_list(actual_partitions, non_zero_partitions, dp)
-            if not v['share_size'] or ('one_of' in v['share_size'] and len(v['share_size']['one_of']) == 0):
-                del v['share_size']
-                if 'size' not in v.keys():
-                    # The partition has no size, delete it, and rerun this function with the new reqs.
-                    to_delete.append(k)
-                    remove_all_zero_sized_partitions({k: v for k, v in reqs.items() if k not in to_delete},
-                        dp, {k: v for k, v in system_reqs.items() if k not in to_delete}, to_delete)
-
-    if first and to_delete:
-        for k in list(set(to_delete)):
-            print(f"Dropping partition '{k}' since its size is 0.")
-            del reqs[k]
+def remove_all_zero_sized_partitions(reqs, dp, system_reqs):
+    to_delete = list()
+
+    # Removing a partition can leave other partitions without any partition to share size with, so
+    # repeat until no more partitions are removed.
+    found = True
+    while found:
+        found = False
+        non_zero_partitions = [p for p in system_reqs if p not in to_delete and
+                               ('size' not in system_reqs[p] or system_reqs[p]['size'] != 0)]
+        for k, v in reqs.items():
+            if k in to_delete:
+                continue
+            if 'size' in v and v['size'] == 0:
+                to_delete.append(k)
+                found = True
+            if 'share_size' in v.keys():
+                actual_partitions = v['share_size'] if not isinstance(v['share_size'], dict) else v['share_size']['one_of']
+                remove_item_not_in_list(actual_partitions, non_zero_partitions, dp)
+                if not v['share_size'] or ('one_of' in v['share_size'] and len(v['share_size']['one_of']) == 0):
+                    del v['share_size']
+                    if 'size' not in v.keys():
+                        # The partition has no size, delete it.
+                        to_delete.append(k)
+                        found = True
+
+    for k in to_delete:
+        print(f"Dropping partition '{k}' since its size is 0.")
+        del reqs[k]
 
 
 def remove_irrelevant_requirements(reqs, system_reqs, dp):
@@ -176,8 +198,9 @@ def get_images_which_need_resolving(reqs, sub_partitions):
     for sub in sorted_subs:
         result = [part for part in sub['span'] if part in unsorted and part not in result] + result
 
-    # Lastly, place non-partitioned parts at the front.
-    result = [part for part in unsorted if part not in result] + result
+    # Lastly, place non-partitioned parts at the front. Sort them by name so the order (and therefore
+    # the solution) does not depend on the iteration order of the set.
+    result = [part for part in sorted(unsorted) if part not in result] + result
 
     return result
 
@@ -208,6 +231,95 @@ def solve_direction(reqs, sub_partitions, unsolved, solution, ab):
             current = pool[current_index]
 
 
+def solve_iterative(reqs, sub_partitions, unsolved, solution):
+    while unsolved:
+        current_len = len(unsolved)
+        solve_direction(reqs, sub_partitions, unsolved, solution, 'before')
+        solve_direction(reqs, sub_partitions, unsolved, solution, 'after')
+        if current_len == len(unsolved):
+            raise PartitionError('Unable to solve the following partitions (endless loop):\n'
+                                 + pformat(unsolved))
+
+
+def get_placement_graph(reqs, unsolved):
+    # Map each partition (or sub partition) to the partitions which are placed directly
+    # before/after it, in the order of 'unsolved'.
+    graph = {'before': dict(), 'after': dict()}
+    for name in unsolved:
+        for ab in ['before', 'after']:
+            if ab in reqs[name].get('placement', {}):
+                graph[ab].setdefault(reqs[name]['placement'][ab][0], list()).append(name)
+    return graph
+
+
+def get_unreachable_partitions(graph, sub_partitions, unsolved, solution):
+    # Topological traversal of the placement graph starting from the partitions which are already
+    # placed. A sub partition can be used as an anchor as soon as one of its parts is placed.
+    reached = set(solution)
+    owners = dict()
+    for sub, value in sub_partitions.items():
+        for part in value['span']:
+            owners.setdefault(part, list()).append(sub)
+    queue = list(solution)
+    while queue:
+        current = queue.pop()
+        for anchor in [current] + [sub for sub in owners.get(current, []) if sub not in reached]:
+            reached.add(anchor)
+            for ab in ['before', 'after']:
+                for dependent in graph[ab].get(anchor, []):
+                    if dependent not in reached:
+                        reached.add(dependent)
+                        queue.append(dependent)
+    return [x for x in unsolved if x not in reached]
+
+
+def solve_graph(reqs, sub_partitions, unsolved, solution):
+    """
+    Place all partitions in 'unsolved' into 'solution' using the placement graph.
+
+    Partitions are inserted next to their anchors in the same order as the
+    'before'/'after' passes of solve_iterative() insert them, so the resulting
+    layout is identical, but each pass only visits the dependents of each
+    anchor instead of searching through all unsolved partitions.
+    """
+    graph = get_placement_graph(reqs, unsolved)
+    unreachable = get_unreachable_partitions(graph, sub_partitions, unsolved, solution)
+    if unreachable:
+        raise PartitionError('Unable to solve the following partitions (endless loop):\n'
+                             + pformat(unreachable))
+
+    placed = set(solution)
+    spans = {k: set(v['span']) for k, v in sub_partitions.items()}
+    remaining = len(unsolved)
+
+    def next_dependent(ab, current):
+        dependents = graph[ab].get(current)
+        while dependents and dependents[0] in placed:
+            dependents.pop(0)
+        return dependents[0] if dependents else None
+
+    while remaining:
+        for ab in ['before', 'after']:
+            for current in solution + list(sub_partitions.keys()):
+                dependent = next_dependent(ab, current)
+                while dependent:
+                    # Place based on current, or based on the first/last element in the span of current.
+                    if current in placed:
+                        index = solution.index(current)
+                    else:
+                        parts = [i for i, solved in enumerate(solution) if solved in spans[current]]
+                        if not parts:
+                            break
+                        index = parts[0] if ab == 'before' else parts[-1]
+                    solution.insert(index if ab == 'before' else index + 1, dependent)
+                    placed.add(dependent)
+                    remaining -= 1
+                    current = dependent
+                    dependent = next_dependent(ab, current)
+
+    unsolved.clear()
+
+
 def solve_inside(reqs, sub_partitions):
     for key, value in reqs.items():
         if 'inside' in value.keys():
@@ -242,7 +354,7 @@ def clean_sub_partitions(reqs, sub_partitions):
             for part in (part for part in value['span'] if part in sub_partitions):
                 value['span'].extend(sub_partitions[part]['span'])
                 value['span'].remove(part)
-                value['span'] = list(set(value['span']))  # remove duplicates
+                value['span'] = list(dict.fromkeys(value['span']))  # remove duplicates, keep the order
                 done = False
             for part in (part for part in value['span'] if part not in sub_partitions and part not in reqs):
                 value['span'].remove(part)
@@ -259,11 +371,10 @@ def convert_str_to_list(with_str):
             with_str[k].append(v)
 
 
-def resolve_ambiguous_requirements(reqs, unsolved):
+def get_ambiguous_partitions(reqs, unsolved):
     """
     Find partitions where the requirements are identical, and therefore
-    ambiguous. For all partitions with identical requirements, introduce
-    requirements so that the partitions have unique placements(sorted by name).
+    ambiguous. Returns a list of groups (sorted by name) of such partitions.
     """
 
     buckets = dict()
@@ -273,23 +384,33 @@ def resolve_ambiguous_requirements(reqs, unsolved):
             buckets[key] = list()
         buckets[key].append(partition)
 
-    for partitions in buckets.values():
-        if len(partitions) > 1:
-            # Two or more partitions share the same requirement, update the
-            # requirements to ensure explicit order.
-            partitions = sorted(partitions)
-            for i in range(len(partitions) - 1):
-                reqs[partitions[i]].setdefault('placement', {})['before'] = [partitions[i + 1]]
-                # Remove any 'after' specs so there are not both a 'before' and 'after', since that
-                # causes one of them to be ignored, in this case the 'before'.
-                reqs[partitions[i]]['placement'].pop('after', None)
+    return [sorted(partitions) for partitions in buckets.values() if len(partitions) > 1]
 
 
-def resolve(reqs, dp, system_reqs = None):
-    if system_reqs is None:
-        system_reqs = reqs
+def resolve_ambiguous_requirements(reqs, unsolved, orders=None):
+    """
+    Find partitions where the requirements are identical, and therefore
+    ambiguous. For all partitions with identical requirements, introduce
+    requirements so that the partitions have unique placements(sorted by name,
+    unless 'orders' maps the sorted group to a different order).
+    """
+
+    for partitions in get_ambiguous_partitions(reqs, unsolved):
+        # Two or more partitions share the same requirement, update the
+        # requirements to ensure explicit order.
+        if orders and tuple(partitions) in orders:
+            partitions = orders[tuple(partitions)]
+        for i in range(len(partitions) - 1):
+            reqs[partitions[i]].setdefault('placement', {})['before'] = [partitions[i + 1]]
+            # Remove any 'after' specs so there are not both a 'before' and 'after', since that
+            # causes one of them to be ignored, in this case the 'before'.
+            reqs[partitions[i]]['placement'].pop('after', None)
+
+
+def prepare_reqs(reqs, dp, system_reqs):
+    # Clean up the requirements and move the sub partitions out of 'reqs'. Returns the sub partitions
+    # and the partitions which need to be placed.
     convert_str_to_list(reqs)
-    solution = ["start", dp, "end"]
 
     remove_irrelevant_requirements(reqs, system_reqs, dp)
     sub_partitions = {k: v for k, v in reqs.items() if 'span' in v}
@@ -300,20 +421,40 @@ def resolve(reqs, dp, system_reqs = None):
     solve_inside(reqs, sub_partitions)
     clean_sub_partitions(reqs, sub_partitions)
 
-    unsolved = get_images_which_need_resolving(reqs, sub_partitions)
-    resolve_ambiguous_requirements(reqs, unsolved)
+    return sub_partitions, get_images_which_need_resolving(reqs, sub_partitions)
+
+
+def resolve(reqs, dp, system_reqs = None, solver = None, orders = None):
+    if system_reqs is None:
+        system_reqs = reqs
+    solution = ["start", dp, "end"]
+
+    sub_partitions, unsolved = prepare_reqs(reqs, dp, system_reqs)
+    resolve_ambiguous_requirements(reqs, unsolved, orders)
 
     for name, req in reqs.items():
         if (item_is_placed(req, "start", "before") or item_is_placed(req, "end", "after")):
             raise PartitionError(f'Partition "{name}" was placed before start or after end.')
 
-    while unsolved:
-        current_len = len(unsolved)
-        solve_direction(reqs, sub_partitions, unsolved, solution, 'before')
-        solve_direction(reqs, sub_partitions, unsolved, solution, 'after')
-        if current_len == len(unsolved):
-            raise PartitionError('Unable to solve the following partitions (endless loop):\n'
-                                 + pformat(unsolved))
+    solver = solver or placement_solver
+    if solver == SOLVER_COMPARE:
+        graph_solution = solution.copy()
+        solve_graph(reqs, sub_partitions, unsolved.copy(), graph_solution)
+        try:
+            solve_iterative(reqs, sub_partitions, unsolved, solution)
+        except StopIteration:
+            # The iterative solver fails if a partition is placed relative to a sub partition
+            # before any part of the sub partition is placed.
+            raise PartitionError(f'Placement solvers disagree.\n'
+                                 f'{SOLVER_ITERATIVE}: no solution\n'
+                                 f'{SOLVER_GRAPH}: {graph_solution}') from None
+        if graph_solution != solution:
+            raise PartitionError(f'Placement solvers disagree.\n'
+                                 f'{SOLVER_ITERATIVE}: {solution}\n{SOLVER_GRAPH}: {graph_solution}')
+    elif solver == SOLVER_ITERATIVE:
+        solve_iterative(reqs, sub_partitions, unsolved, solution)
+    else:
+        solve_graph(reqs, sub_partitions, unsolved, solution)
 
     assert(solution[0] == "start" and solution[-1] == "end"), "invalid solution wrt. start and end."
     solution.remove("start")
@@ -422,9 +563,12 @@ def set_addresses_and_align(reqs, sub_partitions, solution, size, dp, start=0, s
     reqs[dp]['size'] = dynamic_partitions_size(reqs, size, dp)
     reqs[solution[0]]['address'] = start
 
+    # Return the total size of the empty partitions inserted to fulfill the alignment.
+    padding = 0
     if len(reqs) > 1:
-        _set_addresses_and_align(reqs, sub_partitions, solution, size, start, dynamic_partitions, dp)
+        padding = _set_addresses_and_align(reqs, sub_partitions, solution, size, start, dynamic_partitions, dp)
         verify_layout(reqs, solution, size, start)
+    return padding
 
 
 def first_partition_has_been_aligned(first, solution):
@@ -465,27 +609,66 @@ def _set_addresses_and_align(reqs, sub_partitions, solution, size, start, dynami
 
             reqs[next_part]['placement']['align']['start'] = alignment
 
-    # Perform address assignment and alignment in two steps, first from start to app, then from end to app.
-    for i in range(0, solution.index(dp) + 1):
+    empty_partitions = list()
+    attempts = dict()
+    # Index of the next empty partition, count the existing ones only once.
+    first_empty = len([x for x in reqs.keys() if 'EMPTY' in x])
+    while not _assign_addresses(reqs, solution, size, start, dynamic_partitions, dp,
+                                empty_partitions, first_empty, attempts):
+        pass
+
+    return sum(reqs[e]['size'] for e in empty_partitions)
+
+
+def _assign_addresses(reqs, solution, size, start, dynamic_partitions, dp, empty_partitions, first_empty, attempts):
+    """
+    Assign addresses in two steps, first from start to the dynamic partition, then from end
+    to the dynamic partition, and insert empty partitions where alignment is required.
+
+    Addresses are assigned once per partition. After inserting an empty partition, the
+    assignment continues from the empty partition, since the partitions in front of it are not
+    affected. The only exception is when a dynamic partition with an already assigned address
+    changes its size, then False is returned and the assignment must be started again.
+    """
+    def align(i, move_up):
+        empty = align_if_required(i, dynamic_partitions, move_up, reqs, dp, solution,
+                                  f'EMPTY_{first_empty + len(empty_partitions)}')
+        if empty:
+            empty_partitions.append(empty)
+            # Alignment which is never fulfilled would insert empty partitions endlessly.
+            attempts[solution[i]] = attempts.get(solution[i], 0) + 1
+            if attempts[solution[i]] > MAX_ALIGNMENT_ATTEMPTS:
+                raise PartitionError(ALIGNMENT_ERROR)
+        return empty
+
+    dp_index = solution.index(dp)
+    # Whether a dynamic partition with an assigned address is in front of the current partition.
+    dynamic_assigned = False
+    i = 0
+    while i <= dp_index:
         current = solution[i]
 
         if i != 0:
             previous = solution[i - 1]
             reqs[current]['address'] = reqs[previous]['address'] + reqs[previous]['size']
 
-        # To avoid messing with vector table, don't store empty partition as the first.
-        insert_empty_partition_before = i != 0
-
         # Special handling is needed when aligning the first partition
         if i == 0 and first_partition_has_been_aligned(reqs[current], solution):
+            i += 1
             continue
 
-        if align_if_required(i, dynamic_partitions,
-                             insert_empty_partition_before, reqs, dp,
-                             solution):
-            _set_addresses_and_align(reqs, sub_partitions, solution, size, start, dynamic_partitions, dp)
+        # To avoid messing with vector table, don't store empty partition as the first.
+        if align(i, move_up=(i != 0)):
+            if dynamic_assigned:
+                return False
+            # Continue from the empty partition, or from the first partition if it was aligned.
+            dp_index += 1
+            continue
+        dynamic_assigned = dynamic_assigned or (current in dynamic_partitions and current != dp)
+        i += 1
 
-    for i in range(len(solution) - 1, solution.index(dp), -1):
+    i = len(solution) - 1
+    while i > dp_index:
         current = solution[i]
 
         if i == len(solution) - 1:
@@ -494,27 +677,31 @@ def _set_addresses_and_align(reqs, sub_partitions, solution, size, start, dynami
             higher_partition = solution[i + 1]
             reqs[current]['address'] = reqs[higher_partition]['address'] - reqs[current]['size']
 
-        if align_if_required(i, dynamic_partitions, False, reqs, dp, solution):
-            try:
-                _set_addresses_and_align(reqs, sub_partitions, solution, size,
-                                         start, dynamic_partitions, dp)
-            except RecursionError:
-                raise PartitionError(ALIGNMENT_ERROR)
+        if align(i, move_up=False):
+            if dynamic_assigned:
+                return False
+            # Continue from the empty partition which was inserted after the current partition.
+            i += 1
+            continue
+        dynamic_assigned = dynamic_assigned or current in dynamic_partitions
+        i -= 1
+
+    return True
 
 
-def align_if_required(i, dynamic_partitions, move_up, reqs, dp, solution):
+def align_if_required(i, dynamic_partitions, move_up, reqs, dp, solution, empty_name):
     current = solution[i]
     if 'placement' in reqs[current] and 'align' in reqs[current]['placement']:
-        required_offset = align_partition(current, reqs, move_up,
-                                          dynamic_partitions, dp, solution)
-        if required_offset:
+        empty_partition = align_partition(current, reqs, move_up,
+                                          dynamic_partitions, dp, solution, empty_name)
+        if empty_partition:
             solution_index = i if move_up else i + 1
-            solution.insert(solution_index, required_offset)
-            return True
-    return False
+            solution.insert(solution_index, empty_partition)
+            return empty_partition
+    return None
 
 
-def align_partition(current, reqs, move_up, dynamic_partitions, dp, solution):
+def align_partition(current, reqs, move_up, dynamic_partitions, dp, solution, empty_name):
     required_offset = get_required_offset(align=reqs[current]['placement']['align'], start=reqs[current]['address'],
                                           size=reqs[current]['size'], move_up=move_up)
     if not required_offset:
@@ -540,7 +727,7 @@ def align_partition(current, reqs, move_up, dynamic_partitions, dp, solution):
         raise PartitionError('Invalid combination, can not have dynamic'
                              ' partition in front of app with alignment')
 
-    e = 'EMPTY_{}'.format(len([x for x in reqs.keys() if 'EMPTY' in x]))
+    e = empty_name
     reqs[e] = {'address': empty_partition_address,
                'size': empty_partition_size,
                'region': reqs[dynamic_partitions[0]]['region'],
@@ -761,7 +948,12 @@ def get_region_config(pm_config, region_config, static_conf=None, system_reqs=No
         pm_config[dp] = dict()
         pm_config[dp]['region'] = region_config['name']
 
-        solve_complex_region(pm_config, start, size, placement_strategy, region_name, device, static_conf, dp, system_reqs)
+        # Report the total size of the empty partitions inserted because of alignment, and how much of it
+        # was removed by the placement optimizer.
+        region_config['padding'], reclaimed = solve_complex_region(pm_config, start, size, placement_strategy,
+                                                                   region_name, device, static_conf, dp, system_reqs)
+        if reclaimed is not None:
+            region_config['reclaimed'] = reclaimed
 
     calculate_end_address(pm_config)
 
@@ -866,16 +1058,86 @@ def solve_complex_region(pm_config, start, size, placement_strategy, region_name
             pm_config.update(static_conf)
             pm_config[dp]['address'] = start
             pm_config[dp]['size'] = free_size
-            return
-
-    solution, sub_partitions = resolve(pm_config, dp, system_reqs)
-    set_addresses_and_align(pm_config, sub_partitions, solution, free_size, dp, start=start, system_reqs=system_reqs)
+            return 0, None
+
+    orders = dict()
+    reclaimed = None
+    if optimize_placement:
+        orders, default_score, best_score = optimize_ambiguous_order(pm_config, dp, system_reqs, free_size, start)
+        if default_score is not None and best_score is not None:
+            reclaimed = default_score[0] - best_score[0]
+            print(f"Placement optimizer reclaimed {reclaimed} bytes of padding in region '{region_name}'.")
+
+    solution, sub_partitions = resolve(pm_config, dp, system_reqs, orders=orders)
+    padding = set_addresses_and_align(pm_config, sub_partitions, solution, free_size, dp, start=start,
+                                      system_reqs=system_reqs)
     set_sub_partition_address_and_size(pm_config, sub_partitions)
 
     if static_conf:
         # Merge the results, take the new dynamic_partition as that has the correct size.
         pm_config.update({name: config for name, config in static_conf.items() if name != dp})
 
+    return padding, reclaimed
+
+
+def evaluate_layout(pm_config, dp, system_reqs, size, start, orders):
+    # Solve a copy of the requirements. Returns the padding and the negated size of the dynamic
+    # partition (so lower is better in both), or None if the requirements cannot be solved.
+    reqs, system_reqs = copy.deepcopy((pm_config, system_reqs))
+    try:
+        with redirect_stdout(StringIO()):
+            solution, sub_partitions = resolve(reqs, dp, system_reqs, orders=orders)
+            padding = set_addresses_and_align(reqs, sub_partitions, solution, size, dp, start=start,
+                                              system_reqs=system_reqs)
+    except PartitionError:
+        return None
+    return padding, -reqs[dp]['size']
+
+
+def optimize_ambiguous_order(pm_config, dp, system_reqs, size, start):
+    """
+    Search for the order of the partitions with identical placement
+    requirements (see resolve_ambiguous_requirements()) which gives the least
+    alignment padding, and therefore the largest dynamic partition.
+
+    Each group of such partitions is searched exhaustively if it has at most
+    MAX_OPTIMIZER_GROUP_SIZE partitions, otherwise by swapping pairs of
+    partitions. The groups are optimized one at a time until no group can be
+    improved. The default order is kept unless another order is strictly better.
+
+    :return: orders to pass to resolve(), score of the default order, score of
+    the best order (see evaluate_layout()).
+    """
+    reqs, copy_of_system_reqs = copy.deepcopy((pm_config, system_reqs))
+    try:
+        with redirect_stdout(StringIO()):
+            _, unsolved = prepare_reqs(reqs, dp, copy_of_system_reqs)
+    except PartitionError:
+        return dict(), None, None
+    groups = get_ambiguous_partitions(reqs, unsolved)
+
+    orders = dict()
+    default_score = best_score = evaluate_layout(pm_config, dp, system_reqs, size, start, orders)
+    improved = True
+    while improved:
+        improved = False
+        for group in groups:
+            current = orders.get(tuple(group), group)
+            if len(group) <= MAX_OPTIMIZER_GROUP_SIZE:
+                candidates = itertools.permutations(group)
+            else:
+                candidates = (current[:i] + [current[j]] + current[i + 1:j] + [current[i]] + current[j + 1:]
+                              for i, j in itertools.combinations(range(len(current)), 2))
+            for candidate in candidates:
+                candidate_orders = {**orders, tuple(group): list(candidate)}
+                score = evaluate_layout(pm_config, dp, system_reqs, size, start, candidate_orders)
+                if score is not None and (best_score is None or score < best_score):
+                    best_score = score
+                    orders = candidate_orders
+                    improved = True
+
+    return orders, default_score, best_score
+
 
 def write_yaml_out_file(pm_config, out_path):
     def hexint_presenter(dumper, data):
@@ -884,6 +1146,58 @@ def write_yaml_out_file(pm_config, out_path):
     yamldump = yaml.dump(pm_config)
     with open(out_path, 'w') as out_file:
         out_file.write(yamldump)
+    return yamldump
+
+
+def write_config_file(partitions_yaml, regions_yaml, partitions_path, out_path):
+    # Same as running partition_manager_output.py with --config-file, but without a new process.
+    # The output script imports this module, so import it here.
+    from partition_manager_output import get_domain_name, write_kconfig_file
+    domain = get_domain_name(partitions_path, 'partitions')
+    write_kconfig_file({domain: yaml.safe_load(partitions_yaml)}, {domain: yaml.safe_load(regions_yaml)}, out_path)
+
+
+def get_cache_key(args):
+    # Hash everything which affects the output: the scripts, the input files, and all arguments
+    # (including the region arguments).
+    script_dir = path.dirname(path.abspath(__file__))
+    files = [path.join(script_dir, 'partition_manager.py'), path.join(script_dir, 'partition_manager_output.py')]
+    files += args.input_files
+    if args.static_config:
+        files.append(args.static_config.name)
+
+    key = hashlib.sha256()
+    key.update(f'{CACHE_VERSION} {yaml.__version__} {sys.argv[1:]}'.encode())
+    for file in files:
+        with open(file, 'rb') as f:
+            key.update(f'\0{file}\0'.encode())
+            key.update(f.read())
+    return key.hexdigest()
+
+
+def get_file_hash(file):
+    try:
+        with open(file, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def cache_is_valid(cache_file, key, outputs):
+    # The cache is valid if it was written with the same key, and the output files were not
+    # modified since then.
+    try:
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (cache.get('key') == key
+            and cache.get('outputs') == {file: get_file_hash(file) for file in outputs})
+
+
+def write_cache(cache_file, key, outputs):
+    with open(cache_file, 'w') as f:
+        json.dump({'key': key, 'outputs': {file: get_file_hash(file) for file in outputs}}, f, indent=1)
 
 
 def parse_args():
@@ -911,6 +1225,25 @@ This file contains all addresses and sizes of all partitions.
     parser.add_argument('--static-config', required=False, type=argparse.FileType(mode='r'),
                         help='Path static configuration.')
 
+    parser.add_argument('--optimize-placement', required=False, action='store_true',
+                        help='Search for the order of partitions with identical placement requirements which '
+                             'gives the least alignment padding. By default, such partitions are sorted by name.')
+
+    parser.add_argument('--output-config-file', required=False, type=str,
+                        help='Path to output .config file. Creates the same file as the --config-file argument '
+                             'of partition_manager_output.py.')
+
+    parser.add_argument('--cache-file', required=False, type=str,
+                        help='Path to cache file. If the input files, the arguments and the scripts are '
+                             'the same as in the run which created the cache file, and the output files were '
+                             'not modified, the partitions are not solved again and the output files are '
+                             'left untouched.')
+
+    parser.add_argument('--placement-solver', required=False, type=str, choices=SOLVERS, default=SOLVER_GRAPH,
+                        help="Algorithm used to order the partitions. '{}' runs both the '{}' and the '{}' "
+                             "algorithm and fails if the layouts are not identical.".format(
+                                 SOLVER_COMPARE, SOLVER_GRAPH, SOLVER_ITERATIVE))
+
     parser.add_argument('--regions', required=False, type=str, nargs='*',
                         help="Space separated list of regions. For each region specified here, one must specify"
                              "--{region_name}-base-addr and --{region_name}-size. If the region is associated"
@@ -1019,7 +1352,20 @@ def sort_regions(pm_config, regions):
     return {k: v for k, v in sorted(regions.items(), key = lambda r: region_sort_key(pm_config, r[0], []))}
 
 def main():
+    global placement_solver, optimize_placement
+
     args, ranges_configuration = parse_args()
+    placement_solver = args.placement_solver
+    optimize_placement = args.optimize_placement
+
+    outputs = [args.output_partitions, args.output_regions]
+    if args.output_config_file:
+        outputs.append(args.output_config_file)
+    if args.cache_file:
+        cache_key = get_cache_key(args)
+        if cache_is_valid(args.cache_file, cache_key, outputs):
+            return
+
     pm_config = load_reqs(args.input_files)
     static_config = load_static_configuration(args, pm_config) if args.static_config else dict()
     fix_syntactic_sugar(pm_config)
@@ -1046,8 +1392,14 @@ def main():
             print(yaml.dump(to_print))
             sys.exit(1)
 
-    write_yaml_out_file(solution, args.output_partitions)
-    write_yaml_out_file(regions, args.output_regions)
+    partitions_yaml = write_yaml_out_file(solution, args.output_partitions)
+    regions_yaml = write_yaml_out_file(regions, args.output_regions)
+
+    if args.output_config_file:
+        write_config_file(partitions_yaml, regions_yaml, args.output_partitions, args.output_config_file)
+
+    if args.cache_file:
+        write_cache(args.cache_file, cache_key, outputs)
 
 
 def expect_addr_size(td, name, expected_address, expected_size):
@@ -1147,6 +1499,20 @@ def test():
     get_region_config(td, test_region)
     assert td['app']['span'][0] == 'the_dynamic_partition'
 
+    # Verify that many aligned partitions are solved, and that the padding is reported
+    td = {f'p{i}': {'size': 0x300, 'region': 'flash', 'placement': {'after': f'p{i - 1}' if i else 'start',
+                                                                     'align': {'start': 0x1000}}}
+          for i in range(1500)}
+    test_region = {'name': 'flash',
+                   'size': 0x1000 * 1501,
+                   'base_address': 0,
+                   'placement_strategy': COMPLEX,
+                   'device': None}
+    get_region_config(td, test_region)
+    expect_addr_size(td, 'p1499', 0x1000 * 1499, 0x300)
+    expect_addr_size(td, 'app', 0x1000 * 1499 + 0x300, 0x1d00)
+    assert test_region['padding'] == 0xd00 * 1499
+
     # Verify that START_TO_END region configuration is correct
     td = {'b': {'size': 100, 'region': 'extflash'}}
     test_region = {'name': 'extflash',
@@ -1872,6 +2238,69 @@ def test():
     s, _ = resolve(td, 'app')
     expect_list(['1', '2', '3', '4', '5', '6', 'app'], s)
 
+    # Verify that the graph and the iterative solver give identical layouts, also when
+    # partitions are placed relative to sub partitions.
+    td = {
+        'a': {'placement': {'before': ['app']}, 'size': 100},
+        'b': {'placement': {'before': ['app'], 'align': {'start': 0x1000}}, 'size': 100},
+        'c': {'placement': {'after': ['start']}, 'size': 100},
+        'd': {'placement': {'after': ['s']}, 'size': 100},
+        'e': {'placement': {'before': ['t']}, 'size': 100},
+        'f': {'placement': {'after': ['c']}, 'size': 100},
+        's': {'span': ['c', 'f']},
+        't': {'span': ['b', 'app']},
+        'app': {}
+    }
+    s, _ = resolve(copy.deepcopy(td), 'app', solver=SOLVER_COMPARE)
+    expect_list(['c', 'f', 'd', 'a', 'e', 'b', 'app'], s)
+
+    # Verify that the compare mode reports a layout which only the graph solver can solve.
+    td = {
+        'a': {'placement': {'after': ['app']}, 'size': 100},
+        'x': {'placement': {'before': ['s']}, 'size': 100},
+        's': {'span': ['a']},
+        'app': {}
+    }
+    s, _ = resolve(copy.deepcopy(td), 'app', solver=SOLVER_GRAPH)
+    expect_list(['app', 'x', 'a'], s)
+    failed = False
+    try:
+        resolve(copy.deepcopy(td), 'app', solver=SOLVER_COMPARE)
+    except PartitionError as e:
+        failed = 'disagree' in str(e)
+    assert failed
+
+    # Verify that partitions which depend on each other are reported as unsolvable.
+    td = {
+        'a': {'placement': {'before': ['b']}, 'size': 100},
+        'b': {'placement': {'before': ['a']}, 'size': 100},
+        'c': {'placement': {'before': ['app']}, 'size': 100},
+        'app': {}
+    }
+    for solver in SOLVERS:
+        failed = False
+        try:
+            resolve(copy.deepcopy(td), 'app', solver=solver)
+        except PartitionError:
+            failed = True
+        assert failed
+
+    # Verify that the placement optimizer finds the order of ambiguous partitions with least padding
+    td = {
+        'a': {'placement': {'before': ['app'], 'align': {'start': 0x1000}}, 'size': 0x800, 'region': 'flash'},
+        'b': {'placement': {'before': ['app'], 'align': {'start': 0x1000}}, 'size': 0xc00, 'region': 'flash'},
+        'app': {'region': 'flash'}
+    }
+    orders, default_score, best_score = optimize_ambiguous_order(td, 'app', td, 0x20000, 0)
+    assert orders == {('a', 'b'): ['b', 'a']}
+    assert default_score == (0x800, -(0x20000 - 0x1c00))
+    assert best_score == (0x400, -(0x20000 - 0x1800))
+    s, sub_partitions = resolve(td, 'app', orders=orders)
+    assert set_addresses_and_align(td, sub_partitions, s, 0x20000, 'app') == 0x400
+    expect_list(['b', 'EMPTY_0', 'a', 'app'], s)
+    calculate_end_address(td)
+    expect_addr_size(td, 'a', 0x1000, 0x800)
+
     # Verify aligning dynamic partitions
 
     # Align end
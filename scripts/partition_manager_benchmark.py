@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+import argparse
+import json
+import random
+import sys
+import time
+import yaml
+from contextlib import redirect_stdout
+from io import StringIO
+from os import path
+from statistics import median
+from tempfile import TemporaryDirectory
+
+import partition_manager
+
+REGION = 'flash_primary'
+ALIGNMENTS = [0x1000, 0x2000, 0x8000]
+SIZES = [0x200, 0x400, 0x800, 0xc00, 0x1000, 0x3000, 0x8000]
+APP_SIZE = 0x10000
+
+
+def generate_config(rng, num_partitions):
+    """
+    Generate random, but valid, partition manager requirements with
+    approximately @num_partitions partitions.
+
+    Partitions are placed in four chains: after 'start', before 'app', after
+    'app' and before 'end'. Each partition is placed relative to the previous
+    partition in its chain, so consecutive partitions of a chain end up next to
+    each other. Container partitions span such consecutive partitions, and may
+    also get the next partition of the chain with 'inside'. Alignment is only
+    used outside of the chain after 'app', which contains the partition that
+    shares size with 'app'. Only one partition shares size with 'app', like
+    the MCUboot secondary slot, so the size of 'app' stays word aligned.
+
+    :return: requirements, and the total size needed by the partitions.
+    """
+    # The build system always provides the dynamic partition.
+    reqs = {'app': {}}
+    containers = 0
+    total_size = APP_SIZE
+    chains = [('after', 'start'), ('before', 'app'), ('after', 'app'), ('before', 'end')]
+    # Consecutive partitions of each chain which can be spanned.
+    runs = {chain: [] for chain in chains}
+    last = {chain: chain[1] for chain in chains}
+    shares_app_size = False
+
+    def add_container(run, inside_partition=None):
+        nonlocal containers
+        name = f'container_{containers}'
+        containers += 1
+        span = list(run)
+        if rng.random() < 0.3:
+            # Only the existing partition is taken from 'one_of'
+            span[-1] = {'one_of': [f'missing_{name}', span[-1]]}
+        reqs[name] = {'span': span}
+        if inside_partition is not None:
+            reqs[inside_partition]['inside'] = [name]
+
+    i = 0
+    while i < num_partitions:
+        chain = rng.choice(chains)
+        ab, _ = chain
+        dynamic_chain = chain == ('after', 'app')
+
+        if rng.random() < 0.1:
+            # Group of partitions with identical requirements, ordered by name.
+            group = [f'p{i + j}' for j in range(rng.randint(2, 4))]
+            for name in group:
+                reqs[name] = {'placement': {ab: [last[chain]]}, 'size': rng.choice(SIZES)}
+                total_size += reqs[name]['size']
+            # The last partition by name is closest to the anchor.
+            last[chain] = group[-1] if ab == 'before' else group[0]
+            runs[chain] = []
+            i += len(group)
+            continue
+
+        name = f'p{i}'
+        i += 1
+        req = {'placement': {ab: [last[chain]]}}
+        choice = rng.random()
+        if dynamic_chain and not shares_app_size and choice < 0.3:
+            req['share_size'] = ['app']
+            shares_app_size = True
+            total_size += APP_SIZE
+        elif choice < 0.45 and any('size' in r for r in reqs.values()):
+            target = rng.choice([k for k, v in reqs.items() if 'size' in v])
+            if rng.random() < 0.5:
+                req['share_size'] = {'one_of': [f'missing_{name}', target]}
+            else:
+                req['share_size'] = [target]
+            total_size += reqs[target]['size']
+        else:
+            req['size'] = rng.choice(SIZES)
+            total_size += req['size']
+
+        if not dynamic_chain and rng.random() < 0.3:
+            alignment = rng.choice(ALIGNMENTS)
+            req['placement']['align'] = {rng.choice(['start', 'end']): alignment}
+            total_size += alignment
+
+        reqs[name] = req
+        last[chain] = name
+        runs[chain].append(name)
+
+        if not dynamic_chain and len(runs[chain]) >= 3 and rng.random() < 0.3:
+            # Span the partitions before this one, and put this one inside.
+            add_container(runs[chain][-3:-1], inside_partition=name)
+            runs[chain] = []
+        elif len(runs[chain]) >= 2 and rng.random() < 0.2:
+            add_container(runs[chain][-2:])
+            runs[chain] = []
+
+    # Round up, so alignments of the end of the region are fulfilled.
+    total_size = (total_size + max(ALIGNMENTS) - 1) // max(ALIGNMENTS) * max(ALIGNMENTS)
+    return reqs, total_size
+
+
+def run_partition_manager(input_file, region_size, out_dir, extra_args):
+    # Run the partition manager the same way as the build system does, but in this process to
+    # measure only the script itself.
+    partitions_file = path.join(out_dir, 'partitions.yml')
+    regions_file = path.join(out_dir, 'regions.yml')
+    argv = sys.argv
+    sys.argv = ['partition_manager.py',
+                '--input-files', input_file,
+                '--regions', REGION,
+                '--output-partitions', partitions_file,
+                '--output-regions', regions_file,
+                f'--{REGION}-size', hex(region_size),
+                f'--{REGION}-placement-strategy', partition_manager.COMPLEX] + extra_args
+    output = StringIO()
+    try:
+        with redirect_stdout(output):
+            start = time.perf_counter()
+            partition_manager.main()
+            elapsed = time.perf_counter() - start
+    except SystemExit:
+        raise partition_manager.PartitionError(output.getvalue())
+    finally:
+        sys.argv = argv
+
+    with open(partitions_file, 'r') as f:
+        partitions = yaml.safe_load(f)
+    with open(regions_file, 'r') as f:
+        regions = yaml.safe_load(f)
+    return elapsed, partitions, regions
+
+
+def verify_solution(reqs, partitions, region_size):
+    # Check that partitions do not overlap and cover the whole region, that alignment requirements
+    # are fulfilled and that container partitions span consecutive partitions.
+    placed = sorted(((k, v) for k, v in partitions.items() if v['region'] == REGION and 'span' not in v),
+                    key=lambda x: x[1]['address'])
+    address = 0
+    for name, p in placed:
+        if p['address'] != address:
+            raise partition_manager.PartitionError(
+                f'Partition {name} at {hex(p["address"])} does not start at {hex(address)}')
+        address += p['size']
+    if address != region_size:
+        raise partition_manager.PartitionError(f'Partitions end at {hex(address)}, not at end of region')
+
+    empty_partitions = {v['address']: v for k, v in placed if k.startswith('EMPTY_')}
+    for name, req in reqs.items():
+        align = req.get('placement', {}).get('align', {})
+        if name not in partitions or not align:
+            continue
+        alignment = list(align.values())[0]
+        edge = partitions[name]['address'] + (partitions[name]['size'] if 'end' in align else 0)
+        if edge % alignment != 0 and 'end' in align and partitions[name]['address'] == 0 \
+                and edge in empty_partitions:
+            # The first partition can not be moved down, so the padding is placed behind it.
+            edge += empty_partitions[edge]['size']
+        if edge % alignment != 0:
+            raise partition_manager.PartitionError(f'Alignment {align} of partition {name} not fulfilled')
+
+    for name, partition in partitions.items():
+        if 'span' not in partition or partition['region'] != REGION:
+            continue
+        parts = [partitions[p] for p in partition['span'] if p in partitions]
+        start = min(p['address'] for p in parts)
+        end = max(p['address'] + p['size'] for p in parts)
+        if (partition['address'], partition['size']) != (start, end - start):
+            raise partition_manager.PartitionError(f'Address or size of partition {name} is invalid')
+        # Only alignment padding may be placed between the spanned partitions.
+        for other, p in placed:
+            if start <= p['address'] < end and other not in partition['span'] and not other.startswith('EMPTY_'):
+                raise partition_manager.PartitionError(f'Partition {other} is placed inside {name}')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='''Benchmark of the partition manager script.
+
+Generates random, but valid, partition manager configurations of increasing size, solves them with
+partition_manager.py, verifies the solutions, and prints the time needed for solving.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        allow_abbrev=False)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 30, 100, 300, 1000],
+                        help='Number of partitions in the generated configurations.')
+    parser.add_argument('--configs', type=int, default=5,
+                        help='Number of generated configurations for each size.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs for each configuration, the fastest run is used.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the random generator.')
+    parser.add_argument('--placement-solver', type=str, choices=partition_manager.SOLVERS,
+                        default=partition_manager.SOLVER_GRAPH,
+                        help='Placement solver passed to partition_manager.py.')
+    parser.add_argument('--optimize-placement', action='store_true',
+                        help='Pass --optimize-placement to partition_manager.py.')
+    parser.add_argument('--output', type=str,
+                        help='Write the timings to this JSON file.')
+    parser.add_argument('--keep-inputs', type=str,
+                        help='Directory where the generated configurations are written.')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    extra_args = ['--placement-solver', args.placement_solver]
+    if args.optimize_placement:
+        extra_args.append('--optimize-placement')
+
+    results = list()
+    print(f'{"partitions":>10} {"configs":>8} {"min [s]":>10} {"median [s]":>10} {"max [s]":>10} '
+          f'{"padding":>10}')
+    for num_partitions in args.sizes:
+        times = list()
+        padding = 0
+        for config_index in range(args.configs):
+            reqs, region_size = generate_config(rng, num_partitions)
+            with TemporaryDirectory() as out_dir:
+                input_dir = args.keep_inputs or out_dir
+                input_file = path.join(input_dir, f'pm_{num_partitions}_{config_index}.yml')
+                with open(input_file, 'w') as f:
+                    yaml.safe_dump(reqs, f)
+                runs = list()
+                try:
+                    for _ in range(args.repeat):
+                        elapsed, partitions, regions = run_partition_manager(input_file, region_size, out_dir,
+                                                                             extra_args)
+                        runs.append(elapsed)
+                    verify_solution(reqs, partitions, region_size)
+                except partition_manager.PartitionError as e:
+                    print(f'Invalid solution of {input_file}: {e}')
+                    sys.exit(1)
+            times.append(min(runs))
+            padding += regions[REGION].get('padding', 0)
+
+        results.append({'partitions': num_partitions, 'times': times, 'padding': padding // len(times)})
+        print(f'{num_partitions:>10} {len(times):>8} {min(times):>10.4f} {median(times):>10.4f} '
+              f'{max(times):>10.4f} {hex(padding // len(times)):>10}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'seed': args.seed, 'placement_solver': args.placement_solver,
+                       'optimize_placement': args.optimize_placement, 'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -188,6 +188,14 @@ def write_kconfig_file(gpm_config, regions_config, out_path):
     write_config_lines_to_file(out_path, config_lines)
 
 
+def get_domain_name(file_path, prefix):
+    fn = path.basename(file_path)
+    if f'{prefix}_' in fn:
+        return fn[fn.index(f'{prefix}_') + len(f'{prefix}_'):fn.index('.yml')]
+    # Root domain does not have domain suffix in the file name.
+    return ''
+
+
 def parse_args():
     parser = argparse.ArgumentParser(
         description='''Creates files based on Partition Manager results.''',
@@ -220,24 +228,12 @@ def main():
     greg_config = dict()  # GLOBAL pm_regions
 
     for partition in args.input_partitions:
-        fn = path.basename(partition)
-        if 'partitions_' in fn:
-            domain_name = fn[fn.index('partitions_') + len('partitions_'):fn.index('.yml')]
-        else:
-            # Root domain does not have domain suffix in the partitions file name.
-            domain_name = ''
         with open(partition, 'r') as f:
-            gpm_config[domain_name] = yaml.safe_load(f)
+            gpm_config[get_domain_name(partition, 'partitions')] = yaml.safe_load(f)
 
     for region in args.input_regions:
-        fn = path.basename(region)
-        if 'regions_' in fn:
-            domain_name = fn[fn.index('regions_') + len('regions_'):fn.index('.yml')]
-        else:
-            # Root domain does not have domain suffix in the regions file name.
-            domain_name = ''
         with open(region, 'r') as f:
-            greg_config[domain_name] = yaml.safe_load(f)
+            greg_config[get_domain_name(region, 'regions')] = yaml.safe_load(f)
 
     if args.config_file:
         write_kconfig_file(gpm_config, greg_config, args.config_file)
@@ -14,7 +14,7 @@ def get_size_str(size):
     return f'{int(size/1024):d}kB' if size >= 1024 else f'{size:d}B'
 
 
-def print_region(domain, region, size, pm_config):
+def print_region(domain, region, size, pm_config, region_config=None):
     # Prepare colors (color code taken from size_report)
     bcolors_ansi = {
         'HEADER'    : '\033[95m',
@@ -35,6 +35,14 @@ def print_region(domain, region, size, pm_config):
     # Print header
     print(f"{bcolors['OKBLUE']} {domain} {region} ({hex(size)} - {get_size_str(size)}): {bcolors['ENDC']}")
 
+    # Print alignment padding and the padding removed by the placement optimizer, if available
+    if region_config and 'padding' in region_config:
+        padding = region_config['padding']
+        print(f" Alignment padding: {hex(padding)} - {get_size_str(padding)}")
+    if region_config and 'reclaimed' in region_config:
+        reclaimed = region_config['reclaimed']
+        print(f" Reclaimed by placement optimizer: {hex(reclaimed)} - {get_size_str(reclaimed)}")
+
     # Sort partitions three times:
     #  1. On whether they are a container (has a 'span'), containers first.
     #  2. On size, descending.
@@ -79,6 +87,9 @@ def parse_args():
         allow_abbrev=False)
     parser.add_argument('-i', '--input', required=True, type=str, nargs='+',
                         help='Path to the domain specific YAML files from Partition Manager')
+    parser.add_argument('-r', '--input-regions', required=False, type=str, nargs='+', default=[],
+                        help='Path to the domain specific YAML files with region configurations from '
+                             'Partition Manager')
 
     args = parser.parse_args()
 
@@ -91,6 +102,16 @@ def main():
     if not args.input:
         raise RuntimeError('No input files provided')
 
+    regions_config = dict()
+    for i in args.input_regions:
+        fn = path.basename(i)
+        if '_' in fn:
+            domain_name = fn[fn.index('regions_') + len('regions_'):fn.index('.yml')]
+        else:
+            domain_name = ''
+        with open(i, 'r') as f:
+            regions_config[domain_name] = yaml.safe_load(f)
+
     for i in args.input:
         fn = path.basename(i)
         if '_' in fn:
@@ -107,7 +128,8 @@ def main():
                                if 'address' in part))
             max_address = max((part['address'] + part['size'] for part in pm_config_primary.values()
                                if 'address' in part))
-            print_region(domain_name, r, max_address - min_address, pm_config_primary)
+            print_region(domain_name, r, max_address - min_address, pm_config_primary,
+                         regions_config.get(domain_name, {}).get(r))
 
 
 if __name__ == '__main__':
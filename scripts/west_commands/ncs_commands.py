@@ -7,12 +7,14 @@
 from __future__ import annotations
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import json
 from pathlib import Path
 import subprocess
 import sys
 from textwrap import dedent
-from typing import Any, List, NamedTuple, Optional, TYPE_CHECKING
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, \
+    Optional, TYPE_CHECKING
 
 from west import log
 from west.commands import WestCommand
@@ -59,6 +61,48 @@ def ncs_userdata(project: Project) -> Optional[NcsUserData]:
                        upstream_sha=ncs_dict['upstream-sha'],
                        compare_by_default=ncs_dict['compare-by-default'])
 
+class ProjectComparison(NamedTuple):
+    '''Result of the comparison of an NCS project with its upstream.'''
+
+    ncs_project: Project
+    upstream_url: str
+    upstream_revision: str
+    ncs_sha: Optional[str]
+    upstream_sha: Optional[str]
+    # None if the comparison failed due to missing data.
+    status: Optional[str]
+    # None if likely merged commits are not going to be printed.
+    likely_merged: Optional[dict[pygit2.Commit, list[pygit2.Commit]]]
+    # Warnings found during the analysis, printed with the comparison.
+    warnings: list[str]
+    # Debug messages of the analysis, printed with the comparison.
+    debug_messages: list[str]
+
+class Loot(NamedTuple):
+    '''Result of the analysis of out of tree patches in a project.'''
+
+    # None if the analysis failed.
+    commits: Optional[list[pygit2.Commit]]
+    # Warnings found during the analysis, printed with the loot.
+    warnings: list[str]
+    # Debug messages of the analysis, printed with the loot.
+    debug_messages: list[str]
+    # Error message if the analysis failed.
+    error: Optional[str]
+
+def parallel_map(func: Callable, items: Iterable) -> Iterator:
+    # Calls func for each item in a thread pool, so that projects are
+    # analyzed in parallel. Results are returned in the order of items,
+    # each as soon as it is available.
+
+    items = list(items)
+    if len(items) < 2:
+        return map(func, items)
+    executor = ThreadPoolExecutor()
+    results = executor.map(func, items)
+    executor.shutdown(wait=False)
+    return results
+
 def add_zephyr_rev_arg(parser: argparse.ArgumentParser) -> None:
     parser.add_argument('-z', '--zephyr-rev', metavar='REF',
                         help='''zephyr git ref (commit, branch, etc.);
@@ -89,10 +133,8 @@ def to_repository(project: Project, sha: str) -> nwh.Repository:
                           url=project.url,
                           sha=sha)
 
-def print_likely_merged(downstream_repo: nwh.Repository,
-                        upstream_repo: nwh.Repository) -> None:
-    analyzer = nwh.RepoAnalyzer(downstream_repo, upstream_repo)
-    likely_merged = analyzer.likely_merged
+def print_likely_merged(likely_merged: dict[pygit2.Commit,
+                                             list[pygit2.Commit]]) -> None:
     if likely_merged:
         # likely_merged is a map from downstream commits to
         # lists of upstream commits that look similar.
@@ -319,6 +361,7 @@ class NcsLoot(NcsWestCommand):
         self.args = args
         self.json_data: dict[str, Any] = {}
 
+        repositories = []
         for name, project in self.ncs_pmap.items():
             if name == 'manifest':
                 continue
@@ -331,7 +374,11 @@ class NcsLoot(NcsWestCommand):
             if not upstream_repository:
                 continue
 
-            loot = self.get_loot(ncs_repository, upstream_repository)
+            repositories.append((ncs_repository, upstream_repository))
+
+        loots = parallel_map(lambda pair: self.get_loot(*pair), repositories)
+        for (ncs_repository, upstream_repository), loot in zip(repositories,
+                                                               loots):
             self.print_loot(loot, ncs_repository, upstream_repository)
 
         if args.json:
@@ -340,37 +387,51 @@ class NcsLoot(NcsWestCommand):
 
     @staticmethod
     def get_loot(ncs_repository: nwh.Repository,
-                 upstream_repository: nwh.Repository) -> list[pygit2.Commit]:
+                 upstream_repository: nwh.Repository) -> Loot:
         # Create analyzer object and get the loot for a pair of
         # upstream/downstream repositories.
+        #
+        # This is called from multiple threads, so it must not print
+        # anything. Warnings and errors are printed by print_loot().
         name_path = f'{ncs_repository.name} ({ncs_repository.path})'
 
         try:
             analyzer = nwh.RepoAnalyzer(ncs_repository, upstream_repository)
         except nwh.InvalidRepositoryError as ire:
-            log.die(f"{name_path}: {str(ire)}")
+            return Loot(None, [], [], f"{name_path}: {str(ire)}")
 
         try:
-            return analyzer.downstream_outstanding
+            return Loot(analyzer.downstream_outstanding, analyzer.warnings,
+                        analyzer.debug_messages, None)
         except nwh.UnknownCommitsError as uce:
-            log.die(f'{name_path}: unknown commits: {str(uce)}')
+            return Loot(None, analyzer.warnings, analyzer.debug_messages,
+                        f'{name_path}: unknown commits: {str(uce)}')
 
     def print_loot(self,
-                   loot: list[pygit2.Commit],
+                   result: Loot,
                    ncs_repository: nwh.Repository,
                    upstream_repository: nwh.Repository) -> None:
         # Print a list of out of tree outstanding patches.
         #
-        # loot: the list itself
+        # result: the list itself and warnings found during the analysis
         # ncs_repository: contains NCS information
         # upstream_repository: contains upstream information
 
-        if not loot and log.VERBOSE <= log.VERBOSE_NONE:
+        loot = result.commits
+        if (not loot and not result.warnings and result.error is None and
+                log.VERBOSE <= log.VERBOSE_NONE):
             # Don't print output if there's no loot unless verbose
             # mode is on.
             return
 
         log.banner(f'{ncs_repository.name} ({ncs_repository.path})')
+        for message in result.debug_messages:
+            log.dbg(message, level=log.VERBOSE_VERY)
+        for warning in result.warnings:
+            log.wrn(warning)
+        if result.error is not None:
+            log.die(result.error)
+        assert loot is not None
         log.inf(f'     NCS commit: {ncs_repository.sha}\n'
                 f'   upstream URL: {upstream_repository.url}\n'
                 f'upstream commit: {upstream_repository.sha}')
@@ -486,6 +547,30 @@ class NcsCompare(NcsWestCommand):
             for project in projects:
                 log.inf(f'{project.name_and_path}')
 
+        # Start analysis of all projects that are compared below, so the
+        # projects are analyzed in parallel while the results are printed.
+        to_compare = []
+        for zephyr_project in present_allowed:
+            ncs_project = self.ncs_pmap[to_ncs_name(zephyr_project)]
+            if ncs_project.userdata is not None:
+                continue
+            if ncs_project.name == 'zephyr':
+                to_compare.append((ncs_project, _UPSTREAM_ZEPHYR_URL,
+                                   self.zephyr_rev))
+            else:
+                to_compare.append((ncs_project, zephyr_project.url,
+                                   zephyr_project.revision))
+        projects_with_userdata = [project for project in ncs_only_projects
+                                  if project.userdata]
+        for ncs_project in projects_with_userdata:
+            userdata = ncs_userdata(ncs_project)
+            assert userdata
+            if args.all or userdata.compare_by_default:
+                to_compare.append((ncs_project, userdata.upstream_url,
+                                   userdata.upstream_sha))
+        comparisons = parallel_map(lambda item: self.analyze_project(*item),
+                                   to_compare)
+
         if missing_blocked and log.VERBOSE >= log.VERBOSE_NORMAL:
             log.banner('blocked zephyr projects',
                        'not in nrf (these are all OK):')
@@ -528,29 +613,16 @@ class NcsCompare(NcsWestCommand):
                             'details')
                     continue
 
-                if ncs_project.name == 'zephyr':
-                    upstream_url = _UPSTREAM_ZEPHYR_URL
-                    upstream_revision = self.zephyr_rev
-                else:
-                    upstream_url = zephyr_project.url
-                    upstream_revision = zephyr_project.revision
-
-                self.compare_project_with_upstream(ncs_project,
-                                                   upstream_url,
-                                                   upstream_revision)
+                self.compare_project_with_upstream(next(comparisons))
 
         log.banner('NCS projects with upstreams specified via userdata:')
-        projects_with_userdata = [project for project in ncs_only_projects
-                                  if project.userdata]
         any_needs_update = False
         for ncs_project in projects_with_userdata:
             userdata = ncs_userdata(ncs_project)
             assert userdata
             if args.all or userdata.compare_by_default:
                 needs_update = self.compare_project_with_upstream(
-                    ncs_project,
-                    userdata.upstream_url,
-                    userdata.upstream_sha)
+                    next(comparisons))
                 if needs_update:
                     any_needs_update = True
         if not any_needs_update:
@@ -560,14 +632,61 @@ class NcsCompare(NcsWestCommand):
             log.inf('\nNote: verbose output was omitted,',
                     'use "west -v ncs-compare" for more details.')
 
+    def analyze_project(self,
+                        ncs_project: Project,
+                        upstream_url: str,
+                        upstream_revision: str) -> ProjectComparison:
+        '''Compare the NCS version of a project with its upstream
+        counterpart. The result is printed by
+        compare_project_with_upstream().
+
+        This is called from multiple threads, so it must not print
+        anything. Warnings are returned in the result instead.
+        '''
+
+        ncs_sha = self.checked_sha(ncs_project, QUAL_MANIFEST_REV_BRANCH)
+        upstream_sha = self.checked_sha(ncs_project, upstream_revision)
+
+        if not ncs_project.is_cloned() or ncs_sha is None or upstream_sha is None:
+            return ProjectComparison(ncs_project, upstream_url,
+                                     upstream_revision, ncs_sha, upstream_sha,
+                                     None, None, [], [])
+
+        ncs_repo = to_repository(ncs_project, ncs_sha)
+        assert ncs_project.abspath
+        upstream_repo = nwh.Repository(name=ncs_project.name,
+                                       path=ncs_project.path,
+                                       abspath=ncs_project.abspath,
+                                       url=upstream_url,
+                                       sha=upstream_sha)
+        analyzer = nwh.RepoAnalyzer(ncs_repo, upstream_repo)
+        ahead, behind = analyzer.ahead_behind
+
+        if upstream_sha == ncs_sha:
+            status = 'up to date'
+        elif ahead and not behind:
+            status = f'ahead by {ahead} commit' + ("s" if ahead > 1 else "")
+        elif analyzer.downstream_is_ancestor:
+            status = f'behind by {behind} commit' + ("s" if behind > 1 else "")
+        else:
+            status = f'diverged: {ahead} ahead, {behind} behind'
+        up_or_ahead = 'up to date' in status or 'ahead by' in status
+
+        if not up_or_ahead or log.VERBOSE > log.VERBOSE_NONE:
+            likely_merged = analyzer.likely_merged
+        else:
+            likely_merged = None
+
+        return ProjectComparison(ncs_project, upstream_url, upstream_revision,
+                                 ncs_sha, upstream_sha, status, likely_merged,
+                                 analyzer.warnings, analyzer.debug_messages)
+
     def compare_project_with_upstream(
             self,
-            ncs_project: Project,
-            upstream_url: str,
-            upstream_revision: str
+            comparison: ProjectComparison
     ) -> bool:
-        '''Compare the NCS version of a project with its upstream
-        counterpart.
+        '''Print the comparison of the NCS version of a project with its
+        upstream counterpart.
 
         Returns True if the project comparison means it needs, or may
         need, an update. I.e., returns True if the project is behind
@@ -575,6 +694,13 @@ class NcsCompare(NcsWestCommand):
         comparison failed due to missing data.
         '''
 
+        ncs_project = comparison.ncs_project
+        upstream_url = comparison.upstream_url
+        upstream_revision = comparison.upstream_revision
+        ncs_sha = comparison.ncs_sha
+        upstream_sha = comparison.upstream_sha
+        status = comparison.status
+
         # is_imported is true if we imported this project from the
         # zephyr manifest rather than defining it directly ourselves
         # in nrf/west.yml. This is important because imported projects
@@ -584,10 +710,8 @@ class NcsCompare(NcsWestCommand):
         is_imported = ncs_project.name in self.imported_pmap
         imported = ', imported from zephyr' if is_imported else ''
         banner = f'{ncs_project.name} ({ncs_project.path}){imported}:'
-        ncs_sha = self.checked_sha(ncs_project, QUAL_MANIFEST_REV_BRANCH)
-        upstream_sha = self.checked_sha(ncs_project, upstream_revision)
 
-        if not ncs_project.is_cloned() or ncs_sha is None or upstream_sha is None:
+        if status is None:
             log.small_banner(banner)
             if not ncs_project.is_cloned():
                 log.wrn('project is not cloned; please run "west update"')
@@ -599,38 +723,20 @@ class NcsCompare(NcsWestCommand):
                         f'(need revision {upstream_revision})')
             return True
 
-        patch_counts = ncs_project.git(
-            f'rev-list --left-right --count {upstream_sha}...{ncs_sha}',
-            capture_stdout=True).stdout.split()
-        behind, ahead = [int(c) for c in patch_counts]
-
-        if upstream_sha == ncs_sha:
-            status = 'up to date'
-        elif ahead and not behind:
-            status = f'ahead by {ahead} commit' + ("s" if ahead > 1 else "")
-        elif ncs_project.is_ancestor_of(ncs_sha, upstream_sha):
-            status = f'behind by {behind} commit' + ("s" if behind > 1 else "")
-        else:
-            status = f'diverged: {ahead} ahead, {behind} behind'
         up_or_ahead = 'up to date' in status or 'ahead by' in status
 
         commits = (f'     NCS commit: {ncs_sha}\n'
                    f'   upstream URL: {upstream_url}\n'
                    f'upstream commit: {upstream_sha}')
-        ncs_repo = to_repository(ncs_project, ncs_sha)
-        assert ncs_project.abspath
-        upstream_repo = nwh.Repository(name=ncs_project.name,
-                                       path=ncs_project.path,
-                                       abspath=ncs_project.abspath,
-                                       url=upstream_url,
-                                       sha=upstream_sha)
         if up_or_ahead:
             if log.VERBOSE > log.VERBOSE_NONE:
                 # Up to date or ahead: only print in verbose mode.
                 log.small_banner(banner)
                 log.inf(commits)
                 log.inf(status)
-                print_likely_merged(ncs_repo, upstream_repo)
+                print_likely_merged(comparison.likely_merged)
+            elif comparison.warnings:
+                log.small_banner(banner)
         else:
             # Behind or diverged: always print.
             if is_imported and 'behind by' in status:
@@ -639,7 +745,12 @@ class NcsCompare(NcsWestCommand):
             log.small_banner(banner)
             log.inf(commits)
             log.msg(status, color=log.WRN_COLOR)
-            print_likely_merged(ncs_repo, upstream_repo)
+            print_likely_merged(comparison.likely_merged)
+
+        for message in comparison.debug_messages:
+            log.dbg(message, level=log.VERBOSE_VERY)
+        for warning in comparison.warnings:
+            log.wrn(warning)
 
         return not up_or_ahead
 
@@ -703,7 +814,13 @@ class NcsUpmerger(NcsWestCommand):
         except nwh.InvalidRepositoryError as ire:
             log.die(f"{project.name_and_path}: {str(ire)}")
 
-        for dc, ucs in reversed(analyzer.likely_merged.items()):
+        likely_merged = analyzer.likely_merged
+        for message in analyzer.debug_messages:
+            log.dbg(message, level=log.VERBOSE_VERY)
+        for warning in analyzer.warnings:
+            log.wrn(warning)
+
+        for dc, ucs in reversed(likely_merged.items()):
             if len(ucs) == 1:
                 log.inf(f'- Reverting: {dc.oid} {commit_title(dc)}')
                 log.inf(f'  Similar upstream title:\n'
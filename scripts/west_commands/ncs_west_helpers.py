@@ -13,11 +13,13 @@ from __future__ import annotations
 
 import collections
 from dataclasses import dataclass
+import json
+import os
 from pathlib import Path
 import subprocess
 import sys
 import textwrap
-from typing import Union, Iterable
+from typing import Callable, Optional, Union, Iterable
 
 try:
     import editdistance
@@ -26,7 +28,6 @@ except ImportError:
     sys.exit("Can't import extra dependencies needed for NCS west extensions.\n"
              "Please install packages in nrf/scripts/requirements-extra.txt "
              "with pip3.")
-from west import log
 
 from pygit2_helpers import title_is_revert, title_no_sauce, \
         commit_reverts_what, commit_title
@@ -68,6 +69,14 @@ def _run_git(repo: Repository, command: list[str],
                           cwd=repo.abspath,
                           check=check)
 
+# Name of the file in the git directory of each repository that caches
+# results of the analysis. Results are keyed by the downstream and
+# upstream SHAs, so they never become outdated. Increment the version
+# when the file format or the analysis changes.
+_CACHE_FILE = 'ncs-west-analysis-cache.json'
+_CACHE_VERSION = 2
+_CACHE_MAX_ENTRIES = 32
+
 class RepoAnalyzer:
     '''Utility class for analyzing a repository, especially
     upstream/downstream differences.'''
@@ -78,7 +87,8 @@ class RepoAnalyzer:
                  downstream_domain: Union[str, tuple[str]] = '@nordicsemi.no',
                  downstream_sauce: str = 'nrf',
                  edit_dist_threshold: int = 3,
-                 include_mergeups: bool = False):
+                 include_mergeups: bool = False,
+                 use_cache: bool = True):
         '''
         :param downstream_project: project loaded from downstream manifest
         :param upstream_project: project loaded from upstream manifest
@@ -98,6 +108,10 @@ class RepoAnalyzer:
 
         :param include_mergeups: include mergeup commits as downstream
                                  outstanding patches
+
+        :param use_cache: read and store the lists of upstream new and
+                          downstream outstanding commits in a cache
+                          file in the git directory of the repository
         '''
 
         self.downstream_repo: Repository = downstream_repo
@@ -110,6 +124,17 @@ class RepoAnalyzer:
         self._downstream_domain: list[str] = _to_list(downstream_domain)
         self._edit_dist_threshold: int = edit_dist_threshold
         self._include_mergeups: bool = include_mergeups
+        self._use_cache: bool = use_cache
+        self.__upstream_new: Optional[list[pygit2.Commit]] = None
+        self.__downstream_out: Optional[list[pygit2.Commit]] = None
+        self.__likely_merged: Optional[dict[pygit2.Commit,
+                                            list[pygit2.Commit]]] = None
+        self.warnings: list[str] = []
+        '''Warnings found during the analysis. They are collected
+        instead of printed, so that the caller can print them together
+        with the rest of the output for this repository.'''
+        self.debug_messages: list[str] = []
+        '''Very verbose debug messages, collected like the warnings.'''
 
     #
     # Main API, which is property based.
@@ -121,20 +146,30 @@ class RepoAnalyzer:
     #
 
     def _upstream_new(self):
-        if not hasattr(self, '__upstream_new'):
-            self.__upstream_new = self._new_upstream_only_commits()
+        if self.__upstream_new is None:
+            self.__upstream_new = self._cached_commits(
+                'upstream-new', self._new_upstream_only_commits)
         return self.__upstream_new
 
     def _downstream_outstanding(self):
-        if not hasattr(self, '__downstream_out'):
-            self.__downstream_out = self._downstream_outstanding_commits()
+        if self.__downstream_out is None:
+            self.__downstream_out = self._cached_commits(
+                'downstream-outstanding', self._downstream_outstanding_commits)
         return self.__downstream_out
 
     def _likely_merged(self):
-        if not hasattr(self, '__likely_merged'):
+        if self.__likely_merged is None:
             self.__likely_merged = self._likely_merged_commits()
         return self.__likely_merged
 
+    def _ahead_behind(self):
+        return self._pygit2_repo.ahead_behind(self.downstream_repo.sha,
+                                              self.upstream_repo.sha)
+
+    def _downstream_is_ancestor(self):
+        return self._is_ancestor(self.downstream_repo.sha,
+                                 self.upstream_repo.sha)
+
     upstream_new = property(fget=_upstream_new)
     '''Commits that are new in the upstream, as a list of pygit2 objects.'''
 
@@ -155,10 +190,86 @@ class RepoAnalyzer:
     of pygit2 commit objects that are merged upstream and have similar
     titles by edit distance to each key.'''
 
+    ahead_behind = property(_ahead_behind)
+    '''A tuple with the number of downstream commits which are not in
+    the upstream, and the number of upstream commits which are not in
+    the downstream, like "git rev-list --left-right --count" does.'''
+
+    downstream_is_ancestor = property(_downstream_is_ancestor)
+    '''True if the downstream commit is an ancestor of (or the same as)
+    the upstream commit, i.e. the downstream is behind the upstream.'''
+
     #
     # Internal helpers
     #
 
+    def _is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        # Same as "git merge-base --is-ancestor", including the result
+        # for unknown commits.
+        try:
+            ancestor_id = self._pygit2_repo.revparse_single(ancestor).id
+            descendant_id = self._pygit2_repo.revparse_single(descendant).id
+        except (KeyError, ValueError):
+            return False
+        return (ancestor_id == descendant_id or
+                self._pygit2_repo.descendant_of(descendant_id, ancestor_id))
+
+    def _cache_path(self) -> Path:
+        return Path(self._pygit2_repo.path) / _CACHE_FILE
+
+    def _load_cache(self) -> dict[str, dict[str, list[str]]]:
+        try:
+            with open(self._cache_path(), 'r') as f:
+                content = json.load(f)
+            if content['version'] == _CACHE_VERSION:
+                return content['entries']
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing or invalid cache is replaced with a new one.
+            pass
+        return {}
+
+    def _store_cache(self, entries: dict[str, dict[str, list[str]]]) -> None:
+        while len(entries) > _CACHE_MAX_ENTRIES:
+            del entries[next(iter(entries))]
+        cache_path = self._cache_path()
+        tmp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}')
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': _CACHE_VERSION, 'entries': entries}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            self.warnings.append(f"can't write analysis cache {cache_path}: {e}")
+
+    def _cached_commits(self, kind: str,
+                        compute: Callable[[], list[pygit2.Commit]]
+                        ) -> list[pygit2.Commit]:
+        # Returns commits from the cache or computes them and stores
+        # their SHAs in the cache. Warnings found by the computation
+        # are cached too, so they are reported on every run.
+        if not self._use_cache:
+            return compute()
+        key = (f'{kind} {self.downstream_repo.sha} {self.upstream_repo.sha}'
+               f' {self._include_mergeups}')
+        entries = self._load_cache()
+        if key in entries:
+            try:
+                commits = [self._pygit2_repo[sha]
+                           for sha in entries[key]['commits']]
+                self.warnings.extend(entries[key]['warnings'])
+                self.debug_messages.append(
+                    f'{self.downstream_repo.name}: using cached {kind} commits')
+                return commits
+            except (KeyError, ValueError, TypeError):
+                # Commits are no longer available, e.g. after "git gc".
+                pass
+        first_warning = len(self.warnings)
+        commits = compute()
+        entries.pop(key, None)
+        entries[key] = {'commits': [str(c.id) for c in commits],
+                        'warnings': self.warnings[first_warning:]}
+        self._store_cache(entries)
+        return commits
+
     def _new_upstream_only_commits(self) -> list[pygit2.Commit]:
         '''Commits in `upstream_ref` history since merge base with
         `downstream_ref`'''
@@ -167,11 +278,10 @@ class RepoAnalyzer:
         try:
             merge_base = self._pygit2_repo.merge_base(downstream_sha,
                                                       upstream_sha)
-        except ValueError:
-            log.wrn("can't get merge base; "
-                    f"downstream SHA: {downstream_sha}, "
-                    f"upstream SHA: {upstream_sha}")
-            raise
+        except ValueError as e:
+            raise ValueError("can't get merge base; "
+                             f"downstream SHA: {downstream_sha}, "
+                             f"upstream SHA: {upstream_sha}") from e
 
         sort = pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE
         walker = self._pygit2_repo.walk(upstream_sha, sort)
@@ -206,14 +316,14 @@ class RepoAnalyzer:
         # complete list of OOT patches.
         downstream_out: dict[str, pygit2.Commit] = {}
         for c in all_downstream_oot:
-            sha, sl = str(c.oid), commit_title(c)
+            sha, sl = str(c.id), commit_title(c)
             is_revert = title_is_revert(sl)  # this is just a heuristic
 
             if len(c.parents) > 1:
                 if not self._include_mergeups:
                     # Skip all the mergeup commits.
-                    log.dbg('** skipped mergeup {} ("{}")'.format(sha, sl),
-                            level=log.VERBOSE_VERY)
+                    self.debug_messages.append(
+                        '** skipped mergeup {} ("{}")'.format(sha, sl))
                     continue
                 else:
                     is_revert = False  # a merge is never a revert
@@ -226,7 +336,7 @@ class RepoAnalyzer:
                 except ValueError:
                     # Badly formatted revert message.
                     # Treat as outstanding, but complain.
-                    log.wrn(
+                    self.warnings.append(
                         'revert {} doesn\'t say "reverts commit <SHA>":\n{}'.
                         format(str(sha), textwrap.indent(c.message, '\t')))
                     rsha = None
@@ -238,9 +348,9 @@ class RepoAnalyzer:
                         rsha = 'af7b2f48e88bd3f260347138f87e5c4f7819b273'
 
                 if rsha in downstream_out:
-                    log.dbg('** commit {} ("{}") was reverted in {}'.
-                            format(rsha, commit_title(downstream_out[rsha]),
-                                   sha), level=log.VERBOSE_VERY)
+                    self.debug_messages.append(
+                        '** commit {} ("{}") was reverted in {}'.
+                        format(rsha, commit_title(downstream_out[rsha]), sha))
                     del downstream_out[rsha]
                     continue
                 elif rsha is not None:
@@ -248,18 +358,15 @@ class RepoAnalyzer:
                     # (It might not be in all_downstream_oot if e.g.
                     # downstream reverts an upstream patch as a hotfix, and we
                     # shouldn't warn about that.)
-                    is_ancestor = _run_git(
-                        self.downstream_repo,
-                        ['merge-base', '--is-ancestor', rsha, downstream_sha],
-                        check=False).returncode == 0
-                    if not is_ancestor:
-                        log.wrn(('commit {} ("{}") reverts {}, '
-                                 "which isn't in downstream history").
-                                format(sha, sl, rsha))
+                    if not self._is_ancestor(rsha, downstream_sha):
+                        self.warnings.append(
+                            ('commit {} ("{}") reverts {}, '
+                             "which isn't in downstream history").
+                            format(sha, sl, rsha))
 
             downstream_out[sha] = c
-            log.dbg('** added oot patch: {} ("{}")'.format(sha, sl),
-                    level=log.VERBOSE_VERY)
+            self.debug_messages.append(
+                '** added oot patch: {} ("{}")'.format(sha, sl))
 
         return list(downstream_out.values())
 
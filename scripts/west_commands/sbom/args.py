@@ -59,6 +59,10 @@ class ArgsClass:
     output_html: 'str|None'
     output_cache_database: 'str|None'
     input_cache_database: 'str|None'
+    license_cache: 'str|None'
+    input_state: 'str|None'
+    output_state: 'str|None'
+    no_license_cache: bool
     allowed_in_map_file_only: 'str'
     processes: int
     scancode: str
@@ -114,6 +118,20 @@ def add_arguments(parser: argparse.ArgumentParser):
     parser.add_argument('--input-cache-database', default=None,
                         help='Input license database. The database is passed to the "cache-databe" '
                              'detector')
+    parser.add_argument('--license-cache', default=None,
+                        help='License cache database file. Results of the "full-text" and '
+                             '"scancode-toolkit" detectors are stored in it, so unchanged files '
+                             'are not scanned again. By default, "ncs-sbom-cache.db" file in the '
+                             '".west" directory of the west workspace is used.')
+    parser.add_argument('--no-license-cache', action='store_true',
+                        help='Do not read or update the license cache.')
+    parser.add_argument('--input-state', default=None,
+                        help='State file of a previous run created with "--output-state". '
+                             'Licenses of files with unchanged path and SHA-1 are taken from it, '
+                             'so license detectors are executed only for new and changed files.')
+    parser.add_argument('--output-state', default=None,
+                        help='Write state file containing detected licenses of all files. It can '
+                             'be used with "--input-state" in the next run.')
     parser.add_argument('--allowed-in-map-file-only',
                         default='libgcc.a,'
                                 'libc_nano.a,libc++_nano.a,libm_nano.a,'
@@ -133,8 +151,8 @@ def add_arguments(parser: argparse.ArgumentParser):
                         help='Path to GNU binutils "ar" executable. '
                              'By default, it will be automatically detected.')
     parser.add_argument('--ninja', default=None,
-                        help='Path to "ninja" executable. '
-                             'By default, it will be automatically detected.')
+                        help='Not used. The ninja build files are read directly. The option is '
+                             'kept for backward compatibility.')
     parser.add_argument('--help-detectors', action='store_true',
                         help='Show help for each available detector and exit.')
 
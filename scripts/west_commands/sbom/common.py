@@ -115,6 +115,39 @@ def concurrent_pool_iter(func: Callable, iterable: Iterable, use_process: bool=F
     return zip(it, collected, range(len(collected)))
 
 
+stage_times: 'list[tuple[str, float]]' = list()
+
+
+class TimedStage:
+    '''Context manager that shows debug logs at the beginning and at the end of a script stage.
+    Duration of the stage is stored for the timing breakdown shown by log_stage_times().'''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        log.dbg(self.name)
+        self.start = time()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time() - self.start
+        stage_times.append((self.name, elapsed))
+        log.dbg(f'{self.name}: Done in {round(elapsed, 2)}s')
+
+
+def log_stage_times():
+    '''Show debug log with time spent in each script stage.'''
+    total = sum(elapsed for _, elapsed in stage_times)
+    lines = ['Timing breakdown:']
+    for name, elapsed in stage_times:
+        percent = 100 * elapsed / total if total > 0 else 0
+        lines.append(f'  {name:<40} {elapsed:8.2f}s {percent:5.1f}%')
+    lines.append(f'  {"TOTAL":<40} {total:8.2f}s')
+    log.dbg('\n'.join(lines))
+
+
 def dbg_time(message: 'str|None' = None, level = log.VERBOSE_NORMAL):
     '''Return object that will convert to string containing time elapsed from this function call.
     Optionally it can show a debug log'''
@@ -22,8 +22,22 @@ class DataBaseClass:
             setattr(self, name, copy.copy(getattr(self, name)))
 
 
-class FileInfo(DataBaseClass):
+interned_sets: 'dict[frozenset[str], frozenset[str]]' = dict()
+
+
+def intern_set(values: 'set[str]|frozenset[str]|list[str]') -> 'frozenset[str]':
+    '''Returns a frozenset with the same content as "values". Identical sets are shared, so
+    a large number of files with the same licenses keeps only one copy of the set.'''
+    key = frozenset(values)
+    return interned_sets.setdefault(key, key)
+
+
+class FileInfo:
     ''' Contains file information about each input file
+    There may be a large number of instances of this class, so it uses "__slots__" instead
+    of the DataBaseClass to reduce memory usage. Sets are replaced by shared frozensets
+    (see "intern_set") after the license detection is done.
+
     Attributes:
         file_path           File path
         file_rel_path       Path relative to west workspace
@@ -33,15 +47,21 @@ class FileInfo(DataBaseClass):
         local_modifications The file was modified and does not match version of this package
         sha1                SHA-1 of the file
         detectors           Set of detectors that contributed to the list of licenses
+        content_licenses    Licenses found by each content detector during the file scanning
     '''
-    file_path: Path
-    file_rel_path: Path
-    licenses: 'set[str]' = set()
-    license_expr: str
-    package: 'str' = ''
-    local_modifications: bool = False
-    sha1: str
-    detectors: 'set[str]' = set()
+    __slots__ = ('file_path', 'file_rel_path', 'licenses', 'license_expr', 'package',
+                 'local_modifications', 'sha1', 'detectors', 'content_licenses')
+
+    def __init__(self) -> None:
+        self.file_path: Path
+        self.file_rel_path: Path
+        self.licenses: 'set[str]' = set()
+        self.license_expr: str
+        self.package: str = ''
+        self.local_modifications: bool = False
+        self.sha1: str
+        self.detectors: 'set[str]' = set()
+        self.content_licenses: 'dict[str, frozenset[str]]' = dict()
 
 
 class License(DataBaseClass):
@@ -14,11 +14,16 @@ relative directory where the external file is located. The value ends at the end
 so don't use any comment closing characters or whitespaces at the end of the line.
 '''
 
-from pathlib import Path
+import fnmatch
+import hashlib
+import os
+import pickle
 import re
 import traceback
-from west import log
-from data_structure import Data
+from pathlib import Path
+from west import log, util
+from common import concurrent_pool_iter
+from data_structure import Data, FileInfo
 
 
 SPDX_TAG_RE = re.compile(
@@ -33,12 +38,33 @@ EXTERNAL_FILE_RE = re.compile(
     r'LICENSE|LICENCE|COPYING',
     re.IGNORECASE)
 
+GLOB_WILDCARD_RE = re.compile(r'[*?[]')
+
+# Path.glob is case-insensitive on Windows.
+GLOB_FLAGS = re.IGNORECASE if os.name == 'nt' else 0
+
+INDEX_FILE = 'ncs-sbom-external-files.cache'
+
+# Increment when format of the cached index changes.
+INDEX_VERSION = 1
 
-detected_files = dict()
-dir_search_done = set()
 
+# Directory index: directory path as a key and a tuple containing the directory modification
+# time and a tuple of external files. Each external file is described by a tuple containing:
+# file name, modification time, size, tuple of licenses and tuple of globs.
+directory_index: 'dict[str, tuple[int|None, tuple]]' = dict()
 
-def parse_license_file(file: Path):
+# Globs containing wildcards. Key is a tuple of path parts of the directory where wildcards
+# begin and value is a list of tuples: compiled patterns of the remaining path parts (None for
+# the "**") and a set of licenses.
+glob_rules: 'dict[tuple[str], list[tuple[tuple[re.Pattern|None], set[str]]]]' = dict()
+
+# Exact file paths (as a tuple of path parts) without wildcards and their licenses.
+exact_rules: 'dict[tuple[str], set[str]]' = dict()
+
+
+def parse_license_file(file: Path) -> 'tuple[tuple[str], tuple[str]]':
+    '''Returns licenses and globs from the external license file.'''
     try:
         with open(file, 'r', encoding='8859') as fd:
             content = fd.read()
@@ -48,64 +74,195 @@ def parse_license_file(file: Path):
         # must be accessible.
         log.dbg(f'Exception reading file "{file}": {traceback.format_exc()}',
                 level=log.VERBOSE_VERY)
-        return
+        return (), ()
     licenses = set()
     for m in SPDX_TAG_RE.finditer(content):
         id = m.group(1).strip()
         if id != '':
             licenses.add(id.upper())
     if len(licenses) == 0:
-        return
-    log.dbg(f'External file {file} with {licenses}')
+        return (), ()
+    globs = list()
     for m in APPLY_TO_FILES_TAG_RE.finditer(content):
         if m.group(1) is not None:
-            glob = re.sub(r'\\(.)', r'\1', m.group(1).strip())
+            globs.append(re.sub(r'\\(.)', r'\1', m.group(1).strip()))
         else:
-            glob = m.group(2).strip()
-        log.dbg(f'  describes {glob}:', level=log.VERBOSE_EXTREME)
-        try:
-            matched_files = tuple(file.parent.glob(glob))
-        except ValueError as ex:
-            log.wrn(f'Invalid glob "{glob}": {ex}')
-            continue
-        for matched in matched_files:
-            matched_str = str(matched)
-            log.dbg(f'    {matched_str}', level=log.VERBOSE_EXTREME)
-            if matched_str not in detected_files:
-                detected_files[matched_str] = set()
-            detected_files[matched_str].update(licenses)
+            globs.append(m.group(2).strip())
+    return tuple(sorted(licenses)), tuple(globs)
 
 
-def search_dir(directory: Path):
-    if str(directory) in dir_search_done:
-        return
+def scan_dir(directory: str) -> 'tuple[int|None, tuple]':
+    '''Returns directory index entry containing the external files from the directory.'''
     try:
-        listdir = list(directory.iterdir())
+        mtime = os.stat(directory).st_mtime_ns
+        external_files = list()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if EXTERNAL_FILE_RE.search(entry.name) is None or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                licenses, globs = parse_license_file(Path(entry.path))
+                external_files.append((entry.name, stat.st_mtime_ns, stat.st_size, licenses,
+                                       globs))
     except: # pylint: disable=bare-except
         # Going up to root directory may cause some unexpected IO/permission problems.
         # It is ok to ignore them all, because we can assume that a valid external file
         # must be accessible.
         log.dbg(f'Exception reading directory "{directory}": {traceback.format_exc()}',
                 level=log.VERBOSE_VERY)
-        listdir = list()
-    for file in listdir:
-        if (file.is_file() and EXTERNAL_FILE_RE.search(file.name) is not None):
-            parse_license_file(file)
-    dir_search_done.add(str(directory))
-    if directory.parent != directory:
-        search_dir(directory.parent)
+        return (None, ())
+    return (mtime, tuple(external_files))
+
+
+def is_up_to_date(directory: str, entry: 'tuple[int|None, tuple]') -> bool:
+    '''Returns True if the directory and its external files were not changed since
+    the directory index entry was created.'''
+    mtime, external_files = entry
+    try:
+        if os.stat(directory).st_mtime_ns != mtime:
+            return False
+        for name, file_mtime, size, _, _ in external_files:
+            stat = os.stat(os.path.join(directory, name))
+            if stat.st_mtime_ns != file_mtime or stat.st_size != size:
+                return False
+    except OSError:
+        return mtime is None
+    return True
+
+
+def get_index_file() -> Path:
+    '''Returns path of the file where the directory index is cached.'''
+    return Path(util.west_topdir()) / '.west' / INDEX_FILE
+
+
+def load_index():
+    '''Load the directory index cached by the previous runs.'''
+    try:
+        with open(get_index_file(), 'rb') as fd:
+            version, index = pickle.load(fd)
+        if version == INDEX_VERSION:
+            directory_index.update(index)
+    except Exception: # pylint: disable=broad-except
+        # Missing, outdated or corrupted cache file is silently replaced with a new one.
+        pass
+
+
+def save_index():
+    '''Store the directory index for the following runs.'''
+    index_file = get_index_file()
+    try:
+        with open(index_file, 'wb') as fd:
+            pickle.dump((INDEX_VERSION, directory_index), fd)
+    except OSError as ex:
+        log.wrn(f'Cannot write external files index "{index_file}": {ex}')
+
+
+def update_index(directories: 'set[str]'):
+    '''Scan directories that are not indexed yet or changed since they were indexed.'''
+    outdated = tuple(directory for directory in sorted(directories)
+                     if (directory not in directory_index) or
+                     not is_up_to_date(directory, directory_index[directory]))
+    log.dbg(f'Scanning {len(outdated)} of {len(directories)} directories for external files')
+    for entry, directory, _ in concurrent_pool_iter(scan_dir, outdated, False, 64):
+        directory_index[directory] = entry
+    if len(outdated) > 0:
+        save_index()
+
+
+def add_rules(directory: str, licenses: 'tuple[str]', globs: 'tuple[str]'):
+    '''Add globs from the external file located in the directory to the rules.'''
+    for glob in globs:
+        if glob == '' or os.path.isabs(glob):
+            log.wrn(f'Invalid glob "{glob}" in "{directory}"')
+            continue
+        log.dbg(f'  describes {glob}', level=log.VERBOSE_EXTREME)
+        parts = Path(os.path.normpath(os.path.join(directory, glob))).parts
+        for index, part in enumerate(parts):
+            if GLOB_WILDCARD_RE.search(part) is not None:
+                patterns = tuple(None if part == '**' else
+                                 re.compile(fnmatch.translate(part), GLOB_FLAGS)
+                                 for part in parts[index:])
+                glob_rules.setdefault(parts[:index], list()).append((patterns, set(licenses)))
+                break
+        else:
+            exact_rules.setdefault(parts, set()).update(licenses)
+
+
+def match_parts(parts: 'tuple[str]', patterns: 'tuple[re.Pattern|None]') -> bool:
+    '''Returns True if path parts match the glob patterns. The "**" pattern (None) matches
+    zero or more directories, but not the file name, in the same way as Path.glob does.'''
+    if len(patterns) == 0:
+        return len(parts) == 0
+    if patterns[0] is None:
+        for index in range(len(parts)):
+            if match_parts(parts[index:], patterns[1:]):
+                return True
+        return False
+    return ((len(parts) > 0) and (patterns[0].match(parts[0]) is not None) and
+            match_parts(parts[1:], patterns[1:]))
+
+
+def lookup(file_path: Path) -> 'set[str]':
+    '''Returns licenses that the external files apply to the file.'''
+    parts = file_path.parts
+    result = set(exact_rules.get(parts, ()))
+    if len(glob_rules) > 0:
+        for index in range(1, len(parts)):
+            for patterns, licenses in glob_rules.get(parts[:index], ()):
+                if match_parts(parts[index:], patterns):
+                    result.update(licenses)
+    return result
+
+
+def get_directories(files: 'list[FileInfo]') -> 'set[str]':
+    '''Returns directories where external files applying to the files can be located.'''
+    directories = set()
+    for file in files:
+        directory = file.file_path.parent
+        while str(directory) not in directories:
+            directories.add(str(directory))
+            if directory.parent == directory:
+                break
+            directory = directory.parent
+    return directories
+
+
+def get_state_key(data: Data) -> str:
+    '''Returns hash of the external files that can apply to the files. It changes when
+    licenses or globs in any of them change, so the incremental state is not reused.'''
+    directories = get_directories(data.files)
+    load_index()
+    update_index(directories)
+    hash = hashlib.sha1()
+    for directory in sorted(directories):
+        for name, _, _, licenses, globs in sorted(directory_index[directory][1]):
+            if len(licenses) > 0:
+                hash.update(repr((directory, name, licenses, globs)).encode())
+    return hash.hexdigest()
 
 
 def detect(data: Data, optional: bool):
     '''External file detector.'''
 
     if optional:
-        filtered = filter(lambda file: len(file.licenses) == 0, data.files)
+        filtered = tuple(filter(lambda file: len(file.licenses) == 0, data.files))
     else:
         filtered = data.files
 
+    directories = get_directories(filtered)
+    load_index()
+    update_index(directories)
+
+    glob_rules.clear()
+    exact_rules.clear()
+    for directory in sorted(directories):
+        for name, _, _, licenses, globs in directory_index[directory][1]:
+            if len(licenses) > 0:
+                log.dbg(f'External file {os.path.join(directory, name)} with {set(licenses)}')
+                add_rules(directory, licenses, globs)
+
     for file in filtered:
-        search_dir(file.file_path.parent)
-        if str(file.file_path) in detected_files:
-            file.licenses.update(detected_files[str(file.file_path)])
+        licenses = lookup(file.file_path)
+        if len(licenses) > 0:
+            file.licenses.update(licenses)
             file.detectors.add('external-file')
@@ -0,0 +1,114 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+'''
+Single-pass scanning of input files.
+Each file is read only once. The same buffer is used to calculate SHA-1 and to run all enabled
+content detectors. Results are stored in FileInfo and applied later by each detector in
+the order given in the command line arguments. Results of versioned detectors are reused from
+the license cache, so unchanged files are not searched again.
+'''
+
+import os
+import hashlib
+import mmap
+from functools import partial
+from pathlib import Path
+from typing import Callable
+from west import log
+from data_structure import Data, intern_set
+from common import SbomException, concurrent_pool_iter
+from license_cache import get_cache, get_worker_cache
+
+
+# Files larger than this are memory mapped instead of read into a buffer.
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def read_file(file_path: Path) -> 'tuple[str, str]':
+    '''Read file and return tuple containing SHA-1 and content decoded as ISO-8859-1 text.'''
+    try:
+        with open(file_path, 'rb') as fd:
+            size = os.fstat(fd.fileno()).st_size
+            if size < MMAP_THRESHOLD:
+                buffer = fd.read()
+                return hashlib.sha1(buffer).hexdigest(), str(buffer, '8859')
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return hashlib.sha1(buffer).hexdigest(), str(buffer, '8859')
+    except Exception as ex:
+        raise SbomException(f'Error reading file "{file_path}"') from ex
+
+
+def scan_file(file_item: 'tuple[Path, str|None]',
+              detectors: 'tuple[tuple[str, Callable, bool, str|None]]',
+              cache_file: 'Path|None') -> 'tuple[str, dict[str, set[str]], set[str]]':
+    '''Read the file once and run all content detectors on its content.
+    The "file_item" contains the file path and SHA-1 from the previous run. Detectors are
+    not executed if SHA-1 is the same.
+    Optional detector is skipped if any of the previous content detectors has already
+    detected any license. Results of detectors with a version are taken from the license cache
+    if available. Returns SHA-1, results of each detector and set of detectors that were
+    executed and their results should be stored in the cache.'''
+    file_path, previous_sha1 = file_item
+    sha1, content = read_file(file_path)
+    if sha1 == previous_sha1:
+        return sha1, dict(), set()
+    cache = get_worker_cache(cache_file) if cache_file is not None else None
+    results = dict()
+    executed = set()
+    detected = False
+    for name, func, optional, version in detectors:
+        if optional and detected:
+            continue
+        licenses = None
+        if cache is not None and version is not None:
+            licenses = cache.get(sha1, name, version)
+        if licenses is None:
+            licenses = func(content)
+            executed.add(name)
+        results[name] = set(licenses)
+        detected = detected or len(licenses) > 0
+    return sha1, results, executed
+
+
+def scan(data: Data, detectors: 'tuple[tuple[str, Callable, bool, str|None]]',
+         previous_sha1: 'list[str|None]|None' = None):
+    '''Calculate SHA-1 and run content detectors for each entry in data.files list.
+    The "detectors" contains tuples: detector name, function that returns set of detected
+    licenses from the file content, a flag indicating that the detector is optional and
+    the detector version used as a license cache key (None if results are not cached).
+    The optional "previous_sha1" contains SHA-1 of each file from the previous run. Detectors
+    are not executed for the files that were not changed since then.'''
+    cache = get_cache()
+    cache_file = cache.file_path if cache is not None else None
+    versions = dict((name, version) for name, _, _, version in detectors)
+    func = partial(scan_file, detectors=tuple(detectors), cache_file=cache_file)
+    if previous_sha1 is None:
+        previous_sha1 = [None] * len(data.files)
+    items = tuple(zip((file.file_path for file in data.files), previous_sha1))
+    new_entries = list()
+    for (sha1, results, executed), _, index in concurrent_pool_iter(func, items, True, 256):
+        file = data.files[index]
+        file.sha1 = sha1
+        file.content_licenses = dict((name, intern_set(licenses))
+                                     for name, licenses in results.items())
+        for name in executed:
+            if versions[name] is not None:
+                new_entries.append((sha1, name, versions[name], sorted(results[name])))
+    if cache is not None:
+        log.dbg(f'Storing {len(new_entries)} new content detector results in the license cache')
+        cache.put(new_entries)
+
+
+def apply_results(data: Data, detector_name: str, optional: bool):
+    '''Update licenses of each file with results of the content detector collected during
+    the scanning.'''
+    for file in data.files:
+        if optional and len(file.licenses) > 0:
+            continue
+        results = file.content_licenses.get(detector_name)
+        if results:
+            file.licenses.update(results)
+            file.detectors.add(detector_name)
@@ -8,43 +8,89 @@ Input files from command line and/or a text file.
 '''
 
 import re
+import hashlib
+from pathlib import Path
 from west import log
-from data_structure import Data, FileInfo
-from common import SbomException, concurrent_pool_iter
+from data_structure import Data
+from file_scanner import apply_results
 from license_utils import get_license_texts
 
 
-COMMENTS_STRIP_RE = re.compile(r'^\s*(?:\/?\*|\/\/|#)?\s*(.*?)\s*(?:\*\/?|\/\/|#)?\s*$')
+COMMENT_BEGIN_MARKERS = ('/*', '*', '//', '#')
+COMMENT_END_MARKERS = ('*/', '*', '//', '#')
 WHITESPACE_COLLAPSE_RE = re.compile(r'\s+')
+ANCHOR_WORD_RE = re.compile(r'[a-zA-Z0-9]+')
+ANCHOR_WORDS_COUNT = 4
 
+# Increment when detection algorithm changes, so results from the license cache are not reused.
+DETECTOR_VERSION = 1
 
-normalized_texts: 'list(tuple(str, str))' = list()
-detector_patterns: 'list(tuple(re.Pattern, str))' = list()
+
+normalized_texts: 'list(tuple(str, str, tuple[str]))' = list()
+detector_patterns: 'list(tuple(re.Pattern, str, tuple[str]))' = list()
 subset_licenses: 'dict(set(str))' = dict()
 
 
+def strip_comment(line: str) -> str:
+    '''Remove whitespaces and a comment marker from the beginning and the end of the line.'''
+    line = line.strip()
+    for marker in COMMENT_BEGIN_MARKERS:
+        if line.startswith(marker):
+            line = line[len(marker):].lstrip()
+            break
+    for marker in COMMENT_END_MARKERS:
+        if line.endswith(marker):
+            line = line[:-len(marker)].rstrip()
+            break
+    return line
+
+
 def normalize_text(text: str, strip_comments: bool = False):
     '''Normalize text to allow comparison of license texts.'''
     if strip_comments:
-        out = ''
-        for line in text.split('\n'):
-            out += COMMENTS_STRIP_RE.sub(r'\1', line) + '\n'
-        text = out
+        text = '\n'.join(strip_comment(line) for line in text.split('\n'))
     return WHITESPACE_COLLAPSE_RE.sub(' ', text).strip()
 
 
+def select_anchors(text: str) -> 'tuple[str]':
+    '''Select anchor words of the normalized literal license text.
+
+    Normalization only removes characters, so each word of a license text is also present in
+    the raw file content containing that license. The file content is normalized and searched
+    only for licenses with all anchors present in it. The longest words are selected, because
+    they are the least likely to appear in a source code, so the check usually stops at
+    the first anchor.
+    '''
+    words = sorted(set(ANCHOR_WORD_RE.findall(text)), key=lambda word: (-len(word), word))
+    return tuple(words[:ANCHOR_WORDS_COUNT])
+
+
+def has_anchors(content: str, anchors: 'tuple[str]') -> bool:
+    '''Returns True if all anchor words are present in the content.'''
+    for word in anchors:
+        if word not in content:
+            return False
+    return True
+
+
 def init():
     '''Initialize global variables if not initialized yet'''
-    if len(normalized_texts) == 0:
+    if len(normalized_texts) == 0 and len(detector_patterns) == 0:
         for license in get_license_texts():
             if license.detector is None:
-                normalized_texts.append((normalize_text(license.text), license.id))
+                text = normalize_text(license.text)
+                anchors = select_anchors(text)
+                normalized_texts.append((text, license.id, anchors))
             else:
                 pattern = ''
+                plain_parts = list()
                 for part in license.detector.split('</regex>'):
                     plain, *regex = part.split('<regex>') + ['']
+                    plain_parts.append(normalize_text(plain))
                     pattern += re.escape(normalize_text(plain)) + ''.join(regex)
-                detector_patterns.append((re.compile(pattern), license.id))
+                anchors = select_anchors(' '.join(plain_parts))
+                detector_patterns.append((re.compile(pattern), license.id, anchors))
+            log.dbg(f'Anchors of {license.id} license text: {anchors}', level=log.VERBOSE_EXTREME)
         subset = dict()
         for license in get_license_texts():
             results = detect_text(license.text)
@@ -57,13 +103,19 @@ def init():
 
 def detect_text(content: str) -> 'set(str)':
     '''Detect license text in the string.'''
+    texts = tuple((text, id) for text, id, anchors in normalized_texts
+                  if has_anchors(content, anchors))
+    patterns = tuple((pattern, id) for pattern, id, anchors in detector_patterns
+                     if has_anchors(content, anchors))
     results = set()
+    if len(texts) == 0 and len(patterns) == 0:
+        return results
     content = normalize_text(content, True)
-    for text, id in normalized_texts:
+    for text, id in texts:
         pos = content.find(text)
         if pos >= 0:
             results.add(id.upper())
-    for pattern, id in detector_patterns:
+    for pattern, id in patterns:
         if pattern.search(content) is not None:
             results.add(id.upper())
     for result in tuple(results):
@@ -72,27 +124,21 @@ def detect_text(content: str) -> 'set(str)':
     return results
 
 
-def detect_file(file: FileInfo) -> 'set(str)':
-    '''Detect license text in the file.'''
+def get_version() -> str:
+    '''Return detector version used as a license cache key. It includes a hash of the license
+    texts database, so results are detected again when the database changes.'''
+    with open(Path(__file__).parent / 'data/license-texts.yaml', 'rb') as fd:
+        texts_hash = hashlib.sha1(fd.read()).hexdigest()
+    return f'{DETECTOR_VERSION}-{texts_hash}'
+
+
+def detect_content(content: str) -> 'set(str)':
+    '''Detect license text in the file content.'''
     init()
-    try:
-        with open(file.file_path, 'r', encoding='8859') as fd:
-            content = fd.read()
-    except Exception as e:
-        raise SbomException(f'Error reading file "{file.file_path}"') from e
     return detect_text(content)
 
 
 def detect(data: Data, optional: bool):
     '''Detect licenses in input files by comparing them with known license texts from
-    license-texts.yaml.'''
-
-    if optional:
-        filtered = filter(lambda file: len(file.licenses) == 0, data.files)
-    else:
-        filtered = data.files
-
-    for results, file, _ in concurrent_pool_iter(detect_file, filtered, True, 2048):
-        if len(results) > 0:
-            file.licenses.update(results)
-            file.detectors.add('full-text')
+    license-texts.yaml. Files are scanned by the file_scanner, so only results are applied.'''
+    apply_results(data, 'full-text', optional)
@@ -3,13 +3,55 @@
 #
 # SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
 
+'''
+Detector that fills package information of each file using git.
+Files are grouped by their git repository, so git is queried once for each repository.
+If pygit2 is available, the repositories are read in-process without starting git.
+'''
+
+import os
 import sys
 from pathlib import Path
-from west import log
+from west import log, util
 from args import args
 from common import SbomException, command_execute, concurrent_pool_iter
-from data_structure import Data, FileInfo, Package  # pylint: disable=unused-import
-                                                    # FileInfo is used.
+from data_structure import Data, Package
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+
+class RepoInfo:
+    '''Information about git repository.
+    Attributes:
+        root       Repository toplevel directory
+        sha        Commit SHA of HEAD or None
+        origin     Remote URL of the repository or None
+        modified   Set of modified or untracked paths relative to the root
+        ignored    Set of ignored paths relative to the root, directories end with "/"
+    '''
+    def __init__(self, root: Path):
+        self.root = root
+        self.sha: 'str|None' = None
+        self.origin: 'str|None' = None
+        self.modified: 'set[str]' = set()
+        self.ignored: 'set[str]' = set()
+
+    def is_ignored(self, path: str) -> bool:
+        '''Returns True if the path (relative to the root) is ignored by git.'''
+        if path in self.ignored:
+            return True
+        parts = path.split('/')
+        for i in range(1, len(parts)):
+            if '/'.join(parts[:i]) + '/' in self.ignored:
+                return True
+        return False
+
+
+repo_roots: 'dict[Path, Path|None]' = dict()
+west_projects: 'list[tuple[str, str]]|None' = None
 
 
 def split_lines(text: str) -> 'tuple[str]':
@@ -17,34 +59,49 @@ def split_lines(text: str) -> 'tuple[str]':
     return tuple(line.strip() for line in text.split('\n') if len(line.strip()))
 
 
-def get_remote_url(path: Path, remote_name: str) -> str:
-    '''Returns URL from specified git remote name and path.'''
-    output = command_execute(args.git, 'remote', 'get-url', remote_name, cwd=path)
-    return output.strip()
-
-
-def get_origin(absolute_path: Path, relative_path: Path) -> 'str|None':
-    '''Try to find out the git original source on specified path.'''
-    output, error_code = command_execute(args.git, 'remote', cwd=absolute_path,
-                                         return_error_code=True, allow_stderr=True)
-    if error_code != 0:
-        log.wrn(f'Directory "{relative_path}" does not provide valid git remote information.')
-        return None
-    remotes = split_lines(output)
+def find_repo_root(directory: Path) -> 'Path|None':
+    '''Find toplevel directory of the git repository containing specified directory.'''
+    visited = list()
+    root = None
+    while True:
+        if directory in repo_roots:
+            root = repo_roots[directory]
+            break
+        visited.append(directory)
+        if (directory / '.git').exists():
+            root = directory
+            break
+        if directory.parent == directory:
+            break
+        directory = directory.parent
+    for directory in visited:
+        repo_roots[directory] = root
+    return root
+
+
+def get_west_projects() -> 'list[tuple[str, str]]':
+    '''Returns list of west projects paths and URLs. The list is read only once, before
+    the repositories are read in the concurrent pool.'''
+    global west_projects
+    if west_projects is None:
+        output, _ = command_execute(sys.argv[0], 'list', '-f', '{path}`{url}',
+                                    cwd=util.west_topdir(), return_error_code=True,
+                                    allow_stderr=True)
+        west_projects = list()
+        for project in split_lines(output):
+            pair = project.split('`')
+            if len(pair) == 2:
+                west_projects.append((pair[0], pair[1]))
+    return west_projects
+
+
+def select_origin(remotes: 'dict[str, str]', relative_path: Path) -> 'str|None':
+    '''Select the original source URL from the git remotes of the repository.'''
     if len(remotes) == 1:
-        return get_remote_url(absolute_path, remotes[0])
-    git_urls = set()
+        return tuple(remotes.values())[0]
+    git_urls = set(remotes.values())
     west_urls = set()
-    for remote in remotes:
-        git_urls.add(get_remote_url(absolute_path, remote))
-    output, _ = command_execute(sys.argv[0], 'list', '-f', '{path}`{url}', cwd=absolute_path,
-                                return_error_code=True, allow_stderr=True)
-    projects = split_lines(output)
-    for project in projects:
-        pair = project.split('`')
-        if len(pair) != 2:
-            continue
-        project_path, url = pair
+    for project_path, url in get_west_projects():
         if ((not url.startswith('http')) and (not url.startswith('ssh')) and
             (not url.startswith('git'))):
             continue
@@ -54,63 +111,92 @@ def get_origin(absolute_path: Path, relative_path: Path) -> 'str|None':
             west_urls.add(url)
     for url in git_urls.intersection(west_urls):
         return url
-    for remote in remotes:
-        if remote == 'origin':
-            return get_remote_url(absolute_path, remote)
+    if 'origin' in remotes:
+        return remotes['origin']
     for url in git_urls:
         return url
     return None
 
 
-def get_sha(absolute_path: Path) -> 'str|None':
-    ''' Returns git commit SHA on specified path. '''
-    output, error_code = command_execute(args.git, 'rev-parse', 'HEAD',
-                                         cwd=absolute_path, return_error_code=True,
-                                         allow_stderr=True)
+def read_repo_git(repo: RepoInfo) -> 'dict[str, str]|None':
+    '''Read repository information using git command. Returns remotes.'''
+    output, error_code = command_execute(args.git, 'rev-parse', 'HEAD', cwd=repo.root,
+                                         return_error_code=True, allow_stderr=True)
     output = output.strip()
-    return output if (len(output) == 40) and (error_code == 0) else None
-
-
-def detect_dir(func_args: 'tuple[list[FileInfo],Data]') -> None:
-    '''Read input file content and try to detect licenses by its content.'''
-    files = func_args[0]
-    data = func_args[1]
-    modified_files = set()
-    untracked_files = set()
-    absolute_path = Path(files[0].file_path).parent
-    relative_path = Path(files[0].file_rel_path).parent
-    git_sha = get_sha(absolute_path)
-    git_origin = get_origin(absolute_path, relative_path)
-    if (git_sha is not None) and (git_origin is not None):
-        package_id = f'git#{git_origin}#{git_sha}'.upper()
-        output, error_code = command_execute(args.git, 'status', '--porcelain', '--ignored',
-                                             '--untracked-files=all', '*', cwd=absolute_path,
-                                             return_error_code=True, allow_stderr=True)
-        if error_code != 0:
-            log.wrn(f'Directory "{absolute_path}" does not provide valid git status information.')
-        for line in split_lines(output):
-            change_type = line[0:2]
-            if change_type == '  ':
-                continue
-            if change_type == '!!':
-                untracked_files.add(Path(line[3:]).name.upper())
-                continue
-            modified_files.add(Path(line[3:]).name.upper())
+    repo.sha = output if (len(output) == 40) and (error_code == 0) else None
+    output, error_code = command_execute(args.git, 'remote', cwd=repo.root,
+                                         return_error_code=True, allow_stderr=True)
+    if error_code != 0:
+        return None
+    remotes = dict()
+    for remote in split_lines(output):
+        url = command_execute(args.git, 'remote', 'get-url', remote, cwd=repo.root)
+        remotes[remote] = url.strip()
+    return remotes
+
+
+def read_status_git(repo: RepoInfo):
+    '''Read modified and ignored files using git command.'''
+    output, error_code = command_execute(args.git, 'status', '--porcelain', '-z', '--ignored',
+                                         '--untracked-files=all', cwd=repo.root,
+                                         return_error_code=True, allow_stderr=True)
+    if error_code != 0:
+        log.wrn(f'Directory "{repo.root}" does not provide valid git status information.')
+        return
+    entries = iter(output.split('\0'))
+    for entry in entries:
+        if len(entry) < 4:
+            continue
+        change_type = entry[0:2]
+        if change_type[0] in 'RC':
+            # Renamed or copied entry is followed by the original path
+            next(entries, None)
+        if change_type == '!!':
+            repo.ignored.add(entry[3:])
+        elif change_type != '  ':
+            repo.modified.add(entry[3:])
+
+
+def read_repo_pygit2(repo: RepoInfo) -> 'tuple[dict[str, str]|None, bool]':
+    '''Read repository information and status using pygit2. Returns remotes and True if
+    the status was read.'''
+    try:
+        git_repo = pygit2.Repository(str(repo.root))
+    except pygit2.GitError:
+        return None, False
+    try:
+        repo.sha = str(git_repo.head.target)
+    except pygit2.GitError:
+        repo.sha = None
+    remotes = dict((remote.name, remote.url) for remote in git_repo.remotes)
+    try:
+        status = git_repo.status(untracked_files='all', ignored=True)
+    except TypeError:
+        # Older pygit2 versions do not accept these arguments, git command is used instead.
+        return remotes, False
+    for path, flags in status.items():
+        if flags & pygit2.GIT_STATUS_IGNORED:
+            repo.ignored.add(path)
+        elif flags != pygit2.GIT_STATUS_CURRENT:
+            repo.modified.add(path)
+    return remotes, True
+
+
+def read_repo(root: Path) -> RepoInfo:
+    '''Read SHA, origin and status of the repository.'''
+    repo = RepoInfo(root)
+    if pygit2 is not None:
+        remotes, status_read = read_repo_pygit2(repo)
     else:
-        package_id = ''
-    if package_id not in data.packages:
-        package = Package()
-        package.id = package_id
-        package.url = git_origin
-        package.version = git_sha
-        data.packages[package_id] = package
-    for file in files:
-        file.package = package_id
-        file_name = Path(file.file_rel_path).name.upper()
-        if file_name in modified_files:
-            file.local_modifications = True
-        elif file_name.upper() in untracked_files:
-            file.package = ''
+        remotes, status_read = read_repo_git(repo), False
+    relative_path = Path(os.path.relpath(root, util.west_topdir()))
+    if remotes is None:
+        log.wrn(f'Directory "{relative_path}" does not provide valid git remote information.')
+    else:
+        repo.origin = select_origin(remotes, relative_path)
+    if (repo.sha is not None) and (repo.origin is not None) and not status_read:
+        read_status_git(repo)
+    return repo
 
 
 def check_external_tools():
@@ -130,14 +216,40 @@ def check_external_tools():
 def detect(data: Data, optional: bool):
     ''' Fill "data" with version information obtained with the "git". '''
 
-    check_external_tools()
+    if pygit2 is None:
+        check_external_tools()
 
-    group_by_dir = {}
+    group_by_repo = {}
     for file in data.files:
-        dir_name = str(file.file_rel_path.parent)
-        if dir_name not in group_by_dir:
-            group_by_dir[dir_name] = ([], data)
-        group_by_dir[dir_name][0].append(file)
-
-    for _, _, _ in concurrent_pool_iter(detect_dir, group_by_dir.values()):
-        pass
+        root = find_repo_root(Path(file.file_path).parent)
+        if root not in group_by_repo:
+            group_by_repo[root] = []
+        group_by_repo[root].append(file)
+
+    # Files outside of any repository stay in the unknown package
+    group_by_repo.pop(None, None)
+
+    # Read the list here, so the worker threads do not fill it concurrently.
+    if len(group_by_repo) > 0:
+        get_west_projects()
+
+    for repo, _, _ in concurrent_pool_iter(read_repo, tuple(group_by_repo.keys())):
+        if (repo.sha is not None) and (repo.origin is not None):
+            package_id = f'git#{repo.origin}#{repo.sha}'.upper()
+        else:
+            package_id = ''
+        if package_id not in data.packages:
+            package = Package()
+            package.id = package_id
+            package.url = repo.origin
+            package.version = repo.sha
+            data.packages[package_id] = package
+        for file in group_by_repo[repo.root]:
+            file.package = package_id
+            if package_id == '':
+                continue
+            path = Path(file.file_path).relative_to(repo.root).as_posix()
+            if repo.is_ignored(path):
+                file.package = ''
+            elif path in repo.modified:
+                file.local_modifications = True
@@ -0,0 +1,129 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+'''
+Incremental license detection based on a state file of the previous run.
+The state file contains SHA-1 and detected licenses of each file. Files with the same path
+(relative to the west workspace) and the same SHA-1 get licenses from the state file, so license
+detectors are executed only for new and changed files. The state file is reused only if
+the detectors configuration and their inputs (see get_state_config in main) are the same.
+'''
+
+import json
+from pathlib import Path
+from west import log
+from data_structure import Data, FileInfo, License
+from common import SbomException
+
+
+# Increment when format of the state file changes.
+STATE_VERSION = 1
+
+# Detectors that are always executed for all files. The "git-info" provides package
+# information, which is not stored in the state file.
+ALWAYS_EXECUTED_DETECTORS = {'git-info'}
+
+
+class State:
+    '''State of the previous run.
+    Attributes:
+        config    Configuration of the detectors. The state is used only if it is the same.
+        files     Dictionary of files with relative path as a key. The value contains "sha1",
+                  "licenses" and "detectors" keys.
+        licenses  Dictionary of licenses provided by detectors (not available in the license
+                  database) with license id as a key.
+    '''
+    config: dict
+    files: 'dict[str, dict]'
+    licenses: 'dict[str, dict]'
+
+
+def load_state(file_path: 'Path|str', config: dict) -> 'State|None':
+    '''Load state from file. Returns None if the state was created with different
+    configuration.'''
+    try:
+        with open(file_path, 'r') as fd:
+            content = json.load(fd)
+    except Exception as ex:
+        raise SbomException(f'Cannot read state file "{file_path}": {ex}') from ex
+    if content.get('version') != STATE_VERSION or content.get('config') != config:
+        log.wrn(f'State file "{file_path}" was created with different version or detectors '
+                f'configuration. Licenses of all files will be detected.')
+        return None
+    state = State()
+    state.config = content['config']
+    state.files = content['files']
+    state.licenses = content['licenses']
+    log.dbg(f'Loaded state of {len(state.files)} files from "{file_path}"')
+    return state
+
+
+def write_state(data: Data, file_path: 'Path|str', config: dict):
+    '''Write state of the current run to file.'''
+    files = dict()
+    for file in data.files:
+        files[str(file.file_rel_path)] = {
+            'sha1': file.sha1,
+            'licenses': sorted(file.licenses),
+            'detectors': sorted(file.detectors),
+        }
+    licenses = dict()
+    for id, license in data.licenses.items():
+        if license.is_expr:
+            continue
+        licenses[id] = {
+            'friendly_id': license.friendly_id,
+            'name': license.name,
+            'url': license.url,
+            'detectors': sorted(license.detectors),
+        }
+    content = {
+        'version': STATE_VERSION,
+        'config': config,
+        'files': files,
+        'licenses': licenses,
+    }
+    with open(file_path, 'w') as fd:
+        json.dump(content, fd, indent=1)
+    log.dbg(f'State of {len(files)} files written to "{file_path}"')
+
+
+def previous_sha1(data: Data, state: 'State|None') -> 'list[str|None]':
+    '''Returns SHA-1 of each file from the previous run or None for new files.'''
+    result = list()
+    for file in data.files:
+        entry = state.files.get(str(file.file_rel_path)) if state is not None else None
+        result.append(entry['sha1'] if entry is not None else None)
+    return result
+
+
+def restore_unchanged(data: Data, state: 'State|None') -> 'list[FileInfo]':
+    '''Restore licenses of unchanged files from the state. Returns list of new and changed files
+    that need license detection.'''
+    if state is None:
+        return data.files
+    changed = list()
+    restored = set()
+    for file in data.files:
+        entry = state.files.get(str(file.file_rel_path))
+        if entry is None or entry['sha1'] != file.sha1:
+            changed.append(file)
+            continue
+        file.licenses = set(entry['licenses'])
+        file.detectors = set(entry['detectors'])
+        restored.update(file.licenses)
+    for id in restored:
+        if (id in state.licenses) and (id not in data.licenses):
+            info = state.licenses[id]
+            license = License()
+            license.id = id
+            license.friendly_id = info['friendly_id']
+            license.name = info['name']
+            license.url = info['url']
+            license.detectors = set(info['detectors'])
+            data.licenses[id] = license
+    log.inf(f'Licenses of {len(data.files) - len(changed)} unchanged files restored from '
+            f'the state file, {len(changed)} files need detection.')
+    return changed
@@ -15,7 +15,8 @@ from types import SimpleNamespace
 from west import log, util
 from args import args
 from data_structure import Data, FileInfo
-from common import SbomException, command_execute
+from common import SbomException, command_execute, dbg_time
+import ninja_reader
 
 
 DEFAULT_BUILD_DIR = 'build'
@@ -41,6 +42,38 @@ def detect_file_type(file: Path) -> FileType:
         return FileType.OTHER
 
 
+def read_archive_members(archive_path: Path) -> 'list[str]|None':
+    '''Read names of the files contained in the GNU ar archive. Returns None if the archive
+    has different format and "ar -t" must be used instead.'''
+    with open(archive_path, 'rb') as fd:
+        content = fd.read()
+    if not content.startswith(b'!<arch>\n'):
+        return None
+    names = list()
+    long_names = b''
+    pos = 8
+    while pos + 60 <= len(content):
+        name = content[pos:pos + 16].decode('8859').rstrip(' ')
+        size = int(content[pos + 48:pos + 58])
+        pos += 60
+        if name == '//':
+            long_names = content[pos:pos + size]
+        elif name in ('/', '/SYM64/'):
+            pass
+        elif name.startswith('/') and name[1:].isdigit():
+            offset = int(name[1:])
+            end = long_names.find(b'/\n', offset)
+            if end < 0:
+                return None
+            names.append(long_names[offset:end].decode('8859'))
+        elif name.endswith('/'):
+            names.append(name[:-1])
+        else:
+            return None
+        pos += size + (size & 1)
+    return names
+
+
 class InputBuild:
     '''
     Class for extracting list of input files for a specific build direcory.
@@ -59,98 +92,22 @@ class InputBuild:
         self.map_items = None
         self.data = data
         self.build_dir = Path(build_dir)
-        deps_file_name = command_execute(args.ninja, '-t', 'deps', cwd=self.build_dir,
-                                         return_path=True)
-        self.parse_deps_file(deps_file_name)
-
-
-    def parse_deps_file(self, deps_file_name: str):
-        '''
-        Reads all dependencies stored in the .ninja_deps file and sores it in self.deps dictionary.
-        '''
-        self.deps = dict()
-        target_line_re = re.compile(r'([^\s]+)\s*:\s*(#.*)?')
-        dep_line_re = re.compile(r'\s+(.*?)\s*(#.*)?')
-        empty_line_re = re.compile(r'\s*(#.*)?')
-        with open(deps_file_name, 'r') as fd:
-            line_no = 0
-            while True:
-                line = fd.readline()
-                line_no += 1
-                if len(line) == 0:
-                    break
-                line = line.rstrip()
-                m = target_line_re.fullmatch(line)
-                if m is not None:
-                    dep = set()
-                    self.deps[m.group(1)] = dep
-                    continue
-                m = dep_line_re.fullmatch(line)
-                if m is not None:
-                    dep.add(m.group(1))
-                    continue
-                m = empty_line_re.fullmatch(line)
-                if m is None:
-                    raise SbomException(f'Cannot parse ninja dependencies output '
-                                        f'"{deps_file_name}" on line {line_no}!')
+        t = dbg_time(f'Loading ninja dependency graph of "{self.build_dir}"')
+        self.ninja = ninja_reader.load(self.build_dir)
+        self.deps = self.ninja.deps
+        log.dbg(f'Dependency graph loaded in {t}s')
 
 
     def query_inputs(self, target: str) -> 'tuple[set[str], set[str], set[str], bool]':
         '''
-        Parse output of "ninja -t query <target>" command to find out all input targets.
+        Find out all input targets of the build statement creating the target.
         The result is a tuple containing:
             - set of explicit inputs
             - set of implicit inputs
             - set of "order only" inputs
             - bool set to True if provided target is a "phony" target
         '''
-        lines = command_execute(args.ninja, '-t', 'query', target, cwd=self.build_dir)
-        ex_begin = f'Cannot parse output of "{args.ninja} -t query target" on line'
-        lines = lines.split('\n')
-        lines = tuple(filter(lambda line: len(line.strip()) > 0, lines))
-        line_no = 0
-        explicit = set()
-        implicit = set()
-        order_only = set()
-        phony = False
-        while line_no < len(lines):
-            m = re.fullmatch(r'\S.*:', lines[line_no])
-            if m is None:
-                raise SbomException(f'{ex_begin} {line_no + 1}. Expecting target.')
-            line_no += 1
-            while line_no < len(lines):
-                m = re.fullmatch(r'(\s*)(.*):(.*)', lines[line_no])
-                if m is None:
-                    raise SbomException(f'{ex_begin} {line_no + 1}. Expecting direction.')
-                if m.group(1) == '':
-                    break
-                line_no += 1
-                ind1 = len(m.group(1))
-                dir = m.group(2)
-                phony = phony or (re.search(r'(\s|^)phony(\s|$)', m.group(3)) is not None)
-                if dir == 'input':
-                    inputs = True
-                else:
-                    if dir != 'outputs':
-                        raise SbomException(f'{ex_begin} {line_no + 1}. Expecting "input:" '
-                                            f'or "outputs:".')
-                    inputs = False
-                while line_no < len(lines):
-                    m = re.fullmatch(r'(\s*)(\|?\|?)\s*(.*)', lines[line_no])
-                    if m is None:
-                        raise SbomException(f'{ex_begin} {line_no + 1}. Expecting {dir} target.')
-                    if len(m.group(1)) <= ind1:
-                        break
-                    line_no += 1
-                    target = str(m.group(3))
-                    if inputs:
-                        if m.group(2) == '':
-                            explicit.add(target)
-                        elif m.group(2) == '|':
-                            implicit.add(target)
-                        else:
-                            order_only.add(target)
-        return (explicit, implicit, order_only, phony)
+        return self.ninja.query_inputs(target)
 
 
     def query_inputs_recursive(self, target: str, done: 'set|None' = None,
@@ -237,8 +194,10 @@ class InputBuild:
         '''
         Checks if every file from the library "archive_path" is in the set of "inputs" targets.
         '''
-        arch_files = command_execute(args.ar, '-t', archive_path)
-        arch_files = arch_files.split('\n')
+        arch_files = read_archive_members(archive_path)
+        if arch_files is None:
+            arch_files = command_execute(args.ar, '-t', archive_path)
+            arch_files = arch_files.split('\n')
         arch_files = (f.strip().replace('/', os.sep).replace('\\', os.sep).strip(os.sep)
                       for f in arch_files)
         arch_files = filter(lambda file: len(file.strip()) > 0, arch_files)
@@ -368,8 +327,8 @@ class InputBuild:
 
 def check_external_tools(build_dir: Path):
     '''
-    Checks if "ar --version" works correctly. If not, raises exception with information
-    for user.
+    Checks if "ar --version" works correctly. It is used for archives that cannot be read
+    directly. If not, raises exception with information for user.
     '''
     def tool_test_execute(tool_path: str) -> bool:
         try:
@@ -406,7 +365,6 @@ def check_external_tools(build_dir: Path):
             'Make sure that you correctly built the application.') from ex
 
     args.ar = test_tool('ar', 'CMAKE_AR')
-    args.ninja = test_tool('ninja', 'CMAKE_MAKE_PROGRAM')
 
 
 def get_default_build_dir() -> 'str|None':
@@ -0,0 +1,120 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+'''
+Persistent license cache.
+Results of the slow detectors are stored in an SQLite database and reused on the following runs.
+Entries are keyed by SHA-1 of the file content, detector name and detector version, so they
+are valid for the same content regardless of the file location, build or branch.
+'''
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+from west import log, util
+from args import args
+from common import SbomException
+
+
+DEFAULT_CACHE_FILE = 'ncs-sbom-cache.db'
+
+# Increment when format of the database changes.
+SCHEMA_VERSION = 1
+
+
+class LicenseCache:
+    '''SQLite database containing detection results for each file content.'''
+
+    def __init__(self, file_path: Path, read_only: bool = False):
+        '''Open or create the cache database file.'''
+        self.file_path = Path(file_path)
+        # Connections must not be used by forked worker processes.
+        self.pid = os.getpid()
+        try:
+            if read_only:
+                uri = f'{self.file_path.resolve().as_uri()}?mode=ro'
+                self.db = sqlite3.connect(uri, uri=True, timeout=60)
+            else:
+                self.db = sqlite3.connect(self.file_path, timeout=60)
+            version = self.db.execute('PRAGMA user_version').fetchone()[0]
+            if read_only:
+                if version != SCHEMA_VERSION:
+                    raise SbomException(f'License cache "{self.file_path}" has unsupported '
+                                        f'version {version}.')
+            elif version != SCHEMA_VERSION:
+                if version != 0:
+                    log.wrn(f'License cache "{self.file_path}" has unsupported version '
+                            f'{version}, clearing it.')
+                with self.db:
+                    self.db.execute('DROP TABLE IF EXISTS results')
+                    self.db.execute('CREATE TABLE results ('
+                                    'sha1 TEXT, detector TEXT, version TEXT, value TEXT, '
+                                    'PRIMARY KEY (sha1, detector, version))')
+                    self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        except sqlite3.Error as ex:
+            raise SbomException(f'Cannot open license cache "{self.file_path}": {ex}') from ex
+
+    def get(self, sha1: str, detector: str, version: str):
+        '''Return cached value or None if there is no value for this file content.'''
+        row = self.db.execute('SELECT value FROM results '
+                              'WHERE sha1 = ? AND detector = ? AND version = ?',
+                              (sha1, detector, version)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, entries: 'list[tuple[str, str, str, object]]'):
+        '''Store list of (sha1, detector, version, value) entries in the database.'''
+        if len(entries) == 0:
+            return
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                                ((sha1, detector, version, json.dumps(value))
+                                 for sha1, detector, version, value in entries))
+
+    def close(self):
+        '''Close the database.'''
+        self.db.close()
+
+
+cache: 'LicenseCache|None' = None
+worker_cache: 'LicenseCache|None' = None
+
+
+def init():
+    '''Open the license cache selected by the command line arguments.'''
+    global cache
+    if args.no_license_cache:
+        return
+    if args.license_cache is not None:
+        file_path = Path(args.license_cache)
+    else:
+        file_path = Path(util.west_topdir()) / '.west' / DEFAULT_CACHE_FILE
+    log.dbg(f'License cache: {file_path}')
+    cache = LicenseCache(file_path)
+
+
+def close():
+    '''Close the license cache opened by init().'''
+    global cache
+    if cache is not None:
+        cache.close()
+        cache = None
+
+
+def get_cache() -> 'LicenseCache|None':
+    '''Return the license cache or None if caching is disabled.'''
+    return cache
+
+
+def get_worker_cache(file_path: Path) -> LicenseCache:
+    '''Return read-only license cache opened once for the current worker process.
+    If called from the main process, e.g. when there are too few files to start the worker
+    processes, the main license cache is returned.'''
+    global worker_cache
+    if cache is not None and cache.pid == os.getpid() and cache.file_path == Path(file_path):
+        return cache
+    if worker_cache is None or worker_cache.file_path != Path(file_path):
+        worker_cache = LicenseCache(file_path, read_only=True)
+    return worker_cache
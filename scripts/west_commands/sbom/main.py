@@ -7,6 +7,7 @@
 Main entry point for the script.
 '''
 
+import hashlib
 from pathlib import Path
 import spdx_tag_detector
 import full_text_detector
@@ -15,12 +16,15 @@ import cache_database_detector
 import external_file_detector
 import git_info_detector
 import file_input
+import file_scanner
 import input_build
+import license_cache
 import input_post_process
+import incremental
 import output_pre_process
 import output_template
 from west import log
-from common import SbomException, dbg_time
+from common import SbomException, TimedStage, log_stage_times
 from args import args, init_args
 from data_structure import Data
 
@@ -39,6 +43,14 @@ detectors = {
     'external-file': external_file_detector.detect,
 }
 
+# Detectors that search only the file content. They are executed by the file scanner,
+# so each file is read only once. The second item returns detector version if its results
+# should be stored in the license cache.
+content_detectors = {
+    'spdx-tag': (spdx_tag_detector.detect_content, None),
+    'full-text': (full_text_detector.detect_content, full_text_detector.get_version),
+}
+
 generators = {
     'html': 'templates/report.html.jinja',
     'spdx': 'templates/raport.spdx.jinja',
@@ -46,6 +58,30 @@ generators = {
 }
 
 
+def get_state_config(data: Data) -> dict:
+    '''Returns configuration of the detectors that must match to reuse the state file.
+    It contains versions of the detectors and hashes of their external inputs.'''
+    versions = dict()
+    for name in args.license_detectors:
+        if name in content_detectors and content_detectors[name][1] is not None:
+            versions[name] = content_detectors[name][1]()
+    if 'scancode-toolkit' in args.license_detectors:
+        versions['scancode-toolkit'] = scancode_toolkit_detector.check_scancode()
+    if 'external-file' in args.license_detectors:
+        versions['external-file'] = external_file_detector.get_state_key(data)
+    if 'cache-database' in args.license_detectors and args.input_cache_database is not None:
+        with open(args.input_cache_database, 'rb') as fd:
+            versions['cache-database'] = {
+                'path': str(Path(args.input_cache_database).resolve()),
+                'sha1': hashlib.sha1(fd.read()).hexdigest(),
+            }
+    return {
+        'license_detectors': args.license_detectors,
+        'optional_license_detectors': sorted(args.optional_license_detectors),
+        'versions': versions,
+    }
+
+
 def main():
     '''Main entry function for the script.'''
     try:
@@ -54,29 +90,57 @@ def main():
         data = Data()
 
         for input_name, input in inputs.items():
-            t = dbg_time(f'INPUT: {input_name}')
-            input(data)
-            log.dbg(f'INPUT: Done in {t}s')
+            with TimedStage(f'INPUT: {input_name}'):
+                input(data)
 
         input_post_process.post_process(data)
 
+        license_cache.init()
+
+        state = None
+        if args.input_state is not None:
+            state = incremental.load_state(args.input_state, get_state_config(data))
+
+        scanner_detectors = list()
+        for name in args.license_detectors:
+            if name in content_detectors:
+                func, get_version = content_detectors[name]
+                scanner_detectors.append((name, func, name in args.optional_license_detectors,
+                                          get_version() if get_version is not None else None))
+        with TimedStage('SCANNER'):
+            file_scanner.scan(data, scanner_detectors, incremental.previous_sha1(data, state))
+
+        all_files = data.files
+        changed_files = incremental.restore_unchanged(data, state)
         for detector_name in args.license_detectors:
             func = detectors[detector_name]
             optional = detector_name in args.optional_license_detectors
-            t = dbg_time(f'DETECTOR: {detector_name}')
-            func(data, optional)
-            log.dbg(f'DETECTOR: Done in {t}s')
+            if detector_name in incremental.ALWAYS_EXECUTED_DETECTORS:
+                data.files = all_files
+            else:
+                data.files = changed_files
+            with TimedStage(f'DETECTOR: {detector_name}'):
+                func(data, optional)
+        data.files = all_files
 
-        output_pre_process.pre_process(data)
+        if args.output_state is not None:
+            incremental.write_state(data, args.output_state, get_state_config(data))
+
+        with TimedStage('OUTPUT PRE-PROCESS'):
+            output_pre_process.pre_process(data)
 
         for generator_name, generator in generators.items():
             output_file = args.__dict__[f'output_{generator_name}']
             if output_file is not None:
-                t = dbg_time(f'GENERATOR: {generator_name}')
-                output_template.generate(data, output_file, Path(__file__).parent / generator)
-                log.dbg(f'GENERATOR: Done in {t}s')
+                with TimedStage(f'GENERATOR: {generator_name}'):
+                    output_template.generate(data, output_file,
+                                             Path(__file__).parent / generator)
+
+        log_stage_times()
     except SbomException as e:
         log.die(str(e), exit_code=1)
+    finally:
+        license_cache.close()
 
 
 if __name__ == '__main__':
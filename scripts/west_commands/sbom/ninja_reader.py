@@ -0,0 +1,258 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+'''
+Reader of the ninja build files.
+It parses "build.ninja" and the binary ".ninja_deps" file directly, so the dependency graph
+is resolved without starting ninja subprocesses. The parsed graph is cached in the build
+directory and reused as long as the modification times of the ninja files are unchanged.
+'''
+
+import pickle
+import posixpath
+import re
+import struct
+from pathlib import Path
+from west import log
+from common import SbomException
+
+
+MANIFEST_FILE = 'build.ninja'
+DEPS_LOG_FILE = '.ninja_deps'
+CACHE_FILE = 'ncs-sbom-ninja.cache'
+
+# Increment when format of the cached data changes.
+CACHE_VERSION = 1
+
+DEPS_LOG_SIGNATURE = b'# ninjadeps\n'
+
+# Tokens of the build statement: separators or paths with escape sequences.
+BUILD_TOKEN_RE = re.compile(r'\|\||\|@|\||:|(?:\$[\s\S]|[^\s$:|])+')
+EVAL_RE = re.compile(r'\$(?:(\$)|(:)|( )|\{([a-zA-Z0-9_.-]+)\}|([a-zA-Z0-9_-]+))')
+BINDING_RE = re.compile(r'([a-zA-Z0-9_.-]+)\s*=\s*(.*)')
+
+
+def canonicalize_path(path: str) -> str:
+    '''Canonicalize path in the same way as ninja does.'''
+    return posixpath.normpath(path.replace('\\', '/'))
+
+
+class Edge:
+    '''Build statement.
+
+    Attributes:
+        rule        Rule name
+        explicit    Explicit inputs
+        implicit    Implicit inputs
+        order_only  Order-only inputs
+    '''
+    __slots__ = ('rule', 'explicit', 'implicit', 'order_only')
+
+    def __init__(self, rule: str, explicit: 'list[str]', implicit: 'list[str]',
+                 order_only: 'list[str]'):
+        self.rule = rule
+        self.explicit = explicit
+        self.implicit = implicit
+        self.order_only = order_only
+
+
+class NinjaBuild:
+    '''Dependency graph of the ninja build directory.
+
+    Attributes:
+        build_dir  Build directory
+        edges      Dictionary of build statements with the output path as a key
+        nodes      Set of all paths known from the build files
+        deps       Dictionary of dependencies from the ".ninja_deps" file with the output path
+                   as a key
+        files      Modification times of all parsed files, used to validate the cache
+    '''
+
+    def __init__(self, build_dir: Path):
+        self.build_dir = Path(build_dir)
+        self.edges: 'dict[str, Edge]' = dict()
+        self.nodes: 'set[str]' = set()
+        self.deps: 'dict[str, set[str]]' = dict()
+        self.files: 'dict[str, int]' = dict()
+
+    def add_file(self, file_path: Path):
+        '''Remember modification time of the parsed file.'''
+        self.files[str(file_path)] = file_path.stat().st_mtime_ns
+
+    def is_up_to_date(self) -> bool:
+        '''Returns True if none of the parsed files was changed.'''
+        deps_log = self.build_dir / DEPS_LOG_FILE
+        if deps_log.exists() and (str(deps_log) not in self.files):
+            return False
+        for file_name, mtime in self.files.items():
+            try:
+                if Path(file_name).stat().st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @staticmethod
+    def evaluate(text: str, scope: 'dict[str, str]', file_path: Path, line_no: int) -> str:
+        '''Replace escape sequences and variables in the text.'''
+        def replace(m: re.Match):
+            for group in (1, 2, 3):
+                if m.group(group) is not None:
+                    return m.group(group)
+            return scope.get(m.group(4) or m.group(5), '')
+        if '$' not in text:
+            return text
+        result = EVAL_RE.sub(replace, text)
+        if '$' in EVAL_RE.sub('', text):
+            raise SbomException(f'Invalid "$" escape in "{file_path}" on line {line_no}.')
+        return result
+
+    @staticmethod
+    def read_lines(file_path: Path) -> 'list[tuple[int, str]]':
+        '''Read logical lines of the ninja file joining lines ending with "$".'''
+        with open(file_path, 'r', encoding='utf-8') as fd:
+            lines = fd.read().split('\n')
+        result = list()
+        current = None
+        for line_no, line in enumerate(lines, 1):
+            line = line.rstrip('\r')
+            if current is not None:
+                line = current[1] + line.lstrip(' ')
+                line_no = current[0]
+            stripped = line.rstrip('$')
+            if (len(line) - len(stripped)) % 2 == 1:
+                current = (line_no, line[:-1])
+            else:
+                current = None
+                result.append((line_no, line))
+        return result
+
+    def parse_build(self, text: str, scope: 'dict[str, str]', file_path: Path, line_no: int):
+        '''Parse build statement and add it to the graph.'''
+        groups = [[], [], [], [], [], []]
+        group = 0
+        rule = None
+        for token in BUILD_TOKEN_RE.findall(text):
+            if token == ':' and group < 2:
+                group = 2
+            elif token == '|':
+                group = 1 if group < 2 else 3
+            elif token == '||':
+                group = 4
+            elif token == '|@':
+                group = 5
+            elif group == 2 and rule is None:
+                rule = token
+            else:
+                groups[group].append(canonicalize_path(self.evaluate(token, scope, file_path,
+                                                                     line_no)))
+        if rule is None or len(groups[0]) == 0:
+            raise SbomException(f'Cannot parse build statement in "{file_path}" on line '
+                                f'{line_no}.')
+        edge = Edge(rule, groups[2], groups[3], groups[4])
+        for output in groups[0] + groups[1]:
+            self.edges[output] = edge
+        for group in groups:
+            self.nodes.update(group)
+
+    def parse_manifest(self, file_path: Path, scope: 'dict[str, str]'):
+        '''Parse ninja manifest file and all included files.'''
+        self.add_file(file_path)
+        for line_no, line in self.read_lines(file_path):
+            if line.startswith(' ') or line.strip() == '' or line.lstrip().startswith('#'):
+                # Variables of the rules, pools and build statements do not affect paths
+                continue
+            keyword, _, rest = line.partition(' ')
+            if keyword == 'build':
+                self.parse_build(rest, scope, file_path, line_no)
+            elif keyword in ('include', 'subninja'):
+                included = self.evaluate(rest.strip(), scope, file_path, line_no)
+                included_scope = scope if keyword == 'include' else dict(scope)
+                self.parse_manifest(self.build_dir / included, included_scope)
+            elif keyword in ('rule', 'pool', 'default'):
+                pass
+            else:
+                m = BINDING_RE.fullmatch(line)
+                if m is None:
+                    raise SbomException(f'Cannot parse "{file_path}" on line {line_no}.')
+                scope[m.group(1)] = self.evaluate(m.group(2), scope, file_path, line_no)
+
+    def parse_deps_log(self, file_path: Path):
+        '''Parse binary ".ninja_deps" file.'''
+        self.add_file(file_path)
+        with open(file_path, 'rb') as fd:
+            content = fd.read()
+        if not content.startswith(DEPS_LOG_SIGNATURE):
+            raise SbomException(f'Invalid ninja dependencies file "{file_path}".')
+        pos = len(DEPS_LOG_SIGNATURE)
+        version, = struct.unpack_from('<i', content, pos)
+        if version not in (3, 4):
+            raise SbomException(f'Unsupported version {version} of the ninja dependencies '
+                                f'file "{file_path}".')
+        header_words = 3 if version == 4 else 2
+        pos += 4
+        paths = list()
+        deps = dict()
+        while pos + 4 <= len(content):
+            size, = struct.unpack_from('<I', content, pos)
+            pos += 4
+            is_deps = (size & 0x80000000) != 0
+            size &= 0x7FFFFFFF
+            if pos + size > len(content):
+                # Incomplete record at the end of file, ninja ignores it too.
+                break
+            if is_deps:
+                ids = struct.unpack_from(f'<{size // 4}i', content, pos)
+                deps[ids[0]] = ids[header_words:]
+            else:
+                paths.append(content[pos:pos + size - 4].rstrip(b'\0').decode('utf-8'))
+            pos += size
+        for out_id, dep_ids in deps.items():
+            self.deps[paths[out_id]] = set(paths[x] for x in dep_ids)
+
+    def query_inputs(self, target: str) -> 'tuple[set[str], set[str], set[str], bool]':
+        '''
+        Returns inputs of the build statement that creates the target. The result is a tuple
+        containing:
+            - set of explicit inputs
+            - set of implicit inputs
+            - set of "order only" inputs
+            - bool set to True if provided target is a "phony" target
+        '''
+        target = canonicalize_path(target)
+        if target not in self.nodes:
+            raise SbomException(f'Unknown ninja target "{target}" in "{self.build_dir}".')
+        if target not in self.edges:
+            return (set(), set(), set(), False)
+        edge = self.edges[target]
+        return (set(edge.explicit), set(edge.implicit), set(edge.order_only),
+                edge.rule == 'phony')
+
+
+def load(build_dir: 'Path|str') -> NinjaBuild:
+    '''Load dependency graph of the build directory from the cache or parse ninja files.'''
+    build_dir = Path(build_dir)
+    cache_file = build_dir / CACHE_FILE
+    try:
+        with open(cache_file, 'rb') as fd:
+            version, build = pickle.load(fd)
+        if version == CACHE_VERSION and build.is_up_to_date():
+            log.dbg(f'Using cached ninja dependency graph from "{cache_file}"')
+            return build
+    except Exception: # pylint: disable=broad-except
+        # Missing, outdated or corrupted cache file is silently replaced with a new one.
+        pass
+    build = NinjaBuild(build_dir)
+    build.parse_manifest(build_dir / MANIFEST_FILE, dict())
+    if (build_dir / DEPS_LOG_FILE).exists():
+        build.parse_deps_log(build_dir / DEPS_LOG_FILE)
+    log.dbg(f'Parsed {len(build.edges)} ninja outputs and dependencies of {len(build.deps)} '
+            f'targets')
+    try:
+        with open(cache_file, 'wb') as fd:
+            pickle.dump((CACHE_VERSION, build), fd)
+    except OSError as ex:
+        log.wrn(f'Cannot write ninja dependency graph cache "{cache_file}": {ex}')
+    return build
@@ -7,7 +7,8 @@
 Pre-processing of data before it goes to the output.
 '''
 
-from data_structure import Data, License, LicenseExpr
+import sys
+from data_structure import Data, License, LicenseExpr, intern_set
 from license_utils import get_license, get_spdx_license_expr_info, is_spdx_license
 
 
@@ -33,7 +34,12 @@ def pre_process(data: Data):
         simple_expr_items -= repeated_expr_items
         if len(or_expr_items) > 1 or len(simple_expr_items) > 0:
             or_expr_items = { f'({x})' for x in or_expr_items }
-        file.license_expr = ' AND '.join(sorted(simple_expr_items.union(or_expr_items)))
+        license_expr = ' AND '.join(sorted(simple_expr_items.union(or_expr_items)))
+        file.license_expr = sys.intern(license_expr)
+        # Detection is done, so share identical sets and release the scanning results
+        file.licenses = intern_set(file.licenses)
+        file.detectors = intern_set(file.detectors)
+        file.content_licenses.clear()
     # Collect all used detectors
     for file in data.files:
         data.detectors.update(file.detectors)
@@ -19,6 +19,10 @@ from data_structure import Data, FileInfo  # pylint: disable=unused-import
 
 
 counter_value = 0
+groupings: 'dict[tuple[int, str], tuple[list[FileInfo], dict[list[FileInfo]]]]' = dict()
+
+# Number of rendered template parts collected before writing them to the output file.
+STREAM_BUFFER_SIZE = 64
 
 
 def verification_code(files: 'list[FileInfo]') -> str:
@@ -40,6 +44,11 @@ filters.FILTERS['adjust_identifier'] = adjust_identifier
 
 
 def group_by(files: 'list[FileInfo]', attr_name: str) -> 'dict[list[FileInfo]]':
+    '''Group files by the attribute value. Groupings precomputed by "precompute_groupings"
+    are returned without iterating over the files again.'''
+    key = (id(files), attr_name)
+    if key in groupings:
+        return groupings[key][1]
     result = dict()
     for file in files:
         attr_value = getattr(file, attr_name)
@@ -49,6 +58,36 @@ def group_by(files: 'list[FileInfo]', attr_name: str) -> 'dict[list[FileInfo]]':
     return result
 
 
+def precompute_groupings(files: 'list[FileInfo]'):
+    '''Group files by license and package and by both of them in a single pass over all
+    files. Templates use the "group_by" function to get the results.'''
+    groupings.clear()
+    by_license = dict()
+    by_package = dict()
+    by_license_and_package = dict()
+    by_package_and_license = dict()
+    for file in files:
+        license = file.license_expr
+        package = file.package
+        if license not in by_license:
+            by_license[license] = list()
+            by_license_and_package[license] = dict()
+        if package not in by_package:
+            by_package[package] = list()
+            by_package_and_license[package] = dict()
+        by_license[license].append(file)
+        by_package[package].append(file)
+        by_license_and_package[license].setdefault(package, list()).append(file)
+        by_package_and_license[package].setdefault(license, list()).append(file)
+    # The groupings keep references to the grouped lists, so their ids are not reused.
+    groupings[(id(files), 'license_expr')] = (files, by_license)
+    groupings[(id(files), 'package')] = (files, by_package)
+    for license, group in by_license.items():
+        groupings[(id(group), 'package')] = (group, by_license_and_package[license])
+    for package, group in by_package.items():
+        groupings[(id(group), 'license_expr')] = (group, by_package_and_license[package])
+
+
 def counter() -> int:
     global counter_value
     counter_value += 1
@@ -80,14 +119,18 @@ def data_to_dict(data: Data, output_directory: Path) -> dict:
 
 
 def generate(data: Data, output_file: 'Path|str', template_file: Path):
-    '''Generate output_file from data using template_file.'''
+    '''Generate output_file from data using template_file. The output is rendered in chunks
+    and written directly to the file, so the whole output is never kept in memory.'''
     output_file = Path(output_file)
     log.dbg(f'Writing output to "{output_file}" using template "{template_file}"')
     with open(template_file, 'r') as fd:
         template_source = fd.read()
     t = Template(template_source)
-    out = t.render(**data_to_dict(data, output_file.parent.resolve()))
+    precompute_groupings(data.files)
+    stream = t.stream(**data_to_dict(data, output_file.parent.resolve()))
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
     with open(output_file, 'w') as fd:
-        fd.write(out)
+        stream.dump(fd)
+    groupings.clear()
     escaped_path = quote(str(output_file.resolve()).replace(os.sep, '/').strip("/"))
     log.inf(f'Output written to file:///{escaped_path}')
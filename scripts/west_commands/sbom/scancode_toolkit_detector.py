@@ -11,19 +11,39 @@ For more details see: https://scancode-toolkit.readthedocs.io/en/stable/
 import json
 import os
 import re
-from tempfile import NamedTemporaryFile
+import shutil
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from west import log
 from data_structure import Data, FileInfo, License
 from args import args
-from common import SbomException, command_execute
+from common import SbomException, command_execute, dbg_time
 from license_utils import is_spdx_license
+from license_cache import get_cache
 
 
-def check_scancode():
+# Keys of the scancode-toolkit license results that are used by this detector and stored in
+# the license cache.
+CACHED_KEYS = ('spdx_license_key', 'key', 'matched_text', 'name', 'short_name', 'spdx_url',
+               'reference_url', 'scancode_text_url')
+
+# Starting scancode-toolkit takes a few seconds, so files are scanned in batches using
+# a single scancode invocation per batch.
+BATCH_MAX_FILES = 1000
+
+# Output of "scancode --version", read only once.
+scancode_version: 'str|None' = None
+
+
+def check_scancode() -> str:
     '''Checks if "scancode --version" works correctly. If not, raises exception with information
-    for user.'''
+    for user. Returns the version output used as a license cache key.'''
+    global scancode_version
+    if scancode_version is not None:
+        return scancode_version
     try:
-        command_execute(args.scancode, '--version', allow_stderr=True)
+        scancode_version = command_execute(args.scancode, '--version', allow_stderr=True).strip()
+        return scancode_version
     except Exception as ex:
         raise SbomException(f'Cannot execute scancode command "{args.scancode}".\n'
             f'Make sure that you have scancode-toolkit installed.\n'
@@ -31,23 +51,120 @@ def check_scancode():
             f'not available on PATH.') from ex
 
 
-def run_scancode(file: FileInfo) -> 'set(str)':
-    '''Execute scancode and get license identifier from its results.'''
-    with NamedTemporaryFile(mode="w+", delete=False) as output_file:
+def file_key(path: 'Path|str') -> str:
+    '''Path normalized for matching input files with paths reported by scancode-toolkit.'''
+    return str(path).replace('\\', '/').strip('/')
+
+
+def link_batch(paths: 'list[Path]', directory: Path) -> 'dict[str, Path]':
+    '''Link files of a batch into the directory, each one in its own subdirectory, so the file
+    names are preserved. Returns the original file for each linked file with file_key() as a key.'''
+    linked = dict()
+    for index, path in enumerate(paths):
+        target = directory / str(index) / Path(path).name
+        target.parent.mkdir()
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copyfile(path, target)
+        linked[file_key(Path(str(index)) / target.name)] = path
+    return linked
+
+
+def run_scancode(paths: 'list[Path]') -> 'dict[str, list[dict]]':
+    '''Execute scancode on a batch of files and get license results from its output.
+    The returned dictionary contains list of licenses for each file with file_key() as a key.
+
+    scancode-toolkit accepts multiple inputs only if they are relative to a common parent,
+    so the files are linked into a temporary directory which is scanned as a single input.'''
+    processes = args.processes if args.processes > 0 else os.cpu_count()
+    with TemporaryDirectory() as temp_dir:
+        input_dir = Path(temp_dir) / 'input'
+        input_dir.mkdir()
+        linked = link_batch(paths, input_dir)
+        output_file = Path(temp_dir) / 'output.json'
         command_execute(args.scancode, '-cl',
-                        '--json', output_file.name,
+                        '--json', output_file,
                         '--license-text',
                         '--license-score', '100',
                         '--license-text-diagnostics',
                         '--quiet',
-                        f'-n {args.processes if args.processes > 0 else os.cpu_count()}', # Does not observe grow of efficiency on single file run.
-                        file.file_path,
+                        '-n', processes,
+                        input_dir,
                         allow_stderr=True)
-        output_file.seek(0)
-        result = json.loads(output_file.read())
-        output_file.close()
-        os.unlink(output_file.name)
-        return result
+        result = json.loads(output_file.read_text())
+    licenses = dict()
+    for entry in result['files']:
+        if entry.get('type', 'file') != 'file':
+            continue
+        # Reported paths start with the name of the scanned directory, the last two parts are
+        # the same as in the linked file key.
+        linked_key = '/'.join(file_key(entry['path']).split('/')[-2:])
+        if linked_key not in linked:
+            continue
+        licenses[file_key(linked[linked_key])] = [
+            dict((key, value) for key, value in i.items() if key in CACHED_KEYS)
+            for i in entry['licenses']]
+    return licenses
+
+
+def split_batches(paths: 'list[Path]') -> 'list[list[Path]]':
+    '''Split list of files into batches limited by the number of files.'''
+    return [paths[i:i + BATCH_MAX_FILES] for i in range(0, len(paths), BATCH_MAX_FILES)]
+
+
+def apply_result(data: Data, file: FileInfo, licenses: 'list[dict]'):
+    '''Update file and data with license results reported by scancode-toolkit.'''
+    for i in licenses:
+
+        friendly_id = ''
+        if 'spdx_license_key' in i and i['spdx_license_key'] != '':
+            friendly_id = i['spdx_license_key']
+        elif 'key' in i and i['key'] != '':
+            friendly_id = i['key']
+        id = friendly_id.upper()
+        if id in ('UNKNOWN-SPDX', 'LICENSEREF-SCANCODE-UNKNOWN-SPDX'):
+            friendly_id = re.sub(r'SPDX-License-Identifier:', '', i['matched_text'],
+                                 flags=re.I).strip()
+            id = friendly_id.upper()
+        if id == '':
+            log.wrn(f'Invalid response from scancode-toolkit, file: {file.file_path}')
+            continue
+
+        file.licenses.add(id)
+        file.detectors.add('scancode-toolkit')
+
+        if not is_spdx_license(id):
+            if 'name' in i:
+                name = i['name']
+            elif 'short_name' in i:
+                name = i['short_name']
+            else:
+                name = None
+
+            if 'spdx_url' in i:
+                url = i['spdx_url']
+            elif 'reference_url' in i:
+                url = i['reference_url']
+            elif 'scancode_text_url' in i:
+                url = i['scancode_text_url']
+            else:
+                url = None
+
+            if id in data.licenses:
+                license = data.licenses[id]
+                if license.is_expr:
+                    continue
+            else:
+                license = License()
+                data.licenses[id] = license
+                license.id = id
+                license.friendly_id = friendly_id
+            if license.name is None:
+                license.name = name
+            if license.url is None:
+                license.url = url
+            license.detectors.add('scancode-toolkit')
 
 
 def detect(data: Data, optional: bool):
@@ -58,59 +175,47 @@ def detect(data: Data, optional: bool):
     else:
         filtered = data.files
 
-    if len(filtered) > 0:
-        check_scancode()
-
-    decoded = map(run_scancode, filtered)
-
-    for result, file in zip(decoded, filtered):
-        for i in result['files'][0]['licenses']:
-
-            friendly_id = ''
-            if 'spdx_license_key' in i and i['spdx_license_key'] != '':
-                friendly_id = i['spdx_license_key']
-            elif 'key' in i and i['key'] != '':
-                friendly_id = i['key']
-            id = friendly_id.upper()
-            if id in ('UNKNOWN-SPDX', 'LICENSEREF-SCANCODE-UNKNOWN-SPDX'):
-                friendly_id = re.sub(r'SPDX-License-Identifier:', '', i['matched_text'],
-                                     flags=re.I).strip()
-                id = friendly_id.upper()
-            if id == '':
-                log.wrn(f'Invalid response from scancode-toolkit, file: {file.file_path}')
+    if len(filtered) == 0:
+        return
+
+    version = check_scancode()
+    cache = get_cache()
+
+    # Files with the same content are scanned only once
+    results = dict()
+    to_scan = dict()
+    for file in filtered:
+        if file.sha1 in results or file.sha1 in to_scan:
+            continue
+        licenses = None
+        if cache is not None:
+            licenses = cache.get(file.sha1, 'scancode-toolkit', version)
+        if licenses is None:
+            to_scan[file.sha1] = file.file_path
+        else:
+            results[file.sha1] = licenses
+
+    batches = split_batches(list(to_scan.values()))
+    sha1_by_key = dict((file_key(path), sha1) for sha1, path in to_scan.items())
+    for batch_index, batch in enumerate(batches):
+        t = dbg_time(f'Scanning batch {batch_index + 1} of {len(batches)} '
+                     f'containing {len(batch)} files')
+        batch_results = run_scancode(batch)
+        log.dbg(f'Batch done in {t}s')
+        new_entries = list()
+        for path in batch:
+            key = file_key(path)
+            sha1 = sha1_by_key[key]
+            if key not in batch_results:
+                log.wrn(f'No results from scancode-toolkit, file: {path}')
+                results[sha1] = list()
                 continue
-
-            file.licenses.add(id)
-            file.detectors.add('scancode-toolkit')
-
-            if not is_spdx_license(id):
-                if 'name' in i:
-                    name = i['name']
-                elif 'short_name' in i:
-                    name = i['short_name']
-                else:
-                    name = None
-
-                if 'spdx_url' in i:
-                    url = i['spdx_url']
-                elif 'reference_url' in i:
-                    url = i['reference_url']
-                elif 'scancode_text_url' in i:
-                    url = i['scancode_text_url']
-                else:
-                    url = None
-
-                if id in data.licenses:
-                    license = data.licenses[id]
-                    if license.is_expr:
-                        continue
-                else:
-                    license = License()
-                    data.licenses[id] = license
-                    license.id = id
-                    license.friendly_id = friendly_id
-                if license.name is None:
-                    license.name = name
-                if license.url is None:
-                    license.url = url
-                license.detectors.add('scancode-toolkit')
+            results[sha1] = batch_results[key]
+            new_entries.append((sha1, 'scancode-toolkit', version, batch_results[key]))
+        if cache is not None:
+            # Store results after each batch, scancode-toolkit is slow, so an interrupted run
+            # should not lose already detected licenses.
+            cache.put(new_entries)
+
+    for file in filtered:
+        apply_result(data, file, results[file.sha1])
@@ -9,9 +9,8 @@ For more details see: https://spdx.github.io/spdx-spec/using-SPDX-short-identifi
 '''
 
 import re
-from west import log
-from data_structure import Data, FileInfo
-from common import SbomException, concurrent_pool_iter
+from data_structure import Data
+from file_scanner import apply_results
 
 
 SPDX_TAG_RE = re.compile(
@@ -19,14 +18,8 @@ SPDX_TAG_RE = re.compile(
     re.IGNORECASE)
 
 
-def detect_file(file: FileInfo) -> 'set(str)':
-    '''Read input file content and try to detect licenses by its content.'''
-    try:
-        with open(file.file_path, 'r', encoding='8859') as fd:
-            content = fd.read()
-    except Exception as e:
-        log.err(f'Error reading file "{file.file_path}": {e}')
-        raise SbomException() from e
+def detect_content(content: str) -> 'set(str)':
+    '''Try to detect licenses by the file content.'''
     results = set()
     for m in SPDX_TAG_RE.finditer(content):
         id = m.group(1).strip()
@@ -36,14 +29,5 @@ def detect_file(file: FileInfo) -> 'set(str)':
 
 
 def detect(data: Data, optional: bool):
-    '''SPDX-tag detector.'''
-
-    if optional:
-        filtered = filter(lambda file: len(file.licenses) == 0, data.files)
-    else:
-        filtered = data.files
-
-    for results, file, _ in concurrent_pool_iter(detect_file, filtered, True, 4096):
-        if len(results) > 0:
-            file.licenses.update(results)
-            file.detectors.add('spdx-tag')
+    '''SPDX-tag detector. Files are scanned by the file_scanner, so only results are applied.'''
+    apply_results(data, 'spdx-tag', optional)
@@ -0,0 +1,55 @@
+#
+# Copyright (c) 2024 Nordic Semiconductor ASA
+#
+# SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+
+'''
+Tests of the scancode-toolkit detector using a fake scancode executable.
+'''
+
+import sys
+from pathlib import Path
+from args import args
+from scancode_toolkit_detector import file_key, run_scancode
+
+
+# Behaves like scancode-toolkit: refuses multiple absolute inputs and reports paths starting
+# with the name of the scanned directory. The license is the first line of each file.
+FAKE_SCANCODE = f'''#!{sys.executable}
+import json, sys
+from pathlib import Path
+argv = sys.argv[1:]
+output = Path(argv[argv.index('--json') + 1])
+inputs = [Path(x) for x in argv if Path(x).exists() and x != str(output)]
+if len(inputs) != 1:
+    sys.exit('Invalid inputs: all input paths must be relative when using multiple inputs')
+files = [{{'path': str(x.relative_to(inputs[0].parent)), 'type': 'directory', 'licenses': []}}
+         for x in sorted(inputs[0].rglob('*')) if x.is_dir()]
+files += [{{'path': str(x.relative_to(inputs[0].parent)), 'type': 'file',
+            'licenses': [{{'spdx_license_key': x.read_text().split()[0], 'score': 100}}]}}
+          for x in sorted(inputs[0].rglob('*')) if x.is_file()]
+output.write_text(json.dumps({{'files': files}}))
+'''
+
+
+def test_run_scancode_batch(tmp_path: Path):
+    scancode = tmp_path / 'scancode'
+    scancode.write_text(FAKE_SCANCODE)
+    scancode.chmod(0o755)
+    args.scancode = str(scancode)
+    args.processes = 1
+
+    first = tmp_path / 'first' / 'LICENSE'
+    second = tmp_path / 'second' / 'nested' / 'LICENSE'
+    third = tmp_path / 'second' / 'file.c'
+    for path, license in ((first, 'MIT'), (second, 'Apache-2.0'), (third, 'BSD-3-Clause')):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(license)
+
+    result = run_scancode([first.resolve(), second.resolve(), third.resolve()])
+
+    assert result == {
+        file_key(first.resolve()): [{'spdx_license_key': 'MIT'}],
+        file_key(second.resolve()): [{'spdx_license_key': 'Apache-2.0'}],
+        file_key(third.resolve()): [{'spdx_license_key': 'BSD-3-Clause'}],
+    }